@@ -1,7 +1,11 @@
 # ============================
 #   IMPORTACIONES DE LIBRERÍAS
 # ============================
+# Primero: el perfil de arranque mide desde aquí
+import perfil_arranque
+
 # Librerías estándar de Python
+import logging
 import os
 import pickle
 import sqlite3
@@ -14,44 +18,28 @@ from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
-# Librerías de terceros para procesamiento de imágenes y reconocimiento facial
-try:
-    import cv2
-    import numpy as np
-    import face_recognition
-    from PIL import Image, ImageTk
-except ImportError as e:
-    print(f"Error al importar librerías de reconocimiento facial: {e}")
-    print("Instale las dependencias con: pip install -r requirements.txt")
-    # Definir variables dummy para evitar errores
-    cv2 = None
-    np = None
-    face_recognition = None
-    Image = None
-    ImageTk = None
+# Librerías de terceros para procesamiento de imágenes y reconocimiento facial.
+# OpenCV, NumPy, face_recognition y PIL tardan segundos en importarse y solo
+# las usa el control de asistencia: se importan al primer uso o en segundo
+# plano después de mostrar la ventana (ver carga_diferida.py)
+import carga_diferida
+
+PAUSA_PRECARGA_MS = 1500    # espera tras mostrar la ventana antes de la precarga
 
 # ============================
 #   VERIFICACIÓN DE DEPENDENCIAS
 # ============================
-def verificar_dependencias():
+def verificar_dependencias(dependencias_faltantes=None):
     """Verifica que todas las dependencias necesarias estén instaladas"""
-    dependencias_faltantes = []
-    
-    if cv2 is None:
-        dependencias_faltantes.append("opencv-python")
-    if np is None:
-        dependencias_faltantes.append("numpy")
-    if face_recognition is None:
-        dependencias_faltantes.append("face-recognition")
-    if Image is None or ImageTk is None:
-        dependencias_faltantes.append("Pillow")
+    if dependencias_faltantes is None:
+        dependencias_faltantes = carga_diferida.faltantes()
     
     if dependencias_faltantes:
         mensaje = f"Dependencias faltantes: {', '.join(dependencias_faltantes)}\n\n"
         mensaje += "Instale las dependencias con:\n"
         mensaje += "pip install -r requirements.txt"
         
-        print(mensaje)
+        log.warning(mensaje)
         return False
     
     return True
@@ -59,244 +47,53 @@ def verificar_dependencias():
 # ============================
 #   CONEXIÓN BASE DE DATOS
 # ============================
-def conectar_bd():
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    
-    # Verificar y crear tabla pacientes
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='pacientes'")
-    existe = cursor.fetchone()
-
-    if existe:
-        cursor.execute("PRAGMA table_info(pacientes)")
-        columnas = [col[1] for col in cursor.fetchall()]
-        columnas_necesarias = {"id", "nombre", "edad", "accidente", "doctor_asignado", "fecha_atencion"}
-        if not columnas_necesarias.issubset(columnas):
-            cursor.execute("DROP TABLE pacientes")
-            conexion.commit()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS pacientes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            edad INTEGER,
-            accidente TEXT NOT NULL,
-            doctor_asignado TEXT NOT NULL,
-            fecha_atencion TEXT NOT NULL
-        )
-    """)
-    
-    # Crear tabla de citas
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS citas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre_paciente TEXT NOT NULL,
-            telefono TEXT,
-            motivo TEXT NOT NULL,
-            doctor TEXT NOT NULL,
-            fecha_cita TEXT NOT NULL,
-            hora_cita TEXT NOT NULL,
-            estado TEXT DEFAULT 'Programada',
-            fecha_creacion TEXT NOT NULL
-        )
-    """)
-    
-    # Crear tabla de control de asistencia
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS asistencia (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre_personal TEXT NOT NULL,
-            cargo TEXT NOT NULL,
-            fecha TEXT NOT NULL,
-            hora_entrada TEXT,
-            hora_salida TEXT,
-            estado TEXT DEFAULT 'Presente',
-            observaciones TEXT
-        )
-    """)
-    
-    # Crear tabla de personal registrado
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS personal (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nombre TEXT NOT NULL,
-            cargo TEXT NOT NULL,
-            codigo TEXT UNIQUE NOT NULL,
-            foto_encoding BLOB,
-            fecha_registro TEXT NOT NULL,
-            activo INTEGER DEFAULT 1
-        )
-    """)
-    
-    conexion.commit()
-    conexion.close()
-
-def guardar_paciente_bd(nombre, edad, accidente, doctor, fecha):
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute(
-        "INSERT INTO pacientes (nombre, edad, accidente, doctor_asignado, fecha_atencion) VALUES (?, ?, ?, ?, ?)",
-        (nombre, edad, accidente, doctor, fecha))
-    conexion.commit()
-    conexion.close()
-
-def obtener_pacientes_bd():
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT * FROM pacientes")
-    datos = cursor.fetchall()
-    conexion.close()
-    return datos
-
-def eliminar_paciente_bd(id_paciente):
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("DELETE FROM pacientes WHERE id = ?", (id_paciente,))
-    conexion.commit()
-    conexion.close()
-
-def actualizar_paciente_bd(id_paciente, nombre, edad, accidente, doctor, fecha):
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute(
-        "UPDATE pacientes SET nombre = ?, edad = ?, accidente = ?, doctor_asignado = ?, fecha_atencion = ? WHERE id = ?",
-        (nombre, edad, accidente, doctor, fecha, id_paciente))
-    conexion.commit()
-    conexion.close()
-
-def consultar_paciente(nombre):
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT * FROM pacientes WHERE nombre LIKE ?", ('%' + nombre + '%',))
-    datos = cursor.fetchall()
-    conexion.close()
-    return datos
-
-# ============================
-#   FUNCIONES CITAS
-# ============================
-def guardar_cita_bd(nombre, telefono, motivo, doctor, fecha, hora):
-    """Guarda una nueva cita en la base de datos"""
-    try:
-        conexion = sqlite3.connect("pacientes.db")
-        cursor = conexion.cursor()
-        fecha_creacion = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-        
-        cursor.execute("""
-            INSERT INTO citas (nombre_paciente, telefono, motivo, doctor, fecha_cita, hora_cita, estado, fecha_creacion) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        """, (nombre, telefono, motivo, doctor, fecha, hora, 'Programada', fecha_creacion))
-        
-        conexion.commit()
-        conexion.close()
-        print(f"Cita guardada: {nombre} - {doctor} - {fecha} {hora}")  # Debug
-        return True
-    except Exception as e:
-        print(f"Error al guardar cita: {e}")  # Debug
-        return False
-
-def obtener_citas_bd():
-    """Obtiene todas las citas de la base de datos"""
-    try:
-        conexion = sqlite3.connect("pacientes.db")
-        cursor = conexion.cursor()
-        cursor.execute("SELECT * FROM citas ORDER BY fecha_cita, hora_cita")
-        datos = cursor.fetchall()
-        conexion.close()
-        print(f"Citas obtenidas de la BD: {len(datos)} registros")  # Debug
-        return datos
-    except Exception as e:
-        print(f"Error al obtener citas: {e}")  # Debug
-        return []
-
-def eliminar_cita_bd(id_cita):
-    """Elimina una cita de la base de datos"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("DELETE FROM citas WHERE id = ?", (id_cita,))
-    conexion.commit()
-    conexion.close()
-
-def consultar_citas_por_fecha(fecha):
-    """Consulta citas por una fecha específica"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT * FROM citas WHERE fecha_cita = ? ORDER BY hora_cita", (fecha,))
-    datos = cursor.fetchall()
-    conexion.close()
-    return datos
+from base_datos import (
+    conectar_bd, eliminar_paciente_bd,
+    actualizar_paciente_bd, consultar_paciente, obtener_atenciones_por_dia,
+    guardar_cita_bd, eliminar_cita_bd, consultar_citas_por_fecha,
+    resumen_tabla_bd, guardar_personal_bd, obtener_encodings_personal_bd,
+    rellenar_fechas_iso, CitaOcupada,
+)
+from agenda_citas import proximos_libres_bd
+from planificador_citas import sugerir_cita_bd
+from archivo_historico import consultar_paciente_historico
+from ejecutor_bd import EjecutorBD
+from escritura_agrupada import EscrituraAgrupada
+from importar_datos import importar_archivo
+from instrumentacion_bd import activar as activar_instrumentacion, formatear_reporte, reporte_consultas_bd
+from tabla_virtual import TablaVirtual
+from carga_escalonada import CargaEscalonada
+from fechas import formatear_fila, formatear_fecha_hora
+import registro
+
+# Mensajes de diagnóstico: por nivel, a consola, a elvis.log y a la
+# ventana de diagnóstico (ver registro.py). ELVIS_LOG=DEBUG los muestra todos
+log = logging.getLogger("interfaz")
 
 # ============================
 #   FUNCIONES CONTROL DE ASISTENCIA
 # ============================
-def guardar_personal_bd(nombre, cargo, codigo, foto_encoding):
-    """Guarda un miembro del personal en la base de datos"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    fecha_registro = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    
-    cursor.execute("""
-        INSERT INTO personal (nombre, cargo, codigo, foto_encoding, fecha_registro) 
-        VALUES (?, ?, ?, ?, ?)
-    """, (nombre, cargo, codigo, foto_encoding, fecha_registro))
-    
-    conexion.commit()
-    conexion.close()
-
-def obtener_personal_bd():
-    """Obtiene todos los miembros del personal registrados"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT * FROM personal WHERE activo = 1")
-    datos = cursor.fetchall()
-    conexion.close()
-    return datos
-
 def registrar_entrada_salida(nombre, cargo, tipo_registro, observaciones=""):
     """Registra entrada o salida del personal"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    fecha_actual = datetime.now().strftime("%d/%m/%Y")
-    hora_actual = datetime.now().strftime("%H:%M:%S")
-    
-    # Verificar si ya existe un registro para hoy
-    cursor.execute("SELECT * FROM asistencia WHERE nombre_personal = ? AND fecha = ?", 
-                   (nombre, fecha_actual))
-    registro_existente = cursor.fetchone()
-    
-    if registro_existente:
-        if tipo_registro == "entrada":
+    def registro_terminado(respuesta):
+        resultado, hora_actual = respuesta
+        if resultado == "ya_registrado":
             messagebox.showwarning("Ya registrado", f"{nombre} ya registró entrada hoy.")
-        else:  # salida
-            cursor.execute("""
-                UPDATE asistencia SET hora_salida = ?, observaciones = ? 
-                WHERE nombre_personal = ? AND fecha = ?
-            """, (hora_actual, observaciones, nombre, fecha_actual))
+        elif resultado == "salida":
             messagebox.showinfo("Salida registrada", f"Salida registrada para {nombre} a las {hora_actual}")
-    else:
-        if tipo_registro == "entrada":
-            cursor.execute("""
-                INSERT INTO asistencia (nombre_personal, cargo, fecha, hora_entrada, observaciones) 
-                VALUES (?, ?, ?, ?, ?)
-            """, (nombre, cargo, fecha_actual, hora_actual, observaciones))
+        elif resultado == "entrada":
             messagebox.showinfo("Entrada registrada", f"Entrada registrada para {nombre} a las {hora_actual}")
         else:
             messagebox.showwarning("Sin entrada", f"{nombre} no tiene entrada registrada para hoy.")
-    
-    conexion.commit()
-    conexion.close()
+        actualizar_tabla_asistencia()
 
-def obtener_asistencia_bd():
-    """Obtiene todos los registros de asistencia"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT * FROM asistencia ORDER BY fecha DESC, hora_entrada DESC")
-    datos = cursor.fetchall()
-    conexion.close()
-    return datos
+    # Se agrupa con otros registros simultáneos; el aviso sale cuando ya está en disco
+    ejecutor.seguir(escritura_agrupada.registrar_entrada_salida(nombre, cargo, tipo_registro, observaciones),
+                    al_terminar=registro_terminado, al_fallar=mostrar_error_bd)
 
 def capturar_rostro_para_registro():
     """Captura una foto para el registro de personal"""
+    cv2 = carga_diferida.modulo("cv2")
     if cv2 is None:
         messagebox.showerror("Error", "OpenCV no está instalado. Instale las dependencias con: pip install -r requirements.txt")
         return None
@@ -338,6 +135,7 @@ def capturar_rostro_para_registro():
 
 def procesar_rostro_capturado(imagen):
     """Procesa la imagen capturada para obtener el encoding facial"""
+    cv2, _, face_recognition, _, _ = carga_diferida.cargar()
     if cv2 is None or face_recognition is None:
         messagebox.showerror("Error", "Librerías de reconocimiento facial no están instaladas.")
         return None
@@ -370,12 +168,24 @@ def procesar_rostro_capturado(imagen):
         messagebox.showerror("Error", f"Error al procesar el rostro: {str(e)}")
         return None
 
-def reconocer_rostro():
-    """Reconoce un rostro usando la cámara"""
+def reconocer_rostro(al_reconocer):
+    """Reconoce un rostro usando la cámara y llama al_reconocer(nombre, cargo)"""
+    cv2, np, face_recognition, _, _ = carga_diferida.cargar()
     if cv2 is None or face_recognition is None or np is None:
         messagebox.showerror("Error", "Librerías de reconocimiento facial no están instaladas.")
-        return None
+        return
     
+    # Los encodings del personal se leen en segundo plano; la cámara se
+    # abre cuando llegan
+    def personal_leido(personal_data):
+        resultado = _reconocer_con_camara(cv2, np, face_recognition, personal_data)
+        if resultado:
+            al_reconocer(*resultado)
+    
+    ejecutor.leer(obtener_encodings_personal_bd, al_terminar=personal_leido, al_fallar=mostrar_error_bd)
+
+def _reconocer_con_camara(cv2, np, face_recognition, personal_data):
+    """Compara lo que ve la cámara con los encodings del personal; devuelve (nombre, cargo) o None"""
     cap = cv2.VideoCapture(0)
     
     if not cap.isOpened():
@@ -383,20 +193,18 @@ def reconocer_rostro():
         return None
     
     # Obtener todos los encodings del personal registrado
-    personal_data = obtener_personal_bd()
     known_encodings = []
     known_names = []
     known_cargos = []
     
-    for persona in personal_data:
-        if persona[4]:  # Si tiene foto_encoding
-            try:
-                encoding = pickle.loads(persona[4])
-                known_encodings.append(encoding)
-                known_names.append(persona[1])  # nombre
-                known_cargos.append(persona[2])  # cargo
-            except:
-                continue
+    for nombre_persona, cargo_persona, foto_encoding in personal_data:
+        try:
+            encoding = pickle.loads(foto_encoding)
+            known_encodings.append(encoding)
+            known_names.append(nombre_persona)
+            known_cargos.append(cargo_persona)
+        except:
+            continue
     
     if not known_encodings:
         messagebox.showwarning("Sin personal", "No hay personal registrado con fotos")
@@ -554,10 +362,84 @@ def imprimir():
     else:
         messagebox.showwarning("Vacío", "No hay contenido para imprimir.")
 
+def importar_datos():
+    """Importa pacientes o citas desde un archivo CSV/JSONL mostrando el progreso"""
+    if SERVIDOR:
+        messagebox.showinfo("Importar Datos", "Con el servicio remoto la importación se hace en el servidor:\n"
+                            "python importar_datos.py archivo.csv")
+        return
+    ruta = filedialog.askopenfilename(filetypes=[("CSV o JSONL", "*.csv *.jsonl *.gz"), ("Todos", "*.*")])
+    if not ruta:
+        return
+    
+    ventana_importar = tk.Toplevel(ventana)
+    ventana_importar.title("📥 Importar Datos")
+    ventana_importar.geometry("420x140")
+    ventana_importar.config(bg="#f0f8ff")
+    ventana_importar.resizable(False, False)
+    ventana_importar.transient(ventana)
+    tk.Label(ventana_importar, text=f"Importando {os.path.basename(ruta)}...", bg="#f0f8ff",
+             font=("Arial", 10, "bold"), fg="#2c5aa0").pack(pady=(15, 5))
+    barra = ttk.Progressbar(ventana_importar, length=360, maximum=1.0)
+    barra.pack(pady=5)
+    etiqueta = tk.Label(ventana_importar, text="", bg="#f0f8ff", font=("Arial", 9))
+    etiqueta.pack()
+    
+    # El hilo de importación solo escribe en este diccionario; la interfaz lo lee cada 100 ms
+    progreso = {"fraccion": 0.0, "filas": 0, "rechazadas": 0}
+    resultado = {}
+    
+    def al_progresar(fraccion, filas, rechazadas):
+        progreso.update(fraccion=fraccion, filas=filas, rechazadas=rechazadas)
+    
+    def trabajar():
+        try:
+            resultado["resumen"] = importar_archivo(ruta, al_progresar=al_progresar)
+        except Exception as e:
+            resultado["error"] = e
+    
+    def seguir():
+        barra["value"] = progreso["fraccion"]
+        etiqueta.config(text=f"{progreso['filas']} filas importadas, {progreso['rechazadas']} rechazadas")
+        if hilo.is_alive():
+            ventana_importar.after(100, seguir)
+            return
+        ventana_importar.destroy()
+        if "error" in resultado:
+            messagebox.showerror("Error", f"❌ No se pudo importar el archivo:\n{resultado['error']}")
+            return
+        resumen = resultado["resumen"]
+        if resumen.get("ya_importado"):
+            messagebox.showinfo("Importar", f"El archivo ya se había importado ({resumen['filas']} filas).")
+            return
+        mensaje = (f"✅ {resumen['filas']} filas importadas en {resumen['tabla']}\n"
+                   f"⏱️ {resumen['segundos']} s ({resumen['filas_por_segundo']} filas/s)")
+        if resumen["rechazadas"]:
+            mensaje += f"\n⚠️ {resumen['rechazadas']} registros rechazados (ver {ruta}.rechazados.jsonl)"
+        messagebox.showinfo("Importación terminada", mensaje)
+        actualizar_tabla()
+        actualizar_tabla_citas()
+        actualizar_calendario()
+    
+    # Hilo propio: cada lote toma el candado de escritura por separado, así
+    # que los registros normales siguen entrando entre lote y lote
+    hilo = threading.Thread(target=trabajar, daemon=True)
+    hilo.start()
+    seguir()
+
 def salir():
     if messagebox.askokcancel("Salir", "¿Deseas cerrar la aplicación?"):
+        # Terminar las escrituras en curso antes de destruir la ventana: sus
+        # callbacks no deben llegar a una raíz de Tk ya destruida
+        ejecutor.cerrar()
+        escritura_agrupada.cerrar()
+        log.info("Escritura agrupada: %s", escritura_agrupada.reporte())
         ventana.destroy()
 
+def mostrar_error_bd(error):
+    """Callback de error para las operaciones enviadas al ejecutor de base de datos"""
+    messagebox.showerror("Error", f"❌ Error en la base de datos:\n{str(error)}")
+
 # ============================
 #   FUNCIONES FECHA Y HORA
 # ============================
@@ -569,40 +451,44 @@ def actualizar_fecha_hora():
     label_hora.config(text=f"🕐 {hora_actual}")
     ventana.after(1000, actualizar_fecha_hora)  # Actualizar cada segundo
 
-def obtener_atenciones_por_dia():
-    """Obtiene el número de atenciones por día desde la base de datos"""
-    conexion = sqlite3.connect("pacientes.db")
-    cursor = conexion.cursor()
-    cursor.execute("SELECT fecha_atencion FROM pacientes")
-    fechas = cursor.fetchall()
-    conexion.close()
-    
-    # Contar atenciones por día
-    atenciones_por_dia = {}
-    for fecha_tupla in fechas:
-        fecha_str = fecha_tupla[0]
-        try:
-            # Parsear la fecha (formato: DD/MM/YYYY HH:MM:SS)
-            fecha_obj = datetime.strptime(fecha_str.split()[0], "%d/%m/%Y")
-            dia = fecha_obj.day
-            mes = fecha_obj.month
-            año = fecha_obj.year
-            
-            clave = (año, mes, dia)
-            atenciones_por_dia[clave] = atenciones_por_dia.get(clave, 0) + 1
-        except:
-            continue
-    
-    return atenciones_por_dia
+# Atenciones por día del mes mostrado: {dia: cantidad}. Se leen de la base
+# de datos una vez y después cada alta o baja las ajusta con ajustar_calendario()
+mes_calendario = None
+atenciones_mes_actual = {}
 
-def actualizar_calendario():
-    """Actualiza el calendario del mes actual con información de atenciones"""
+def actualizar_calendario(al_terminar=None, al_fallar=None):
+    """Vuelve a leer de la base de datos las atenciones del mes actual"""
     hoy = datetime.now()
-    mes_actual = hoy.month
-    año_actual = hoy.year
     
-    # Obtener datos de atenciones
-    atenciones_por_dia = obtener_atenciones_por_dia()
+    def atenciones_leidas(atenciones_por_dia):
+        global mes_calendario, atenciones_mes_actual
+        mes_calendario = (hoy.year, hoy.month)
+        atenciones_mes_actual = {dia: count for (año, mes, dia), count in atenciones_por_dia.items()}
+        pintar_calendario()
+        if al_terminar:
+            al_terminar(atenciones_por_dia)
+    
+    # Obtener datos de atenciones del mes (resumen diario mantenido por triggers)
+    ejecutor.leer(obtener_atenciones_por_dia, hoy.year, hoy.month, al_terminar=atenciones_leidas,
+                  al_fallar=al_fallar)
+
+def ajustar_calendario(fecha_iso, delta):
+    """Suma delta a las atenciones del día indicado y repinta sin consultar la base de datos"""
+    hoy = datetime.now()
+    if mes_calendario != (hoy.year, hoy.month):
+        actualizar_calendario()  # Aún sin cargar o cambió el mes: leer el mes (ya incluye este cambio)
+        return
+    if not fecha_iso or (int(fecha_iso[0:4]), int(fecha_iso[5:7])) != mes_calendario:
+        return
+    dia = int(fecha_iso[8:10])
+    atenciones_mes_actual[dia] = atenciones_mes_actual.get(dia, 0) + delta
+    if atenciones_mes_actual[dia] <= 0:
+        del atenciones_mes_actual[dia]
+    pintar_calendario()
+
+def pintar_calendario():
+    """Muestra el calendario del mes actual con las atenciones ya cargadas"""
+    año_actual, mes_actual = mes_calendario
     
     # Crear el calendario del mes actual
     cal_texto = calendar.month(año_actual, mes_actual)
@@ -616,12 +502,6 @@ def actualizar_calendario():
     texto_calendario.insert(tk.END, "📊 DÍAS CON MÁS ATENCIONES:\n")
     texto_calendario.insert(tk.END, "="*50 + "\n")
     
-    # Filtrar atenciones del mes actual
-    atenciones_mes_actual = {}
-    for (año, mes, dia), count in atenciones_por_dia.items():
-        if año == año_actual and mes == mes_actual:
-            atenciones_mes_actual[dia] = count
-    
     # Mostrar días con atenciones, ordenados por cantidad
     if atenciones_mes_actual:
         dias_ordenados = sorted(atenciones_mes_actual.items(), key=lambda x: x[1], reverse=True)
@@ -651,11 +531,9 @@ def actualizar_calendario():
 # ============================
 #   FUNCIONES PACIENTES
 # ============================
-def actualizar_tabla():
-    for fila in tabla_pacientes.get_children():
-        tabla_pacientes.delete(fila)
-    for fila in obtener_pacientes_bd():
-        tabla_pacientes.insert("", "end", values=fila)
+def actualizar_tabla(al_terminar=None, al_fallar=mostrar_error_bd):
+    """Vuelve a leer la primera página de pacientes sin bloquear la ventana"""
+    vista_pacientes.recargar_en_segundo_plano(ejecutor, al_terminar=al_terminar, al_fallar=al_fallar)
 
 def guardar_paciente():
     nombre = entry_nombre.get().strip()
@@ -674,10 +552,14 @@ def guardar_paciente():
         return
 
     fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    guardar_paciente_bd(nombre, edad, accidente, doctor, fecha_actual)
-    actualizar_tabla()
-    actualizar_calendario()  # Actualizar el calendario con las nuevas estadísticas
-    messagebox.showinfo("Paciente registrado", f"✅ Paciente '{nombre}' registrado correctamente.")
+    
+    def paciente_guardado(fila):
+        vista_pacientes.insertar_fila(fila)
+        ajustar_calendario(fila[5], +1)  # Actualizar el calendario con las nuevas estadísticas
+        messagebox.showinfo("Paciente registrado", f"✅ Paciente '{nombre}' registrado correctamente.")
+    
+    ejecutor.seguir(escritura_agrupada.guardar_paciente(nombre, edad, accidente, doctor, fecha_actual),
+                    al_terminar=paciente_guardado, al_fallar=mostrar_error_bd)
     entry_nombre.delete(0, tk.END)
     entry_edad.delete(0, tk.END)
     combo_accidente.set("")
@@ -695,51 +577,48 @@ def borrar_paciente():
     id_paciente = item["values"][0]
     nombre = item["values"][1]
     if messagebox.askyesno("Confirmar", f"¿Deseas borrar al paciente '{nombre}'?"):
-        eliminar_paciente_bd(id_paciente)
-        actualizar_tabla()
-        actualizar_calendario()  # Actualizar el calendario después de eliminar
-        messagebox.showinfo("Eliminado", f"🗑️ Paciente '{nombre}' eliminado correctamente.")
+        def paciente_borrado(fila):
+            vista_pacientes.eliminar_fila(id_paciente)
+            if fila:
+                ajustar_calendario(fila[5], -1)  # Actualizar el calendario después de eliminar
+            messagebox.showinfo("Eliminado", f"🗑️ Paciente '{nombre}' eliminado correctamente.")
+        
+        ejecutor.escribir(eliminar_paciente_bd, id_paciente, al_terminar=paciente_borrado,
+                          al_fallar=mostrar_error_bd)
 
-def buscar_paciente_tabla():
+def buscar_paciente_tabla(historico=False):
+    """Busca en los pacientes activos; con historico=True también en los archivados"""
     nombre = entry_buscar_paciente.get().strip()
     if not nombre:
         messagebox.showwarning("Campo vacío", "Por favor, ingresa un nombre para consultar.")
         return
 
-    resultados = consultar_paciente(nombre)
-    for fila in tabla_pacientes.get_children():
-        tabla_pacientes.delete(fila)
+    def resultados_leidos(resultados):
+        vista_pacientes.mostrar_fijas(resultados)
+        if not resultados:
+            messagebox.showinfo("Sin resultados", f"No se encontraron pacientes con el nombre '{nombre}'.")
 
-    if resultados:
-        for fila in resultados:
-            tabla_pacientes.insert("", "end", values=fila)
-    else:
-        messagebox.showinfo("Sin resultados", f"No se encontraron pacientes con el nombre '{nombre}'.")
+    consulta = consultar_paciente_historico if historico else consultar_paciente
+    ejecutor.leer(consulta, nombre, al_terminar=resultados_leidos, al_fallar=mostrar_error_bd)
 
 # ============================
 #   FUNCIONES INTERFAZ CITAS
 # ============================
-def actualizar_tabla_citas():
-    """Actualiza la tabla de citas"""
-    try:
-        print("Actualizando tabla de citas...")  # Debug
-        for fila in tabla_citas.get_children():
-            tabla_citas.delete(fila)
-        
-        citas_data = obtener_citas_bd()
-        print(f"Insertando {len(citas_data)} citas en la tabla")  # Debug
-        
-        for fila in citas_data:
-            tabla_citas.insert("", "end", values=fila)
-            print(f"Cita insertada: {fila}")  # Debug
-        
-        print("Tabla de citas actualizada correctamente")  # Debug
-    except NameError:
-        print("Tabla de citas no existe aún")  # Debug
-        # La tabla aún no se ha creado, se actualizará cuando se cree
-        pass
-    except Exception as e:
-        print(f"Error al actualizar tabla de citas: {e}")  # Debug
+def actualizar_tabla_citas(al_terminar=None, al_fallar=None):
+    """Actualiza la tabla de citas (la consulta corre en un hilo lector)"""
+    log.debug("Actualizando tabla de citas...")
+    
+    def citas_leidas(filas):
+        log.debug("Tabla de citas actualizada correctamente: %d citas visibles", len(filas))
+        if al_terminar:
+            al_terminar(filas)
+    
+    def citas_fallidas(error):
+        log.error("Error al actualizar tabla de citas: %s", error)
+        if al_fallar:
+            al_fallar(error)
+    
+    vista_citas.recargar_en_segundo_plano(ejecutor, al_terminar=citas_leidas, al_fallar=citas_fallidas)
 
 def reservar_cita():
     """Función principal para reservar una cita"""
@@ -825,14 +704,80 @@ def reservar_cita():
             messagebox.showerror("Error", "Formato de hora incorrecto. Usa HH:MM")
             return
         
-        # Guardar cita
-        if guardar_cita_bd(nombre, telefono, motivo, doctor, fecha, hora):
-            actualizar_tabla_citas()
-            actualizar_calendario()  # Actualizar estadísticas del calendario
-            messagebox.showinfo("Cita reservada", f"✅ Cita reservada exitosamente para {nombre}")
-            ventana_cita.destroy()
-        else:
-            messagebox.showerror("Error", "No se pudo guardar la cita. Verifique la consola para más detalles.")
+        def cita_guardada(fila):
+            if fila:
+                vista_citas.insertar_fila(fila)
+                messagebox.showinfo("Cita reservada", f"✅ Cita reservada exitosamente para {nombre}")
+                ventana_cita.destroy()
+            else:
+                messagebox.showerror("Error", "No se pudo guardar la cita. Verifique la consola para más detalles.")
+        
+        def cita_rechazada(error):
+            if isinstance(error, CitaOcupada):
+                messagebox.showwarning("Horario ocupado", f"⚠️ {error}.\n"
+                                       "Usa '🕒 Horario Libre' para ver los próximos horarios disponibles.")
+            else:
+                mostrar_error_bd(error)
+        
+        # Guardar cita (se rechaza si el doctor ya tiene otra cita en ese horario)
+        ejecutor.escribir(guardar_cita_bd, nombre, telefono, motivo, doctor, fecha, hora,
+                          al_terminar=cita_guardada, al_fallar=cita_rechazada)
+    
+    def buscar_horario_libre():
+        """Busca los próximos horarios libres del doctor y propone el primero"""
+        doctor = combo_doctor_cita.get()
+        if not doctor:
+            messagebox.showwarning("Sin doctor", "Por favor, elige un doctor.")
+            return
+        fecha = entry_fecha_cita.get().strip()
+        try:
+            desde = datetime.strptime(fecha, "%d/%m/%Y") if fecha else datetime.now()
+        except ValueError:
+            messagebox.showerror("Error", "Formato de fecha incorrecto. Usa DD/MM/YYYY")
+            return
+        desde = max(desde, datetime.now())
+        
+        def libres_leidos(libres):
+            if not libres:
+                messagebox.showinfo("Sin horarios", f"{doctor} no tiene horarios libres en los próximos días.")
+                return
+            primero = datetime.strptime(libres[0], "%Y-%m-%d %H:%M:%S")
+            entry_fecha_cita.delete(0, tk.END)
+            entry_fecha_cita.insert(0, primero.strftime("%d/%m/%Y"))
+            entry_hora_cita.delete(0, tk.END)
+            entry_hora_cita.insert(0, primero.strftime("%H:%M"))
+            messagebox.showinfo("Horarios libres", f"🕒 Próximos horarios libres de {doctor}:\n"
+                                + "\n".join(formatear_fecha_hora(libre)[:16] for libre in libres))
+        
+        ejecutor.leer(proximos_libres_bd, doctor, desde.strftime("%Y-%m-%d %H:%M:%S"), 5,
+                      al_terminar=libres_leidos, al_fallar=mostrar_error_bd)
+    
+    def asignar_automatico():
+        """Elige doctor y hora según el motivo, repartiendo la carga entre los doctores"""
+        motivo = entry_motivo_cita.get().strip()
+        if not motivo:
+            messagebox.showwarning("Sin motivo", "Por favor, escribe el motivo de la cita.")
+            return
+        fecha = entry_fecha_cita.get().strip() or datetime.now().strftime("%d/%m/%Y")
+        try:
+            datetime.strptime(fecha, "%d/%m/%Y")
+        except ValueError:
+            messagebox.showerror("Error", "Formato de fecha incorrecto. Usa DD/MM/YYYY")
+            return
+        
+        def sugerencia_leida(sugerencia):
+            if sugerencia is None:
+                messagebox.showinfo("Sin horarios", f"No quedan horarios libres el {fecha}. Prueba otro día.")
+                return
+            doctor, hora = sugerencia
+            combo_doctor_cita.set(doctor)
+            entry_fecha_cita.delete(0, tk.END)
+            entry_fecha_cita.insert(0, fecha)
+            entry_hora_cita.delete(0, tk.END)
+            entry_hora_cita.insert(0, hora)
+        
+        ejecutor.leer(sugerir_cita_bd, motivo, fecha, doctores_asignados,
+                      al_terminar=sugerencia_leida, al_fallar=mostrar_error_bd)
     
     # Botones
     frame_botones = tk.Frame(ventana_cita, bg="#e6f2ff")
@@ -840,6 +785,10 @@ def reservar_cita():
     
     tk.Button(frame_botones, text="💾 Reservar Cita", bg="#99ff99", font=("Arial", 10, "bold"), 
               command=guardar_cita).pack(side=tk.LEFT, padx=10)
+    tk.Button(frame_botones, text="🕒 Horario Libre", bg="#ffe082", font=("Arial", 10, "bold"), 
+              command=buscar_horario_libre).pack(side=tk.LEFT, padx=10)
+    tk.Button(frame_botones, text="🤖 Asignar Automático", bg="#b3e5fc", font=("Arial", 10, "bold"), 
+              command=asignar_automatico).pack(side=tk.LEFT, padx=10)
     tk.Button(frame_botones, text="❌ Cancelar", bg="#ff9999", font=("Arial", 10, "bold"), 
               command=ventana_cita.destroy).pack(side=tk.LEFT, padx=10)
 
@@ -856,10 +805,11 @@ def eliminar_cita():
     fecha = item["values"][5]
     
     if messagebox.askyesno("Confirmar", f"¿Deseas cancelar la cita de '{nombre}' del {fecha}?"):
-        eliminar_cita_bd(id_cita)
-        actualizar_tabla_citas()
-        actualizar_calendario()  # Actualizar estadísticas
-        messagebox.showinfo("Cita cancelada", f"🗑️ Cita de '{nombre}' cancelada correctamente.")
+        def cita_eliminada(_):
+            vista_citas.eliminar_fila(id_cita)
+            messagebox.showinfo("Cita cancelada", f"🗑️ Cita de '{nombre}' cancelada correctamente.")
+        
+        ejecutor.escribir(eliminar_cita_bd, id_cita, al_terminar=cita_eliminada, al_fallar=mostrar_error_bd)
 
 # ============================
 #   FUNCIONES INTERFAZ CONTROL DE ASISTENCIA
@@ -867,22 +817,15 @@ def eliminar_cita():
 def actualizar_tabla_personal():
     """Actualiza la tabla de personal"""
     try:
-        for fila in tabla_personal.get_children():
-            tabla_personal.delete(fila)
-        for fila in obtener_personal_bd():
-            # Mostrar solo ID, Nombre, Cargo, Código, Fecha (sin el encoding)
-            datos_mostrar = (fila[0], fila[1], fila[2], fila[3], fila[5])
-            tabla_personal.insert("", "end", values=datos_mostrar)
+        # Solo ID, Nombre, Cargo, Código, Fecha: el encoding no se lee
+        vista_personal.recargar_en_segundo_plano(ejecutor, al_fallar=mostrar_error_bd)
     except NameError:
         pass  # La tabla se creará cuando se abra la ventana de asistencia
 
 def actualizar_tabla_asistencia():
     """Actualiza la tabla de asistencia"""
     try:
-        for fila in tabla_asistencia.get_children():
-            tabla_asistencia.delete(fila)
-        for fila in obtener_asistencia_bd():
-            tabla_asistencia.insert("", "end", values=fila)
+        vista_asistencia.recargar_en_segundo_plano(ejecutor, al_fallar=mostrar_error_bd)
     except NameError:
         pass  # La tabla se creará cuando se abra la ventana de asistencia
 
@@ -958,13 +901,19 @@ def registrar_personal():
             messagebox.showwarning("Sin foto", "Por favor, captura una foto facial.")
             return
         
-        try:
-            guardar_personal_bd(nombre, cargo, codigo, foto_encoding)
+        def personal_guardado(_):
             actualizar_tabla_personal()
             messagebox.showinfo("Personal registrado", f"✅ Personal '{nombre}' registrado correctamente.")
             ventana_registro.destroy()
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "El código ya existe. Usa un código único.")
+
+        def personal_no_guardado(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "El código ya existe. Usa un código único.")
+            else:
+                mostrar_error_bd(error)
+
+        ejecutor.escribir(guardar_personal_bd, nombre, cargo, codigo, foto_encoding,
+                          al_terminar=personal_guardado, al_fallar=personal_no_guardado)
     
     # Botones
     frame_botones = tk.Frame(ventana_registro, bg="#f0f8ff")
@@ -977,6 +926,7 @@ def registrar_personal():
 
 def control_asistencia():
     """Función principal para el control de asistencia"""
+    global vista_asistencia, vista_personal
     ventana_asistencia = tk.Toplevel(ventana)
     ventana_asistencia.title("🕐 Control de Asistencia")
     ventana_asistencia.geometry("1000x700")
@@ -1010,6 +960,10 @@ def control_asistencia():
               font=("Arial", 12, "bold"), command=registrar_personal,
               width=20, height=2).pack(pady=10, padx=10)
     
+    tk.Button(frame_control, text="📊 Reporte del Mes", bg="#795548", fg="white",
+              font=("Arial", 12, "bold"), command=reporte_mensual,
+              width=20, height=2).pack(pady=10, padx=10)
+    
     # Panel derecho - Tablas
     frame_tablas = tk.Frame(frame_principal_asistencia, bg="#f0f8ff")
     frame_tablas.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
@@ -1038,84 +992,169 @@ def control_asistencia():
         tabla_personal.column(col, width=120, anchor="center")
     tabla_personal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
     
+    # Las tablas cargan por páginas desde la base de datos al desplazarse
+    vista_asistencia = TablaVirtual(tabla_asistencia, "asistencia", orden="fecha_iso", descendente=True,
+                                    formatear=lambda fila: formatear_fila(fila, columnas_fecha=(3,)),
+                                    fuente=fuente_datos, ejecutor=ejecutor)
+    vista_personal = TablaVirtual(tabla_personal, "personal", fuente=fuente_datos, ejecutor=ejecutor)
+    
     # Actualizar tablas
     actualizar_tabla_asistencia()
     actualizar_tabla_personal()
 
+def reporte_mensual():
+    """Muestra horas trabajadas, horas extra y tardanzas del mes actual por persona"""
+    if carga_diferida.modulo("numpy") is None:
+        messagebox.showerror("Error", "El reporte necesita numpy. Instálelo con: pip install numpy")
+        return
+    if SERVIDOR:
+        messagebox.showinfo("Reporte", "El reporte se genera en el servidor:\n"
+                            "python reporte_asistencia.py --año AAAA --mes MM")
+        return
+    from reporte_asistencia import COLUMNAS_REPORTE, reporte_asistencia_bd  # usa numpy
+    hoy = datetime.now()
+    
+    def reporte_leido(filas):
+        ventana_reporte = tk.Toplevel(ventana)
+        ventana_reporte.title(f"📊 Reporte de Asistencia {hoy.month:02d}/{hoy.year}")
+        ventana_reporte.geometry("900x400")
+        ventana_reporte.config(bg="#f0f8ff")
+        tabla_reporte = ttk.Treeview(ventana_reporte, columns=COLUMNAS_REPORTE, show="headings")
+        for col in COLUMNAS_REPORTE:
+            tabla_reporte.heading(col, text=col)
+            tabla_reporte.column(col, width=100, anchor="center")
+        tabla_reporte.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        for fila in filas:
+            tabla_reporte.insert("", tk.END, values=fila)
+        if not filas:
+            messagebox.showinfo("Reporte", "No hay marcas de asistencia este mes.", parent=ventana_reporte)
+    
+    ejecutor.leer(reporte_asistencia_bd, hoy.year, hoy.month,
+                  al_terminar=reporte_leido, al_fallar=mostrar_error_bd)
+
 def registrar_entrada_facial():
     """Registra entrada usando reconocimiento facial"""
-    resultado = reconocer_rostro()
-    if resultado:
-        nombre, cargo = resultado
-        registrar_entrada_salida(nombre, cargo, "entrada")
-        actualizar_tabla_asistencia()
+    reconocer_rostro(lambda nombre, cargo: registrar_entrada_salida(nombre, cargo, "entrada"))
 
 def registrar_salida_facial():
     """Registra salida usando reconocimiento facial"""
-    resultado = reconocer_rostro()
-    if resultado:
-        nombre, cargo = resultado
-        registrar_entrada_salida(nombre, cargo, "salida")
-        actualizar_tabla_asistencia()
+    reconocer_rostro(lambda nombre, cargo: registrar_entrada_salida(nombre, cargo, "salida"))
 
 def probar_base_datos_citas():
     """Función de prueba para verificar la base de datos de citas"""
-    try:
-        # Probar conexión
-        conexion = sqlite3.connect("pacientes.db")
-        cursor = conexion.cursor()
+    # Probar conexión y verificar si la tabla existe
+    ejecutor.leer(resumen_tabla_bd, "citas", al_terminar=mostrar_prueba_citas,
+                  al_fallar=lambda e: messagebox.showerror("Error", f"❌ Error al probar la base de datos:\n{str(e)}"))
+
+def mostrar_prueba_citas(resumen):
+    """Muestra el resultado de probar_base_datos_citas()"""
+    tabla_existe, count, columnas = resumen
+    if tabla_existe:
+        mensaje = f"✅ Base de datos funcionando correctamente\n\n"
+        mensaje += f"📊 Tabla 'citas' encontrada\n"
+        mensaje += f"📈 Registros en la tabla: {count}\n\n"
+        mensaje += f"🏗️ Estructura de la tabla:\n"
+        for col in columnas:
+            mensaje += f"   • {col[1]} ({col[2]})\n"
         
-        # Verificar si la tabla existe
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='citas'")
-        tabla_existe = cursor.fetchone()
+        messagebox.showinfo("Prueba de Base de Datos", mensaje)
         
-        if tabla_existe:
-            # Contar registros
-            cursor.execute("SELECT COUNT(*) FROM citas")
-            count = cursor.fetchone()[0]
-            
-            # Obtener estructura de la tabla
-            cursor.execute("PRAGMA table_info(citas)")
-            columnas = cursor.fetchall()
-            
-            conexion.close()
-            
-            mensaje = f"✅ Base de datos funcionando correctamente\n\n"
-            mensaje += f"📊 Tabla 'citas' encontrada\n"
-            mensaje += f"📈 Registros en la tabla: {count}\n\n"
-            mensaje += f"🏗️ Estructura de la tabla:\n"
-            for col in columnas:
-                mensaje += f"   • {col[1]} ({col[2]})\n"
-            
-            messagebox.showinfo("Prueba de Base de Datos", mensaje)
-            
-            # Actualizar la tabla
-            actualizar_tabla_citas()
-            
-        else:
-            conexion.close()
-            messagebox.showerror("Error", "❌ La tabla 'citas' no existe en la base de datos")
-            
-    except Exception as e:
-        messagebox.showerror("Error", f"❌ Error al probar la base de datos:\n{str(e)}")
+        # Actualizar la tabla
+        actualizar_tabla_citas()
+        
+    else:
+        messagebox.showerror("Error", "❌ La tabla 'citas' no existe en la base de datos")
+
+def mostrar_rendimiento_bd():
+    """Muestra las consultas que más tiempo llevan, con su plan de ejecución"""
+    ejecutor.leer(reporte_consultas_bd,
+                  al_terminar=lambda reporte: messagebox.showinfo("Rendimiento de la Base de Datos",
+                                                                  formatear_reporte(reporte)),
+                  al_fallar=mostrar_error_bd)
+
+def mostrar_diagnostico():
+    """Ventana con los últimos mensajes del registro en memoria, filtrables por nivel"""
+    ventana_diag = tk.Toplevel(ventana)
+    ventana_diag.title("🩺 Diagnóstico")
+    ventana_diag.geometry("900x450")
+    ventana_diag.config(bg="#f0f8ff")
+    
+    frame_opciones = tk.Frame(ventana_diag, bg="#f0f8ff")
+    frame_opciones.pack(fill=tk.X, padx=10, pady=5)
+    tk.Label(frame_opciones, text="Mostrar desde:", bg="#f0f8ff", font=("Arial", 9)).pack(side=tk.LEFT)
+    nivel_mostrado = tk.StringVar(value="DEBUG")
+    tk.OptionMenu(frame_opciones, nivel_mostrado, *registro.NIVELES,
+                  command=lambda _: pintar()).pack(side=tk.LEFT, padx=(5, 15))
+    # Registrar DEBUG solo mientras se diagnostica: apagado no cuesta nada
+    depurar = tk.BooleanVar(value=registro.nivel_actual() == "DEBUG")
+    tk.Checkbutton(frame_opciones, text="Registrar depuración (DEBUG)", variable=depurar, bg="#f0f8ff",
+                   command=lambda: registro.cambiar_nivel("DEBUG" if depurar.get() else "INFO")).pack(side=tk.LEFT)
+    tk.Button(frame_opciones, text="🔄 Actualizar", bg="#2196f3", fg="white", font=("Arial", 9, "bold"),
+              command=lambda: pintar()).pack(side=tk.RIGHT)
+    
+    texto_diag = tk.Text(ventana_diag, wrap=tk.NONE, font=("Consolas", 9))
+    texto_diag.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+    
+    def pintar():
+        texto_diag.delete(1.0, tk.END)
+        for entrada in registro.recientes(nivel_mostrado.get()):
+            texto_diag.insert(tk.END, registro.formatear(entrada) + "\n")
+        texto_diag.see(tk.END)
+    
+    pintar()
 
 # ============================
 #   INTERFAZ GRÁFICA ORDENADA
 # ============================
-# Verificar dependencias antes de inicializar la aplicación
-if not verificar_dependencias():
-    print("\n⚠️  ADVERTENCIA: Algunas dependencias no están instaladas.")
-    print("El sistema funcionará sin reconocimiento facial.")
-    print("Para habilitar todas las funciones, instale las dependencias.\n")
+registro.configurar()
+perfil_arranque.marcar("importaciones")
+
+def dependencias_precargadas(faltantes):
+    """Se llama en el hilo de precarga: solo registra, no toca la interfaz"""
+    if not verificar_dependencias(faltantes):
+        log.warning("El sistema funcionará sin reconocimiento facial. "
+                    "Para habilitar todas las funciones, instale las dependencias.")
 
 ventana = tk.Tk()
 from tkinter import PhotoImage
 ventana.title("MEDICAL CENTER - ELVIS ROJAS")
 ventana.geometry("1200x900")  # Ventana más amplia para mejor distribución
 ventana.config(bg="#f0f8ff")  # Fondo más suave
+perfil_arranque.marcar("ventana")
 ventana.resizable(False, False)
 
-conectar_bd()
+# Con ELVIS_SERVIDOR=host:puerto los datos vienen de servicio_clinica.py
+# en lugar de la pacientes.db local (varias recepciones, una sola base)
+SERVIDOR = os.environ.get("ELVIS_SERVIDOR")
+if SERVIDOR:
+    from cliente_servicio import ClienteServicio  # solo en modo remoto (importa http.client y asyncio)
+    remoto = ClienteServicio(SERVIDOR)
+    (eliminar_paciente_bd, actualizar_paciente_bd, consultar_paciente, obtener_atenciones_por_dia,
+     guardar_cita_bd, eliminar_cita_bd, consultar_citas_por_fecha, resumen_tabla_bd,
+     guardar_personal_bd, obtener_encodings_personal_bd, consultar_paciente_historico, proximos_libres_bd,
+     sugerir_cita_bd, reporte_consultas_bd) = (
+        remoto.funcion(nombre) for nombre in (
+            "eliminar_paciente_bd", "actualizar_paciente_bd", "consultar_paciente", "obtener_atenciones_por_dia",
+            "guardar_cita_bd", "eliminar_cita_bd", "consultar_citas_por_fecha", "resumen_tabla_bd",
+            "guardar_personal_bd", "obtener_encodings_personal_bd", "consultar_paciente_historico",
+            "proximos_libres_bd", "sugerir_cita_bd", "reporte_consultas_bd"))
+    fuente_datos = remoto
+    log.info("Usando el servicio remoto %s", SERVIDOR)
+else:
+    # Con ELVIS_INSTRUMENTAR=ms se mide cada consulta; las que tardan más van a consultas_lentas.log
+    if os.environ.get("ELVIS_INSTRUMENTAR"):
+        activar_instrumentacion(float(os.environ["ELVIS_INSTRUMENTAR"]))
+    # conectar_bd() (migraciones) corre después de mostrar la ventana: ver EJECUCIÓN
+    fuente_datos = None
+perfil_arranque.marcar("base_datos")
+
+# Las consultas y escrituras de los botones se hacen en hilos aparte;
+# sus resultados vuelven a la interfaz desde el bucle de Tk
+ejecutor = EjecutorBD()
+ejecutor.conectar_a_tk(ventana)
+# Altas de pacientes y marcas de asistencia: un commit durable por lote
+# (en modo remoto el servidor agrupa las de todas las recepciones)
+escritura_agrupada = remoto.escritura_agrupada() if SERVIDOR else EscrituraAgrupada()
 
 # ============================
 #   ENCABEZADO PRINCIPAL
@@ -1175,6 +1214,9 @@ tk.Button(frame_izquierdo, text="💾 Guardar", width=18,
 tk.Button(frame_izquierdo, text="🖨️ Imprimir", width=18, 
           bg="#ff9800", fg="white", font=("Arial", 9, "bold"),
           command=imprimir, relief="raised", bd=2).pack(pady=3)
+tk.Button(frame_izquierdo, text="📥 Importar Datos", width=18, 
+          bg="#2196f3", fg="white", font=("Arial", 9, "bold"),
+          command=importar_datos, relief="raised", bd=2).pack(pady=3)
 
 # Separador para control de asistencia
 tk.Frame(frame_izquierdo, bg="#2c5aa0", height=2).pack(fill=tk.X, pady=10)
@@ -1228,6 +1270,9 @@ for col in columnas:
     tabla_pacientes.heading(col, text=col)
     tabla_pacientes.column(col, width=120, anchor="center")
 tabla_pacientes.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+vista_pacientes = TablaVirtual(tabla_pacientes, "pacientes",
+                               formatear=lambda fila: formatear_fila(fila, columnas_fecha_hora=(5,)),
+                               fuente=fuente_datos, ejecutor=ejecutor)
 
 # ============================
 #   GESTIÓN DE CITAS
@@ -1244,6 +1289,9 @@ for col in columnas_citas:
     tabla_citas.heading(col, text=col)
     tabla_citas.column(col, width=90, anchor="center")
 tabla_citas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+vista_citas = TablaVirtual(tabla_citas, "citas", orden="fecha_hora_iso",
+                           formatear=lambda fila: formatear_fila(fila, columnas_fecha=(5,)),
+                           fuente=fuente_datos, ejecutor=ejecutor)
 
 # Botones para gestión de citas
 frame_botones_citas = tk.Frame(marco_tabla_citas, bg="#f0f8ff")
@@ -1255,9 +1303,10 @@ tk.Button(frame_botones_citas, text="🔄 Actualizar", bg="#2196f3", fg="white",
           font=("Arial", 9, "bold"), command=actualizar_tabla_citas).pack(side=tk.RIGHT, padx=(5, 0))
 tk.Button(frame_botones_citas, text="🧪 Prueba BD", bg="#ff9800", fg="white",
           font=("Arial", 9, "bold"), command=probar_base_datos_citas).pack(side=tk.RIGHT, padx=(5, 0))
-
-# Actualizar la tabla de citas después de crearla
-actualizar_tabla_citas()
+tk.Button(frame_botones_citas, text="📊 Rendimiento BD", bg="#607d8b", fg="white",
+          font=("Arial", 9, "bold"), command=mostrar_rendimiento_bd).pack(side=tk.RIGHT, padx=(5, 0))
+tk.Button(frame_botones_citas, text="🩺 Diagnóstico", bg="#795548", fg="white",
+          font=("Arial", 9, "bold"), command=mostrar_diagnostico).pack(side=tk.RIGHT, padx=(5, 0))
 
 # ============================
 #   FORMULARIO DE REGISTRO
@@ -1318,6 +1367,8 @@ entry_buscar_paciente = tk.Entry(frame_busqueda_pacientes, width=20, font=("Aria
 entry_buscar_paciente.pack(side=tk.LEFT, padx=(0, 10))
 tk.Button(frame_busqueda_pacientes, text="🔍 Consultar", bg="#ff9800", fg="white",
           font=("Arial", 9, "bold"), command=buscar_paciente_tabla).pack(side=tk.LEFT, padx=(0, 10))
+tk.Button(frame_busqueda_pacientes, text="📜 Histórico", bg="#795548", fg="white",
+          font=("Arial", 9, "bold"), command=lambda: buscar_paciente_tabla(historico=True)).pack(side=tk.LEFT, padx=(0, 10))
 tk.Button(frame_busqueda_pacientes, text="🔄 Mostrar Todos", bg="#9c27b0", fg="white",
           font=("Arial", 9, "bold"), command=actualizar_tabla).pack(side=tk.LEFT, padx=(0, 10))
 
@@ -1365,10 +1416,35 @@ btn_actualizar_calendario.pack(pady=(0, 10))
 # ============================
 #   EJECUCIÓN
 # ============================
-actualizar_tabla()
-actualizar_tabla_citas()  # Actualizar tabla de citas
+perfil_arranque.marcar("interfaz")
 actualizar_fecha_hora()  # Iniciar la actualización de fecha y hora
-actualizar_calendario()  # Mostrar el calendario
+texto_calendario.insert(tk.END, "Cargando calendario…\n")
+
+def conectar_en_segundo_plano(listo, fallo):
+    """Migraciones en el hilo escritor; después, las fechas ISO antiguas en su propio hilo"""
+    def conectada(_):
+        # Completar en segundo plano las fechas ISO de filas antiguas
+        threading.Thread(target=rellenar_fechas_iso, daemon=True).start()
+        listo()
+    ejecutor.escribir(conectar_bd, al_terminar=conectada, al_fallar=fallo)
+
+def arranque_terminado():
+    """Datos cargados: guardar el perfil y cargar lo del reconocimiento facial"""
+    perfil_arranque.terminar()
+    ventana.after(PAUSA_PRECARGA_MS, lambda: carga_diferida.precargar(dependencias_precargadas))
+
+# La ventana se dibuja con las tablas vacías y los datos llegan por etapas
+# desde los hilos del ejecutor (cada etapa queda en el perfil de arranque)
+carga_inicial = CargaEscalonada(al_terminar=arranque_terminado, al_fallar=mostrar_error_bd)
+if not SERVIDOR:
+    carga_inicial.fase(base_datos=conectar_en_segundo_plano)
+carga_inicial.fase(
+    tabla_pacientes=lambda listo, fallo: actualizar_tabla(al_terminar=listo, al_fallar=fallo),
+    tabla_citas=lambda listo, fallo: actualizar_tabla_citas(al_terminar=listo, al_fallar=fallo),
+    calendario=lambda listo, fallo: actualizar_calendario(al_terminar=listo, al_fallar=fallo),
+)
+ventana.after_idle(lambda: perfil_arranque.marcar("ventana_visible"))
+carga_inicial.empezar()
 
 # Mensaje de bienvenida
 messagebox.showinfo("Bienvenido", 
@@ -1439,7 +1515,18 @@ def actualizar_paciente():
         return
 
     fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    actualizar_paciente_bd(paciente_seleccionado, nombre, edad, accidente, doctor, fecha_actual)
+    
+    def paciente_actualizado(filas):
+        anterior, fila = filas
+        if fila:
+            vista_pacientes.actualizar_fila(fila)
+            # La atención pasa a la fecha actual: mover una unidad de día en el calendario
+            ajustar_calendario(anterior[5], -1)
+            ajustar_calendario(fila[5], +1)
+        messagebox.showinfo("Paciente actualizado", f"✅ Paciente '{nombre}' actualizado correctamente.")
+    
+    ejecutor.escribir(actualizar_paciente_bd, paciente_seleccionado, nombre, edad, accidente, doctor, fecha_actual,
+                      al_terminar=paciente_actualizado, al_fallar=mostrar_error_bd)
     
     # Restablecer el botón de guardar
     for widget in frame_botones_principales.winfo_children():
@@ -1455,7 +1542,3 @@ def actualizar_paciente():
     entry_doctor.config(state="readonly")
     
     paciente_seleccionado = None
-    
-    actualizar_tabla()
-    actualizar_calendario()
-    messagebox.showinfo("Paciente actualizado", f"✅ Paciente '{nombre}' actualizado correctamente.")
@@ -0,0 +1,160 @@
+# ============================
+#   AGENDA DE DOCTORES (ÍNDICE DE HORARIOS)
+# ============================
+# Índice en memoria de las citas por doctor y por día. Para cada
+# (doctor, día) se guardan las citas ordenadas por hora de inicio
+# (minutos desde la medianoche) en listas paralelas de inicios, fines e
+# ids, así que saber si un horario choca es un acceso al diccionario más
+# una búsqueda binaria (bisect) en las citas de ese día.
+#   - choque(): cita que se superpone con un horario, o None.
+#   - proximos_libres(): los N primeros horarios libres de un doctor
+#     desde un momento dado, dentro del horario de atención.
+# guardar_cita_bd() hace la misma comprobación en SQL dentro de su
+# transacción (con el índice (doctor, fecha_hora_iso)), que es la que
+# vale cuando varias recepciones reservan a la vez; este índice sirve
+# para buscar horarios libres sin recorrer las citas una por una.
+# Se supone que ninguna cita cruza la medianoche.
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from base_datos import DURACION_CITA_MIN, DURACION_MAXIMA_MIN, obtener_gestor
+
+HORARIO_ATENCION = (8 * 60, 18 * 60)    # 08:00 a 18:00, en minutos desde la medianoche
+DIAS_ATENCION = (0, 1, 2, 3, 4, 5)      # lunes a sábado (date.weekday())
+DIAS_BUSQUEDA = 60                      # hasta cuántos días adelante buscar horarios libres
+
+def _minuto(momento):
+    return momento.hour * 60 + momento.minute
+
+class IndiceAgenda:
+    """Citas de cada doctor por día, ordenadas por hora de inicio"""
+
+    def __init__(self):
+        self._dias = {}     # (doctor, ordinal del día) -> ([inicios], [fines], [ids])
+        self.citas = 0
+
+    # ============================
+    #   ALTAS Y BAJAS
+    # ============================
+    def agregar(self, doctor, inicio, duracion=DURACION_CITA_MIN, id_cita=None):
+        """Agrega una cita (inicio: datetime). No comprueba choques: ver choque()"""
+        inicios, fines, ids = self._dias.setdefault((doctor, inicio.toordinal()), ([], [], []))
+        minuto = _minuto(inicio)
+        posicion = bisect_right(inicios, minuto)
+        inicios.insert(posicion, minuto)
+        fines.insert(posicion, minuto + duracion)
+        ids.insert(posicion, id_cita)
+        self.citas += 1
+
+    def quitar(self, doctor, inicio, id_cita=None):
+        """Quita la cita que empieza en inicio (la de id_cita si hay varias). Devuelve True si estaba"""
+        dia = self._dias.get((doctor, inicio.toordinal()))
+        if not dia:
+            return False
+        inicios, fines, ids = dia
+        minuto = _minuto(inicio)
+        for posicion in range(bisect_left(inicios, minuto), bisect_right(inicios, minuto)):
+            if id_cita is None or ids[posicion] == id_cita:
+                del inicios[posicion], fines[posicion], ids[posicion]
+                self.citas -= 1
+                return True
+        return False
+
+    # ============================
+    #   CONSULTAS
+    # ============================
+    def _choque(self, doctor, ordinal, minuto, duracion):
+        dia = self._dias.get((doctor, ordinal))
+        if not dia:
+            return None
+        inicios, fines, ids = dia
+        # Candidatas: las que empiezan antes del fin pedido. Solo las que
+        # empezaron hace menos de DURACION_MAXIMA_MIN pueden seguir en curso
+        posicion = bisect_left(inicios, minuto + duracion) - 1
+        while posicion >= 0 and inicios[posicion] > minuto - DURACION_MAXIMA_MIN:
+            if fines[posicion] > minuto:
+                return ids[posicion], inicios[posicion], fines[posicion]
+            posicion -= 1
+        return None
+
+    def choque(self, doctor, inicio, duracion=DURACION_CITA_MIN):
+        """(id, minuto de inicio, minuto de fin) de una cita que se superpone, o None si está libre"""
+        return self._choque(doctor, inicio.toordinal(), _minuto(inicio), duracion)
+
+    def citas_del_dia(self, doctor, dia):
+        """[(minuto de inicio, minuto de fin, id)] del doctor ese día (dia: date)"""
+        inicios, fines, ids = self._dias.get((doctor, dia.toordinal()), ((), (), ()))
+        return list(zip(inicios, fines, ids))
+
+    def primer_libre(self, doctor, dia, desde, hasta, duracion=DURACION_CITA_MIN, paso=None,
+                     origen=HORARIO_ATENCION[0]):
+        """Primer minuto libre del día (dia: date) con la cita entera dentro de [desde, hasta), o None.
+
+        Los candidatos son origen + k * paso (por defecto paso = duración).
+        Cuando uno choca se salta directamente al primer candidato después
+        del fin de la cita que lo ocupa, sin probar los intermedios.
+        """
+        paso = paso or duracion
+        ordinal = dia.toordinal()
+        minuto = origen + -(-(desde - origen) // paso) * paso
+        while minuto + duracion <= hasta:
+            ocupado = self._choque(doctor, ordinal, minuto, duracion)
+            if ocupado is None:
+                return minuto
+            minuto = origen + -(-(ocupado[2] - origen) // paso) * paso
+        return None
+
+    def proximos_libres(self, doctor, desde, n=5, duracion=DURACION_CITA_MIN, paso=None,
+                        horario=HORARIO_ATENCION, dias=DIAS_ATENCION, limite_dias=DIAS_BUSQUEDA):
+        """Los n primeros horarios libres (datetime) del doctor a partir de desde (datetime)"""
+        paso = paso or duracion
+        abre, cierra = horario
+        libres = []
+        dia = desde.date()
+        for _ in range(limite_dias):
+            if dia.weekday() in dias:
+                minuto = max(abre, _minuto(desde)) if dia == desde.date() else abre
+                while len(libres) < n:
+                    minuto = self.primer_libre(doctor, dia, minuto, cierra, duracion, paso, abre)
+                    if minuto is None:
+                        break
+                    libres.append(datetime.combine(dia, datetime.min.time()) + timedelta(minutes=minuto))
+                    minuto += paso
+                if len(libres) == n:
+                    return libres
+            dia += timedelta(days=1)
+        return libres
+
+# ============================
+#   CARGA DESDE LA BASE DE DATOS
+# ============================
+def cargar_agenda(doctor=None, rango=None):
+    """IndiceAgenda con las citas de la base (opcionalmente de un doctor y/o rango ISO [inicio, fin))"""
+    condiciones = ["fecha_hora_iso <> ''"]
+    parametros = [DURACION_CITA_MIN]
+    if doctor is not None:
+        condiciones.append("doctor = ?")
+        parametros.append(doctor)
+    if rango is not None:
+        condiciones.append("fecha_hora_iso >= ? AND fecha_hora_iso < ?")
+        parametros += list(rango)
+    filas = obtener_gestor().lectura().execute(
+        f"SELECT id, doctor, fecha_hora_iso, IFNULL(duracion_min, ?) FROM citas "
+        f"WHERE {' AND '.join(condiciones)} ORDER BY doctor, fecha_hora_iso", parametros)
+
+    indice = IndiceAgenda()
+    for id_cita, doctor_cita, fecha_hora_iso, duracion in filas:
+        indice.agregar(doctor_cita, datetime.strptime(fecha_hora_iso, "%Y-%m-%d %H:%M:%S"), duracion, id_cita)
+    return indice
+
+def proximos_libres_bd(doctor, desde=None, n=5, duracion=DURACION_CITA_MIN):
+    """Los n próximos horarios libres del doctor como texto ISO 'YYYY-MM-DD HH:MM:SS'.
+
+    desde: texto ISO (por defecto ahora). Solo se leen las citas del doctor
+    de los próximos DIAS_BUSQUEDA días, por el índice (doctor, fecha_hora_iso).
+    """
+    inicio = datetime.strptime(desde, "%Y-%m-%d %H:%M:%S") if desde else datetime.now()
+    rango = (inicio.date().isoformat(), (inicio.date() + timedelta(days=DIAS_BUSQUEDA + 1)).isoformat())
+    indice = cargar_agenda(doctor, rango)
+    return [libre.strftime("%Y-%m-%d %H:%M:%S")
+            for libre in indice.proximos_libres(doctor, inicio, n, duracion)]
@@ -0,0 +1,244 @@
+# ============================
+#   ARCHIVO HISTÓRICO (DATOS ACTIVOS / ARCHIVADOS)
+# ============================
+# pacientes y asistencia solo crecen. Este módulo mueve las filas más
+# antiguas que un horizonte (por defecto un año) a pacientes_archive.db,
+# junto a pacientes.db, para que las pantallas normales trabajen solo con
+# el conjunto activo y este quepa en la caché de páginas.
+#   - archivar() mueve por lotes, cada uno en dos transacciones: primero
+#     copia al archivo (INSERT OR IGNORE, se confirma con synchronous=FULL)
+#     y después borra de la base activa solo las filas que el archivo ya
+#     tiene idénticas. SQLite no confirma de forma atómica una transacción
+#     que escribe en dos archivos WAL, así que ninguna lo hace: si el
+#     proceso se corta entre las dos, la fila queda en ambas bases (nunca
+#     en ninguna) y la próxima ejecución termina el lote sin duplicar.
+#   - El archivo se ATTACHa solo mientras se usa (al archivar y en las
+#     búsquedas históricas) y se vuelve a separar al terminar.
+#   - daily_counts sigue contando todo el historial: lo que descuentan
+#     los triggers al borrar se vuelve a sumar en el mismo lote.
+#
+# Uso:
+#   python archivo_historico.py --dias 365
+import argparse
+import os
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import base_datos
+from base_datos import COLUMNAS_ASISTENCIA, COLUMNAS_PACIENTES, PESOS_BUSQUEDA, consulta_fts, consultar_paciente
+from base_datos import conectar_bd, configurar_bd, obtener_gestor
+from migraciones import CONTEOS_DIARIOS
+
+NOMBRE_ARCHIVO = "pacientes_archive.db"
+DIAS_ACTIVOS = 365
+LOTE = 5000
+
+# Tablas archivables y su columna de fecha ISO
+TABLAS_ARCHIVABLES = {"pacientes": "fecha_atencion_iso", "asistencia": "fecha_iso"}
+COLUMNAS_VISTA = {"pacientes": COLUMNAS_PACIENTES, "asistencia": COLUMNAS_ASISTENCIA}
+
+def ruta_archivo():
+    """pacientes_archive.db en la misma carpeta que la base de datos activa"""
+    return os.path.join(os.path.dirname(os.path.abspath(base_datos.RUTA_BD)), NOMBRE_ARCHIVO)
+
+# ============================
+#   ATTACH BAJO DEMANDA
+# ============================
+@contextmanager
+def adjuntar_archivo(conexion):
+    """ATTACH del archivo como 'archivo' mientras dura el bloque"""
+    conexion.execute("ATTACH DATABASE ? AS archivo", (ruta_archivo(),))
+    try:
+        yield conexion
+    finally:
+        conexion.execute("DETACH DATABASE archivo")
+
+def _preparar_archivo(conexion):
+    """Crea o completa en el archivo las tablas, índices y el índice FTS"""
+    for tabla, columna_fecha in TABLAS_ARCHIVABLES.items():
+        columnas = conexion.execute(f"PRAGMA main.table_info({tabla})").fetchall()
+        existentes = {col[1] for col in conexion.execute(f"PRAGMA archivo.table_info({tabla})")}
+        if not existentes:
+            definicion = ", ".join(
+                "id INTEGER PRIMARY KEY" if nombre == "id" else f"{nombre} {tipo}"
+                for _, nombre, tipo, *_ in columnas)
+            conexion.execute(f"CREATE TABLE archivo.{tabla} ({definicion})")
+        else:
+            # Columnas agregadas a la base activa por migraciones posteriores
+            for _, nombre, tipo, *_ in columnas:
+                if nombre not in existentes:
+                    conexion.execute(f"ALTER TABLE archivo.{tabla} ADD COLUMN {nombre} {tipo}")
+        conexion.execute(f"CREATE INDEX IF NOT EXISTS archivo.idx_{tabla}_fecha ON {tabla} ({columna_fecha})")
+
+    conexion.execute("CREATE INDEX IF NOT EXISTS archivo.idx_asistencia_personal ON asistencia (nombre_personal)")
+    # Mismo índice de texto que la base activa (migración 4), mantenido por triggers
+    conexion.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS archivo.pacientes_fts USING fts5(
+            nombre, accidente, doctor_asignado,
+            content='pacientes', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2",
+            prefix='2 3'
+        )
+    """)
+    conexion.execute("""
+        CREATE TRIGGER IF NOT EXISTS archivo.pacientes_fts_insert AFTER INSERT ON pacientes BEGIN
+            INSERT INTO pacientes_fts (rowid, nombre, accidente, doctor_asignado)
+            VALUES (new.id, new.nombre, new.accidente, new.doctor_asignado);
+        END
+    """)
+
+# ============================
+#   MOVER FILAS AL ARCHIVO
+# ============================
+def _columnas(conexion, tabla):
+    return [col[1] for col in conexion.execute(f"PRAGMA main.table_info({tabla})")]
+
+def _copiar_lote(conexion, tabla, columna_fecha, corte, lote):
+    """Primera transacción (solo escribe en el archivo): copia un lote y devuelve sus ids"""
+    ids = [fila[0] for fila in conexion.execute(
+        f"SELECT id FROM main.{tabla} WHERE {columna_fecha} < ? AND {columna_fecha} <> '' LIMIT ?",
+        (corte, lote))]
+    if not ids:
+        return ids
+    marcadores = ", ".join("?" * len(ids))
+    columnas = _columnas(conexion, tabla)
+    # Copias de un intento cortado cuya fila activa se editó después: se
+    # descartan para volver a copiarlas (con su entrada del índice FTS)
+    distinta = " OR ".join(f"a.{col} IS NOT m.{col}" for col in columnas)
+    viejas = [fila[0] for fila in conexion.execute(
+        f"SELECT a.id FROM archivo.{tabla} a JOIN main.{tabla} m ON m.id = a.id "
+        f"WHERE a.id IN ({marcadores}) AND ({distinta})", ids)]
+    if viejas:
+        marcadores_viejas = ", ".join("?" * len(viejas))
+        if tabla == "pacientes":
+            conexion.execute(f"""
+                INSERT INTO archivo.pacientes_fts (pacientes_fts, rowid, nombre, accidente, doctor_asignado)
+                SELECT 'delete', id, nombre, accidente, doctor_asignado FROM archivo.pacientes
+                WHERE id IN ({marcadores_viejas})
+            """, viejas)
+        conexion.execute(f"DELETE FROM archivo.{tabla} WHERE id IN ({marcadores_viejas})", viejas)
+    lista = ", ".join(columnas)
+    conexion.execute(f"INSERT OR IGNORE INTO archivo.{tabla} ({lista}) "
+                     f"SELECT {lista} FROM main.{tabla} WHERE id IN ({marcadores})", ids)
+    return ids
+
+def _borrar_lote(conexion, tabla, ids):
+    """Segunda transacción (solo escribe en la base activa): borra las filas ya archivadas.
+
+    Solo se borran las que el archivo tiene con los mismos valores: si
+    alguien editó la fila entre las dos transacciones, se queda en la base
+    activa. Devuelve cuántas se borraron.
+    """
+    marcadores = ", ".join("?" * len(ids))
+    iguales = " AND ".join(f"a.{col} IS m.{col}" for col in _columnas(conexion, tabla))
+    borradas = [fila[0] for fila in conexion.execute(
+        f"DELETE FROM main.{tabla} AS m WHERE id IN ({marcadores}) "
+        f"AND EXISTS (SELECT 1 FROM archivo.{tabla} a WHERE a.id = m.id AND {iguales}) RETURNING id", ids)]
+
+    # Los triggers de daily_counts descontaron estas filas: volver a sumarlas
+    conteo = dict(CONTEOS_DIARIOS).get(tabla)
+    if conteo and borradas:
+        conexion.execute(f"""
+            INSERT INTO main.daily_counts (tipo, dia, cantidad)
+            SELECT '{tabla}', substr({conteo}, 1, 10), COUNT(*) FROM archivo.{tabla}
+            WHERE id IN ({", ".join("?" * len(borradas))}) AND {conteo} <> '' GROUP BY 2
+            ON CONFLICT (tipo, dia) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+        """, borradas)
+    return len(borradas)
+
+def archivar(dias=DIAS_ACTIVOS, lote=LOTE, al_progresar=None):
+    """Mueve al archivo las filas con fecha anterior a hoy - dias. Devuelve {tabla: filas movidas}"""
+    corte = (date.today() - timedelta(days=dias)).isoformat()
+    gestor = obtener_gestor()
+    movidas = {}
+    with gestor.escritura(inmediata=False) as conexion:
+        conexion.execute("ATTACH DATABASE ? AS archivo", (ruta_archivo(),))
+        conexion.execute("PRAGMA archivo.journal_mode = WAL")
+        # La copia tiene que ser durable antes de borrar el original
+        conexion.execute("PRAGMA archivo.synchronous = FULL")
+    with gestor.escritura() as conexion:
+        _preparar_archivo(conexion)
+    try:
+        for tabla, columna_fecha in TABLAS_ARCHIVABLES.items():
+            movidas[tabla] = 0
+            while True:
+                # Transacciones cortas para no retener el candado de escritura
+                with gestor.escritura() as conexion:
+                    ids = _copiar_lote(conexion, tabla, columna_fecha, corte, lote)
+                if not ids:
+                    break
+                with gestor.escritura() as conexion:
+                    cantidad = _borrar_lote(conexion, tabla, ids)
+                if not cantidad:
+                    break   # todo el lote se editó entre las dos transacciones: queda para otra vez
+                movidas[tabla] += cantidad
+                if al_progresar:
+                    al_progresar(tabla, movidas[tabla])
+    finally:
+        with gestor.escritura(inmediata=False) as conexion:
+            conexion.execute("DETACH DATABASE archivo")
+    return movidas
+
+# ============================
+#   CONSULTAS HISTÓRICAS
+# ============================
+def _hay_archivo():
+    return os.path.exists(ruta_archivo())
+
+def consultar_paciente_historico(nombre, columnas=("nombre",), limite=500):
+    """Como consultar_paciente(), pero también busca en los pacientes archivados"""
+    activos = consultar_paciente(nombre, columnas, limite)
+    consulta = consulta_fts(nombre, columnas)
+    if not consulta or len(activos) >= limite or not _hay_archivo():
+        return activos
+    columnas_vista = ", ".join(f"p.{col.strip()}" for col in COLUMNAS_PACIENTES.split(","))
+    with adjuntar_archivo(obtener_gestor().lectura()) as conexion:
+        archivados = conexion.execute(f"""
+            SELECT {columnas_vista} FROM archivo.pacientes_fts
+            JOIN archivo.pacientes p ON p.id = pacientes_fts.rowid
+            WHERE pacientes_fts MATCH ?
+            ORDER BY bm25(pacientes_fts, ?, ?, ?)
+            LIMIT ?
+        """, (consulta, *PESOS_BUSQUEDA, limite - len(activos))).fetchall()
+    vistos = {fila[0] for fila in activos}
+    return activos + [fila for fila in archivados if fila[0] not in vistos]
+
+def consultar_historico(tabla, rango, descendente=True):
+    """Filas de la tabla en el rango ISO [inicio, fin), uniendo la base activa y el archivo"""
+    if tabla not in TABLAS_ARCHIVABLES:
+        raise ValueError(f"Tabla no archivable: {tabla}")
+    columna_fecha = TABLAS_ARCHIVABLES[tabla]
+    columnas = COLUMNAS_VISTA[tabla]
+    sentido = "DESC" if descendente else "ASC"
+    consulta = f"SELECT {columnas} FROM main.{tabla} WHERE {columna_fecha} >= ? AND {columna_fecha} < ?"
+    conexion = obtener_gestor().lectura()
+    if not _hay_archivo():
+        return conexion.execute(f"{consulta} ORDER BY {columna_fecha} {sentido}, id {sentido}", rango).fetchall()
+    with adjuntar_archivo(conexion):
+        # UNION (no UNION ALL): si un lote quedó a medio mover, la fila sale una sola vez
+        return conexion.execute(f"""
+            {consulta}
+            UNION
+            SELECT {columnas} FROM archivo.{tabla} WHERE {columna_fecha} >= ? AND {columna_fecha} < ?
+            ORDER BY {columna_fecha} {sentido}, id {sentido}
+        """, (*rango, *rango)).fetchall()
+
+# ============================
+#   LÍNEA DE COMANDOS
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Mueve pacientes y asistencia antiguos a pacientes_archive.db")
+    parser.add_argument("--dias", type=int, default=DIAS_ACTIVOS, help="días que se mantienen en la base activa")
+    parser.add_argument("--lote", type=int, default=LOTE, help="filas movidas por transacción")
+    parser.add_argument("--bd", default=None, help="archivo de base de datos (por defecto pacientes.db)")
+    args = parser.parse_args()
+
+    if args.bd:
+        configurar_bd(args.bd)
+    conectar_bd()
+    movidas = archivar(args.dias, args.lote)
+    for tabla, cantidad in movidas.items():
+        print(f"{tabla}: {cantidad} filas movidas a {ruta_archivo()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+# ============================
+#   CAPA DE DATOS - MEDICAL CENTER
+# ============================
+# Funciones de acceso a pacientes.db usadas por TRABAJO ELVIS.py.
+# Todas pasan por un gestor de conexiones compartido por el proceso:
+# una conexión de escritura protegida por un candado y una conexión de
+# lectura por hilo, ambas abiertas una sola vez y en modo WAL.
+#
+# Varios procesos (dos copias de la interfaz, el servicio, scripts
+# sueltos) pueden usar el mismo archivo: cada escritura empieza con
+# BEGIN IMMEDIATE, que toma el candado de escritura de SQLite antes de
+# leer nada; si otro proceso lo tiene se espera busy_timeout y luego se
+# reintenta con pausas aleatorias crecientes antes de rendirse.
+import atexit
+import logging
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from fechas import a_iso_fecha, a_iso_fecha_hora, rango_dia, rango_mes, rango_semana
+from migraciones import VERSION_ESQUEMA, migrar, version_actual
+
+log = logging.getLogger(__name__)
+
+RUTA_BD = "pacientes.db"
+
+# Sentencias preparadas que sqlite3 mantiene en caché por conexión
+TAMANO_CACHE_SENTENCIAS = 256
+
+# Clase de las conexiones que se abren; instrumentacion_bd la cambia por
+# una que mide cada sentencia (apagada, son conexiones sqlite3 normales)
+FABRICA_CONEXION = sqlite3.Connection
+
+# Pragmas aplicados a cada conexión al abrirla
+PRAGMAS_CONEXION = (
+    "PRAGMA journal_mode = WAL",       # lectores no bloquean al escritor
+    "PRAGMA synchronous = NORMAL",     # seguro en WAL, un fsync por checkpoint
+    "PRAGMA cache_size = -20000",      # ~20 MB de caché de páginas
+    "PRAGMA mmap_size = 268435456",    # 256 MB mapeados en memoria
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Espera de SQLite cuando otro proceso tiene el candado (PRAGMA busy_timeout)
+ESPERA_BLOQUEO_MS = 5000
+# Reintentos de BEGIN IMMEDIATE después de agotar la espera, con pausas
+# aleatorias entre 0 y PAUSA_REINTENTO_S * 2**intento
+REINTENTOS_ESCRITURA = 3
+PAUSA_REINTENTO_S = 0.05
+
+def esta_bloqueada(error):
+    """True si el error es "database is locked" o "database is busy" (otro proceso escribe)"""
+    return isinstance(error, sqlite3.OperationalError) and (
+        "locked" in str(error) or "busy" in str(error))
+
+# ============================
+#   GESTOR DE CONEXIONES
+# ============================
+class GestorConexiones:
+    """Mantiene abiertas las conexiones a la base de datos durante todo el proceso"""
+
+    def __init__(self, ruta=RUTA_BD, espera_bloqueo_ms=ESPERA_BLOQUEO_MS, reintentos=REINTENTOS_ESCRITURA):
+        self.ruta = ruta
+        self.espera_bloqueo_ms = espera_bloqueo_ms
+        self.reintentos = reintentos
+        self._esperas = Counter()       # ms esperando el candado (potencia de 2) -> veces
+        self._reintentos_hechos = 0
+        self._fallos_bloqueo = 0
+        self._candado_escritura = threading.RLock()
+        self._conexion_escritura = None
+        self._locales = threading.local()
+        self._lecturas = []
+        self._candado_lecturas = threading.Lock()
+
+    def _abrir(self, solo_lectura=False):
+        conexion = sqlite3.connect(self.ruta, check_same_thread=False, factory=FABRICA_CONEXION,
+                                   cached_statements=TAMANO_CACHE_SENTENCIAS)
+        for pragma in PRAGMAS_CONEXION:
+            conexion.execute(pragma)
+        conexion.execute(f"PRAGMA busy_timeout = {int(self.espera_bloqueo_ms)}")
+        if solo_lectura:
+            conexion.execute("PRAGMA query_only = ON")
+        return conexion
+
+    def lectura(self):
+        """Devuelve la conexión de lectura del hilo actual (una por hilo)"""
+        conexion = getattr(self._locales, "conexion", None)
+        if conexion is None:
+            conexion = self._abrir(solo_lectura=True)
+            self._locales.conexion = conexion
+            with self._candado_lecturas:
+                self._lecturas.append(conexion)
+        return conexion
+
+    def _comenzar(self, conexion):
+        """BEGIN IMMEDIATE con reintentos si otro proceso tiene el candado"""
+        inicio = time.perf_counter()
+        intento = 0
+        try:
+            while True:
+                try:
+                    conexion.execute("BEGIN IMMEDIATE")
+                    return
+                except sqlite3.OperationalError as e:
+                    if not esta_bloqueada(e) or intento >= self.reintentos:
+                        if esta_bloqueada(e):
+                            self._fallos_bloqueo += 1
+                        raise
+                intento += 1
+                self._reintentos_hechos += 1
+                time.sleep(random.uniform(0, PAUSA_REINTENTO_S * 2 ** intento))
+        finally:
+            espera_ms = (time.perf_counter() - inicio) * 1000
+            self._esperas[(1 << int(espera_ms).bit_length()) if espera_ms >= 1 else 0] += 1
+
+    @contextmanager
+    def escritura(self, durable=False, inmediata=True):
+        """Entrega la conexión de escritura; confirma al salir o revierte si hay error
+
+        Con durable=True el commit no termina hasta que el WAL está en disco
+        (synchronous = FULL); por defecto basta con NORMAL. Con
+        inmediata=False no se abre la transacción (para ATTACH, DETACH o
+        pragmas que no se permiten dentro de una).
+        """
+        with self._candado_escritura:
+            if self._conexion_escritura is None:
+                self._conexion_escritura = self._abrir()
+            conexion = self._conexion_escritura
+            if durable:
+                conexion.execute("PRAGMA synchronous = FULL")
+            try:
+                if inmediata and not conexion.in_transaction:
+                    self._comenzar(conexion)
+                yield conexion
+                conexion.commit()
+            except BaseException:
+                conexion.rollback()
+                raise
+            finally:
+                if durable:
+                    conexion.execute("PRAGMA synchronous = NORMAL")
+
+    def estadisticas_bloqueo(self):
+        """Esperas por el candado de escritura (histograma en ms por límite superior), reintentos y fallos"""
+        with self._candado_escritura:
+            esperas = dict(sorted(self._esperas.items()))
+        return {"esperas_ms": {("<1" if limite == 0 else f"<{limite}"): veces for limite, veces in esperas.items()},
+                "reintentos": self._reintentos_hechos, "fallos": self._fallos_bloqueo}
+
+    def cerrar(self):
+        """Cierra todas las conexiones abiertas por el gestor"""
+        with self._candado_escritura:
+            if self._conexion_escritura is not None:
+                self._conexion_escritura.close()
+                self._conexion_escritura = None
+        with self._candado_lecturas:
+            for conexion in self._lecturas:
+                try:
+                    conexion.close()
+                except sqlite3.ProgrammingError:
+                    pass
+            self._lecturas.clear()
+        self._locales = threading.local()
+
+
+_gestor = None
+_candado_gestor = threading.Lock()
+
+def obtener_gestor():
+    """Devuelve el gestor de conexiones del proceso, creándolo la primera vez"""
+    global _gestor
+    if _gestor is None:
+        with _candado_gestor:
+            if _gestor is None:
+                _gestor = GestorConexiones(RUTA_BD)
+    return _gestor
+
+def configurar_bd(ruta, espera_bloqueo_ms=ESPERA_BLOQUEO_MS, reintentos=REINTENTOS_ESCRITURA):
+    """Cambia el archivo de base de datos (y la espera por bloqueos) usado por el proceso"""
+    global RUTA_BD, _gestor
+    with _candado_gestor:
+        if _gestor is not None:
+            _gestor.cerrar()
+        RUTA_BD = ruta
+        _gestor = GestorConexiones(ruta, espera_bloqueo_ms, reintentos)
+    return _gestor
+
+def cerrar_bd():
+    """Cierra las conexiones del proceso (se llama también al salir)"""
+    if _gestor is not None:
+        _gestor.cerrar()
+
+atexit.register(cerrar_bd)
+
+# ============================
+#   CONEXIÓN BASE DE DATOS
+# ============================
+def conectar_bd():
+    """Crea o actualiza el esquema de la base de datos mediante migraciones"""
+    gestor = obtener_gestor()
+    # Con el esquema al día (el arranque normal) basta una lectura y no se
+    # toma el candado de escritura; migrar() abre su propia transacción
+    # IMMEDIATE por migración y vuelve a comprobar la versión dentro
+    if version_actual(gestor.lectura()) >= VERSION_ESQUEMA:
+        return
+    with gestor.escritura(inmediata=False) as conexion:
+        migrar(conexion)
+
+# Columnas que muestran las tablas de la interfaz. Las fechas salen en ISO
+# y se formatean a DD/MM/YYYY con fechas.formatear_fila() al mostrarlas.
+COLUMNAS_PACIENTES = "id, nombre, edad, accidente, doctor_asignado, fecha_atencion_iso"
+COLUMNAS_CITAS = "id, nombre_paciente, telefono, motivo, doctor, fecha_hora_iso, hora_cita, estado"
+COLUMNAS_ASISTENCIA = "id, nombre_personal, cargo, fecha_iso, hora_entrada, hora_salida, estado, observaciones"
+COLUMNAS_PERSONAL = "id, nombre, cargo, codigo, fecha_registro"
+
+# ============================
+#   FUNCIONES PACIENTES
+# ============================
+# Las funciones de escritura devuelven la fila afectada (con el id en la
+# posición 0 y las mismas columnas que las vistas) para que la interfaz
+# actualice solo ese elemento en lugar de recargar la tabla.
+def insertar_paciente(conexion, nombre, edad, accidente, doctor, fecha):
+    """INSERT de un paciente en una transacción ya abierta; devuelve su fila"""
+    return conexion.execute(
+        "INSERT INTO pacientes (nombre, edad, accidente, doctor_asignado, fecha_atencion, fecha_atencion_iso) "
+        f"VALUES (?, ?, ?, ?, ?, ?) RETURNING {COLUMNAS_PACIENTES}",
+        (nombre, edad, accidente, doctor, fecha, a_iso_fecha_hora(fecha))).fetchone()
+
+def guardar_paciente_bd(nombre, edad, accidente, doctor, fecha):
+    """Inserta un paciente y devuelve su fila"""
+    with obtener_gestor().escritura() as conexion:
+        return insertar_paciente(conexion, nombre, edad, accidente, doctor, fecha)
+
+def obtener_pacientes_bd():
+    return obtener_gestor().lectura().execute(f"SELECT {COLUMNAS_PACIENTES} FROM pacientes").fetchall()
+
+def eliminar_paciente_bd(id_paciente):
+    """Borra un paciente y devuelve la fila borrada (None si no existía)"""
+    with obtener_gestor().escritura() as conexion:
+        return conexion.execute(
+            f"DELETE FROM pacientes WHERE id = ? RETURNING {COLUMNAS_PACIENTES}", (id_paciente,)).fetchone()
+
+def actualizar_paciente_bd(id_paciente, nombre, edad, accidente, doctor, fecha):
+    """Actualiza un paciente y devuelve (fila_anterior, fila_nueva), o (None, None) si no existía"""
+    with obtener_gestor().escritura() as conexion:
+        anterior = conexion.execute(
+            f"SELECT {COLUMNAS_PACIENTES} FROM pacientes WHERE id = ?", (id_paciente,)).fetchone()
+        nueva = conexion.execute(
+            "UPDATE pacientes SET nombre = ?, edad = ?, accidente = ?, doctor_asignado = ?, "
+            f"fecha_atencion = ?, fecha_atencion_iso = ? WHERE id = ? RETURNING {COLUMNAS_PACIENTES}",
+            (nombre, edad, accidente, doctor, fecha, a_iso_fecha_hora(fecha), id_paciente)).fetchone()
+        return anterior, nueva
+
+# Peso de cada columna de pacientes_fts en el ranking bm25 (nombre, accidente, doctor)
+PESOS_BUSQUEDA = (10.0, 2.0, 1.0)
+
+# Si una búsqueda tiene más coincidencias que esto no se ordena por
+# relevancia (habría que puntuarlas todas) y se muestran las más recientes
+UMBRAL_RANKING = 2000
+
+def consulta_fts(texto, columnas=("nombre",)):
+    """Convierte lo que escribe el usuario en una consulta FTS5.
+
+    Las palabras completas se buscan tal cual y la última como prefijo,
+    porque es la que se está escribiendo: 'jose per' ->
+    '{nombre} : ("jose" AND "per"*)'. Las comillas evitan que caracteres
+    como - o : se interpreten como operadores. Devuelve '' si no hay palabras.
+    """
+    palabras = [p.replace('"', '""') for p in texto.split() if any(c.isalnum() for c in p)]
+    if not palabras:
+        return ""
+    terminos = [f'"{palabra}"' for palabra in palabras[:-1]] + [f'"{palabras[-1]}"*']
+    return f"{{{' '.join(columnas)}}} : ({' AND '.join(terminos)})"
+
+def consultar_paciente(nombre, columnas=("nombre",), limite=500):
+    """Busca pacientes ordenados por relevancia.
+
+    Por defecto solo en el nombre; con columnas=("nombre", "accidente",
+    "doctor_asignado") busca también por accidente y doctor.
+    """
+    consulta = consulta_fts(nombre, columnas)
+    if not consulta:
+        return []
+    conexion = obtener_gestor().lectura()
+    columnas_vista = ", ".join(f"p.{col.strip()}" for col in COLUMNAS_PACIENTES.split(","))
+
+    # Sondeo barato: FTS5 entrega las coincidencias en orden de rowid sin puntuarlas
+    ids = [fila[0] for fila in conexion.execute(
+        "SELECT rowid FROM pacientes_fts WHERE pacientes_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+        (consulta, UMBRAL_RANKING + 1))]
+    if len(ids) > UMBRAL_RANKING:
+        ids = ids[:limite]
+        marcadores = ", ".join("?" * len(ids))
+        return conexion.execute(
+            f"SELECT {columnas_vista} FROM pacientes p WHERE p.id IN ({marcadores}) ORDER BY p.id DESC",
+            ids).fetchall()
+
+    return conexion.execute(f"""
+        SELECT {columnas_vista} FROM pacientes_fts
+        JOIN pacientes p ON p.id = pacientes_fts.rowid
+        WHERE pacientes_fts MATCH ?
+        ORDER BY bm25(pacientes_fts, ?, ?, ?)
+        LIMIT ?
+    """, (consulta, *PESOS_BUSQUEDA, limite)).fetchall()
+
+def obtener_conteos_por_dia(año, mes, tipo="pacientes"):
+    """Lee de daily_counts las filas del mes (31 como máximo): {(año, mes, dia): cantidad}
+
+    tipo: "pacientes" o "citas". Los triggers de la migración 6 mantienen
+    los totales al día, así que no se recorre el historial.
+    """
+    inicio, fin = rango_mes(año, mes)
+    filas = obtener_gestor().lectura().execute(
+        "SELECT dia, cantidad FROM daily_counts WHERE tipo = ? AND dia >= ? AND dia < ?",
+        (tipo, inicio, fin)).fetchall()
+    return {(año, mes, int(dia[8:10])): cantidad for dia, cantidad in filas}
+
+def obtener_atenciones_por_dia(año, mes):
+    """Obtiene el número de atenciones por día del mes indicado: {(año, mes, dia): cantidad}"""
+    return obtener_conteos_por_dia(año, mes, "pacientes")
+
+# ============================
+#   FUNCIONES CITAS
+# ============================
+# Duración de una cita cuando no se indica otra (minutos). Ninguna cita
+# dura más de DURACION_MAXIMA_MIN: así basta mirar ese tanto hacia atrás
+# para saber si una cita anterior todavía ocupa el horario pedido.
+DURACION_CITA_MIN = 30
+DURACION_MAXIMA_MIN = 240
+
+class CitaOcupada(Exception):
+    """El doctor ya tiene una cita que se superpone con el horario pedido"""
+
+    def __init__(self, mensaje, cita=None):
+        super().__init__(mensaje)
+        self.cita = cita        # fila (COLUMNAS_CITAS) de la cita que ocupa el horario
+
+def buscar_choque_cita(conexion, doctor, inicio_iso, duracion=DURACION_CITA_MIN, excluir_id=None):
+    """Cita del doctor que se superpone con [inicio, inicio + duración), o None.
+
+    Recorre el índice (doctor, fecha_hora_iso) solo en la franja
+    [inicio - DURACION_MAXIMA_MIN, fin): búsqueda logarítmica más las
+    pocas citas de esa franja.
+    """
+    inicio = datetime.strptime(inicio_iso, "%Y-%m-%d %H:%M:%S")
+    desde = (inicio - timedelta(minutes=DURACION_MAXIMA_MIN)).strftime("%Y-%m-%d %H:%M:%S")
+    fin = (inicio + timedelta(minutes=duracion)).strftime("%Y-%m-%d %H:%M:%S")
+    return conexion.execute(f"""
+        SELECT {COLUMNAS_CITAS} FROM citas
+        WHERE doctor = ? AND fecha_hora_iso > ? AND fecha_hora_iso < ?
+          AND datetime(fecha_hora_iso, '+' || IFNULL(duracion_min, ?) || ' minutes') > ?
+          AND id IS NOT ?
+        LIMIT 1
+    """, (doctor, desde, fin, DURACION_CITA_MIN, inicio_iso, excluir_id)).fetchone()
+
+def insertar_cita(conexion, nombre, telefono, motivo, doctor, fecha, hora, duracion=DURACION_CITA_MIN):
+    """Comprueba el horario e inserta una cita en una transacción ya abierta; devuelve su fila.
+
+    Lanza CitaOcupada si el doctor ya tiene otra cita en ese horario.
+    """
+    if not 0 < duracion <= DURACION_MAXIMA_MIN:
+        raise ValueError(f"La duración debe estar entre 1 y {DURACION_MAXIMA_MIN} minutos")
+    fecha_hora_iso = a_iso_fecha_hora(fecha, hora)
+    choque = fecha_hora_iso and buscar_choque_cita(conexion, doctor, fecha_hora_iso, duracion)
+    if choque:
+        raise CitaOcupada(f"{doctor} ya tiene una cita a las {choque[6]} con {choque[1]}", choque)
+    return conexion.execute(f"""
+        INSERT INTO citas (nombre_paciente, telefono, motivo, doctor, fecha_cita, hora_cita, estado,
+                           fecha_creacion, fecha_hora_iso, duracion_min)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        RETURNING {COLUMNAS_CITAS}
+    """, (nombre, telefono, motivo, doctor, fecha, hora, 'Programada',
+          datetime.now().strftime("%d/%m/%Y %H:%M:%S"), fecha_hora_iso, duracion)).fetchone()
+
+def guardar_cita_bd(nombre, telefono, motivo, doctor, fecha, hora, duracion=DURACION_CITA_MIN):
+    """Guarda una nueva cita y devuelve su fila, o None si hubo un error.
+
+    Lanza CitaOcupada si el doctor ya tiene otra cita en ese horario. La
+    comprobación y el INSERT van en la misma transacción (BEGIN IMMEDIATE),
+    así dos recepciones no pueden reservar el mismo horario a la vez.
+    """
+    try:
+        with obtener_gestor().escritura() as conexion:
+            fila = insertar_cita(conexion, nombre, telefono, motivo, doctor, fecha, hora, duracion)
+        log.debug("Cita guardada: %s - %s - %s %s", nombre, doctor, fecha, hora)
+        return fila
+    except CitaOcupada:
+        raise
+    except Exception as e:
+        log.error("Error al guardar cita: %s", e)
+        return None
+
+def obtener_citas_bd():
+    """Obtiene todas las citas de la base de datos"""
+    try:
+        datos = obtener_gestor().lectura().execute(
+            f"SELECT {COLUMNAS_CITAS} FROM citas ORDER BY fecha_hora_iso").fetchall()
+        log.debug("Citas obtenidas de la BD: %d registros", len(datos))
+        return datos
+    except Exception as e:
+        log.error("Error al obtener citas: %s", e)
+        return []
+
+def eliminar_cita_bd(id_cita):
+    """Elimina una cita y devuelve la fila borrada (None si no existía)"""
+    with obtener_gestor().escritura() as conexion:
+        return conexion.execute(
+            f"DELETE FROM citas WHERE id = ? RETURNING {COLUMNAS_CITAS}", (id_cita,)).fetchone()
+
+def _citas_en_rango(inicio, fin):
+    cursor = obtener_gestor().lectura().execute(
+        f"SELECT {COLUMNAS_CITAS} FROM citas WHERE fecha_hora_iso >= ? AND fecha_hora_iso < ? "
+        "ORDER BY fecha_hora_iso", (inicio, fin))
+    return cursor.fetchall()
+
+def consultar_citas_por_fecha(fecha):
+    """Consulta citas por una fecha específica (DD/MM/YYYY)"""
+    dia = datetime.strptime(a_iso_fecha(fecha), "%Y-%m-%d").date()
+    return _citas_en_rango(*rango_dia(dia))
+
+def obtener_citas_semana_bd(dia=None):
+    """Obtiene las citas de la semana (lunes a domingo) que contiene el día indicado"""
+    return _citas_en_rango(*rango_semana(dia))
+
+def resumen_tabla_bd(tabla):
+    """Devuelve (existe, número de filas, columnas) de una tabla, para diagnóstico"""
+    conexion = obtener_gestor().lectura()
+    existe = conexion.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (tabla,)).fetchone()
+    if not existe:
+        return False, 0, []
+    count = conexion.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    columnas = conexion.execute(f"PRAGMA table_info({tabla})").fetchall()
+    return True, count, columnas
+
+# ============================
+#   FUNCIONES CONTROL DE ASISTENCIA
+# ============================
+def guardar_personal_bd(nombre, cargo, codigo, foto_encoding):
+    """Guarda un miembro del personal en la base de datos"""
+    fecha_registro = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    with obtener_gestor().escritura() as conexion:
+        conexion.execute("""
+            INSERT INTO personal (nombre, cargo, codigo, foto_encoding, fecha_registro)
+            VALUES (?, ?, ?, ?, ?)
+        """, (nombre, cargo, codigo, foto_encoding, fecha_registro))
+
+def obtener_personal_bd():
+    """Obtiene todos los miembros del personal registrados (sin la foto)"""
+    return obtener_gestor().lectura().execute(
+        f"SELECT {COLUMNAS_PERSONAL} FROM personal WHERE activo = 1").fetchall()
+
+def obtener_encodings_personal_bd():
+    """Obtiene (nombre, cargo, foto_encoding) del personal con foto, para el reconocimiento"""
+    return obtener_gestor().lectura().execute(
+        "SELECT nombre, cargo, foto_encoding FROM personal WHERE activo = 1 AND foto_encoding IS NOT NULL"
+    ).fetchall()
+
+# Una sola sentencia por marca, por el índice único (nombre_personal, fecha).
+# La entrada solo completa un registro sin hora de entrada o adelanta una
+# posterior (una marca reproducida fuera de orden); si no, no devuelve fila.
+SQL_ENTRADA = """
+    INSERT INTO asistencia (nombre_personal, cargo, fecha, hora_entrada, observaciones, fecha_iso)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (nombre_personal, fecha) DO UPDATE SET hora_entrada = excluded.hora_entrada
+    WHERE hora_entrada IS NULL OR excluded.hora_entrada < hora_entrada
+    RETURNING hora_entrada
+"""
+SQL_SALIDA = """
+    UPDATE asistencia SET hora_salida = ?, observaciones = ?
+    WHERE nombre_personal = ? AND fecha = ?
+    RETURNING hora_entrada
+"""
+# Al reproducir marcas encoladas la salida puede llegar antes que la
+# entrada (de otro quiosco): se guarda igual y gana la salida más tardía
+SQL_SALIDA_REPRODUCIDA = """
+    INSERT INTO asistencia (nombre_personal, cargo, fecha, hora_salida, observaciones, fecha_iso)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (nombre_personal, fecha) DO UPDATE SET
+        hora_salida = excluded.hora_salida, observaciones = excluded.observaciones
+    WHERE hora_salida IS NULL OR excluded.hora_salida > hora_salida
+    RETURNING hora_entrada
+"""
+
+def registrar_asistencia(conexion, nombre, cargo, tipo_registro, observaciones="", ahora=None):
+    """Entrada o salida del personal en una transacción ya abierta. Ver registrar_entrada_salida_bd()"""
+    ahora = ahora or datetime.now()
+    fecha_actual = ahora.strftime("%d/%m/%Y")
+    hora_actual = ahora.strftime("%H:%M:%S")
+
+    if tipo_registro == "entrada":
+        fila = conexion.execute(SQL_ENTRADA, (nombre, cargo, fecha_actual, hora_actual, observaciones,
+                                              ahora.strftime("%Y-%m-%d"))).fetchone()
+        return ("entrada" if fila else "ya_registrado"), hora_actual
+    fila = conexion.execute(SQL_SALIDA, (hora_actual, observaciones, nombre, fecha_actual)).fetchone()
+    return ("salida" if fila else "sin_entrada"), hora_actual
+
+def registrar_entrada_salida_bd(nombre, cargo, tipo_registro, observaciones=""):
+    """Registra entrada o salida del personal.
+
+    Devuelve (resultado, hora) donde resultado es "entrada", "salida",
+    "ya_registrado" o "sin_entrada".
+    """
+    with obtener_gestor().escritura() as conexion:
+        return registrar_asistencia(conexion, nombre, cargo, tipo_registro, observaciones)
+
+def reproducir_asistencia_bd(eventos):
+    """Guarda en una transacción marcas encoladas (p. ej. de un quiosco sin conexión).
+
+    eventos: [(nombre, cargo, tipo_registro, momento, observaciones)] con
+    momento 'YYYY-MM-DD HH:MM:SS'. El orden no importa: queda la primera
+    entrada y la última salida de cada día. Devuelve [(resultado, hora)]
+    por evento; una salida sin entrada todavía se guarda y da "sin_entrada".
+    """
+    resultados = []
+    with obtener_gestor().escritura() as conexion:
+        for nombre, cargo, tipo_registro, momento, observaciones in eventos:
+            momento = datetime.strptime(momento, "%Y-%m-%d %H:%M:%S")
+            fecha, hora = momento.strftime("%d/%m/%Y"), momento.strftime("%H:%M:%S")
+            sql = SQL_ENTRADA if tipo_registro == "entrada" else SQL_SALIDA_REPRODUCIDA
+            fila = conexion.execute(sql, (nombre, cargo, fecha, hora, observaciones or "",
+                                          momento.strftime("%Y-%m-%d"))).fetchone()
+            if fila is None:
+                resultados.append(("ya_registrado", hora))
+            elif tipo_registro == "entrada":
+                resultados.append(("entrada", hora))
+            else:
+                resultados.append(("salida" if fila[0] else "sin_entrada", hora))
+    log.debug("Marcas de asistencia reproducidas: %d", len(resultados))
+    return resultados
+
+def obtener_asistencia_bd():
+    """Obtiene todos los registros de asistencia"""
+    return obtener_gestor().lectura().execute(
+        f"SELECT {COLUMNAS_ASISTENCIA} FROM asistencia ORDER BY fecha_iso DESC, hora_entrada DESC").fetchall()
+
+def obtener_asistencia_mes_bd(año, mes):
+    """Obtiene los registros de asistencia de un mes"""
+    inicio, fin = rango_mes(año, mes)
+    return obtener_gestor().lectura().execute(
+        f"SELECT {COLUMNAS_ASISTENCIA} FROM asistencia WHERE fecha_iso >= ? AND fecha_iso < ? "
+        "ORDER BY fecha_iso DESC, hora_entrada DESC", (inicio, fin)).fetchall()
+
+# ============================
+#   RELLENO DE FECHAS ISO
+# ============================
+# (tabla, columna ISO, expresión con la fecha antigua, conversión)
+COLUMNAS_ISO = (
+    ("pacientes", "fecha_atencion_iso", "fecha_atencion", a_iso_fecha_hora),
+    ("citas", "fecha_hora_iso", "fecha_cita || ' ' || hora_cita", a_iso_fecha_hora),
+    ("asistencia", "fecha_iso", "fecha", a_iso_fecha),
+)
+
+def rellenar_fechas_iso(lote=2000):
+    """Completa por lotes las fechas ISO que falten (filas antiguas o de otras apps).
+
+    Cada lote es una transacción corta, así la aplicación puede seguir
+    escribiendo mientras tanto. Devuelve el número de filas actualizadas.
+    """
+    total = 0
+    gestor = obtener_gestor()
+    for tabla, columna_iso, expresion, convertir in COLUMNAS_ISO:
+        while True:
+            with gestor.escritura() as conexion:
+                filas = conexion.execute(
+                    f"SELECT id, {expresion} FROM {tabla} WHERE {columna_iso} IS NULL LIMIT ?",
+                    (lote,)).fetchall()
+                # Las fechas que no se pueden interpretar quedan como '' para no reintentarlas
+                conexion.executemany(
+                    f"UPDATE {tabla} SET {columna_iso} = ? WHERE id = ?",
+                    [(convertir(texto), id_fila) for id_fila, texto in filas])
+            total += len(filas)
+            if len(filas) < lote:
+                break
+    return total
@@ -0,0 +1,130 @@
+# ============================
+#   BENCHMARK DE LA AGENDA DE DOCTORES
+# ============================
+# Genera un calendario de 5 años con decenas de doctores (siempre el
+# mismo, con semilla fija) y mide:
+#   - construir el índice por doctor y día (agenda_citas.IndiceAgenda)
+#   - comprobar choques con el índice y recorriendo la lista de citas del
+#     doctor (lo que se hacía a ojo sobre tabla_citas)
+#   - buscar los próximos N horarios libres
+#   - con --sql, la comprobación de guardar_cita_bd (buscar_choque_cita)
+#     sobre una base temporal con las mismas citas
+# Uso: python benchmark_agenda.py [--doctores 40] [--años 5] [--sql]
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import base_datos
+from agenda_citas import DIAS_ATENCION, HORARIO_ATENCION, IndiceAgenda
+
+DURACIONES = (30, 30, 30, 60)       # la mayoría de las citas duran 30 minutos
+
+def generar_calendario(doctores, años, semilla=2024):
+    """Lista de (doctor, inicio, duración) sin choques, determinista"""
+    azar = random.Random(semilla)
+    abre, cierra = HORARIO_ATENCION
+    citas = []
+    dia = date(2020, 1, 1)
+    fin = date(2020 + años, 1, 1)
+    while dia < fin:
+        if dia.weekday() in DIAS_ATENCION:
+            base = datetime.combine(dia, datetime.min.time())
+            for numero in range(doctores):
+                minuto = abre
+                while minuto < cierra:
+                    duracion = azar.choice(DURACIONES)
+                    if minuto + duracion <= cierra and azar.random() < 0.6:
+                        citas.append((f"Dr. {numero:02d}", base + timedelta(minutes=minuto), duracion))
+                        minuto += duracion
+                    else:
+                        minuto += 30
+        dia += timedelta(days=1)
+    return citas
+
+def medir(nombre, funcion, consultas):
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        funcion(*consulta)
+    duracion = time.perf_counter() - inicio
+    print(f"  {nombre:<38} {len(consultas):>8} consultas  {duracion / len(consultas) * 1e6:10.2f} µs/consulta")
+    return duracion / len(consultas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de horarios por doctor")
+    parser.add_argument("--doctores", type=int, default=40)
+    parser.add_argument("--años", type=int, default=5)
+    parser.add_argument("--consultas", type=int, default=50000)
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--sql", action="store_true", help="medir también la comprobación en SQLite")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    citas = generar_calendario(args.doctores, args.años, args.semilla)
+    print(f"Calendario: {len(citas)} citas, {args.doctores} doctores, {args.años} años "
+          f"({time.perf_counter() - inicio:.1f} s para generarlo)")
+
+    inicio = time.perf_counter()
+    indice = IndiceAgenda()
+    for id_cita, (doctor, momento, duracion) in enumerate(citas, 1):
+        indice.agregar(doctor, momento, duracion, id_cita)
+    print(f"Índice construido en {time.perf_counter() - inicio:.2f} s")
+
+    # Lista de citas de cada doctor, sin índice por día
+    por_doctor = {}
+    for doctor, momento, duracion in citas:
+        por_doctor.setdefault(doctor, []).append((momento, momento + timedelta(minutes=duracion)))
+
+    azar = random.Random(args.semilla + 1)
+    dias = (date(2020 + args.años, 1, 1) - date(2020, 1, 1)).days
+    abre, cierra = HORARIO_ATENCION
+
+    def consulta_al_azar():
+        doctor = f"Dr. {azar.randrange(args.doctores):02d}"
+        momento = (datetime(2020, 1, 1) + timedelta(days=azar.randrange(dias),
+                                                    minutes=azar.randrange(abre, cierra - 30, 15)))
+        return doctor, momento, 30
+
+    consultas = [consulta_al_azar() for _ in range(args.consultas)]
+
+    def choque_recorriendo(doctor, momento, duracion):
+        fin = momento + timedelta(minutes=duracion)
+        for inicio_cita, fin_cita in por_doctor[doctor]:
+            if inicio_cita < fin and fin_cita > momento:
+                return True
+        return False
+
+    print("Comprobación de choques:")
+    con_indice = medir("índice por doctor y día", indice.choque, consultas)
+    sin_indice = medir("recorriendo las citas del doctor", choque_recorriendo, consultas[:max(args.consultas // 100, 50)])
+    ocupados = sum(indice.choque(*consulta) is not None for consulta in consultas)
+    print(f"  {ocupados / len(consultas):.0%} de los horarios consultados estaban ocupados; "
+          f"el índice es {sin_indice / con_indice:,.0f} veces más rápido")
+
+    print("Próximos horarios libres:")
+    for n in (1, 5, 20):
+        medir(f"próximos {n} libres", lambda doctor, momento, _: indice.proximos_libres(doctor, momento, n),
+              consultas[:args.consultas // 10])
+
+    if args.sql:
+        carpeta = tempfile.mkdtemp(prefix="agenda_")
+        base_datos.configurar_bd(os.path.join(carpeta, "pacientes.db"))
+        base_datos.conectar_bd()
+        inicio = time.perf_counter()
+        with base_datos.obtener_gestor().escritura() as conexion:
+            conexion.executemany(
+                "INSERT INTO citas (nombre_paciente, motivo, doctor, fecha_cita, hora_cita, estado, "
+                "fecha_creacion, fecha_hora_iso, duracion_min) VALUES ('Paciente', 'Control', ?, ?, ?, "
+                "'Programada', '', ?, ?)",
+                ((doctor, momento.strftime("%d/%m/%Y"), momento.strftime("%H:%M"),
+                  momento.strftime("%Y-%m-%d %H:%M:%S"), duracion) for doctor, momento, duracion in citas))
+        print(f"Base temporal con {len(citas)} citas cargada en {time.perf_counter() - inicio:.1f} s")
+        conexion = base_datos.obtener_gestor().lectura()
+        print("Comprobación de choques en SQLite (la de guardar_cita_bd):")
+        medir("buscar_choque_cita", lambda doctor, momento, duracion: base_datos.buscar_choque_cita(
+            conexion, doctor, momento.strftime("%Y-%m-%d %H:%M:%S"), duracion), consultas[:args.consultas // 10])
+
+if __name__ == "__main__":
+    main()
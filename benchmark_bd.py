@@ -0,0 +1,95 @@
+# ============================
+#   BENCHMARK DE LA CAPA DE DATOS
+# ============================
+# Compara el patrón anterior (abrir y cerrar sqlite3.connect en cada
+# función) con el gestor de conexiones compartido de base_datos.py.
+# Uso: python benchmark_bd.py [--operaciones 2000]
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import base_datos
+
+# ============================
+#   PATRÓN ANTERIOR (UNA CONEXIÓN POR LLAMADA)
+# ============================
+def guardar_paciente_antes(ruta, nombre, edad, accidente, doctor, fecha):
+    conexion = sqlite3.connect(ruta)
+    cursor = conexion.cursor()
+    cursor.execute(
+        "INSERT INTO pacientes (nombre, edad, accidente, doctor_asignado, fecha_atencion) VALUES (?, ?, ?, ?, ?)",
+        (nombre, edad, accidente, doctor, fecha))
+    conexion.commit()
+    conexion.close()
+
+def consultar_paciente_antes(ruta, id_paciente):
+    conexion = sqlite3.connect(ruta)
+    cursor = conexion.cursor()
+    cursor.execute("SELECT * FROM pacientes WHERE id = ?", (id_paciente,))
+    datos = cursor.fetchall()
+    conexion.close()
+    return datos
+
+# ============================
+#   PATRÓN NUEVO (GESTOR COMPARTIDO)
+# ============================
+def consultar_paciente_despues(id_paciente):
+    return base_datos.obtener_gestor().lectura().execute(
+        "SELECT * FROM pacientes WHERE id = ?", (id_paciente,)).fetchall()
+
+# ============================
+#   MEDICIÓN
+# ============================
+def medir(nombre, funcion, repeticiones):
+    """Ejecuta funcion(i) repeticiones veces y devuelve operaciones por segundo"""
+    inicio = time.perf_counter()
+    for i in range(repeticiones):
+        funcion(i)
+    duracion = time.perf_counter() - inicio
+    por_segundo = repeticiones / duracion if duracion else float("inf")
+    print(f"  {nombre:<28} {duracion * 1000:10.1f} ms  {por_segundo:12.0f} op/s")
+    return por_segundo
+
+def preparar_bd(ruta, modo_wal):
+    base_datos.configurar_bd(ruta)
+    base_datos.conectar_bd()
+    if not modo_wal:
+        # El patrón anterior trabajaba con el journal por defecto
+        base_datos.cerrar_bd()
+        conexion = sqlite3.connect(ruta)
+        conexion.execute("PRAGMA journal_mode = DELETE")
+        conexion.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark antes/después del gestor de conexiones")
+    parser.add_argument("--operaciones", type=int, default=2000)
+    args = parser.parse_args()
+    n = args.operaciones
+    fecha = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_antes = os.path.join(carpeta, "antes.db")
+        ruta_despues = os.path.join(carpeta, "despues.db")
+
+        print(f"==== Antes: sqlite3.connect por llamada ({n} operaciones) ====")
+        preparar_bd(ruta_antes, modo_wal=False)
+        escritura_antes = medir("guardar_paciente_bd", lambda i: guardar_paciente_antes(
+            ruta_antes, f"Paciente {i}", 30, "Cortes", "Dr. Juan Pérez", fecha), n)
+        lectura_antes = medir("consultar por id", lambda i: consultar_paciente_antes(ruta_antes, i + 1), n)
+
+        print(f"==== Después: gestor compartido en WAL ({n} operaciones) ====")
+        preparar_bd(ruta_despues, modo_wal=True)
+        escritura_despues = medir("guardar_paciente_bd", lambda i: base_datos.guardar_paciente_bd(
+            f"Paciente {i}", 30, "Cortes", "Dr. Juan Pérez", fecha), n)
+        lectura_despues = medir("consultar por id", lambda i: consultar_paciente_despues(i + 1), n)
+        base_datos.cerrar_bd()
+
+    print("==== Mejora ====")
+    print(f"  Escritura: x{escritura_despues / escritura_antes:.1f}")
+    print(f"  Lectura:   x{lectura_despues / lectura_antes:.1f}")
+
+if __name__ == '__main__':
+    main()
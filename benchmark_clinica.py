@@ -0,0 +1,236 @@
+# ============================
+#   BENCHMARK DE LAS OPERACIONES DE LA CLÍNICA
+# ============================
+# Mide cada operación pública de la capa de datos sobre una base generada
+# con generar_datos.py (o una copia de una existente con --bd): guardar, buscar y
+# listar pacientes, calendario, citas, marcas de asistencia y la
+# comparación de rostros del reconocimiento. Cada operación se repite con
+# parámetros elegidos con semilla fija y se informa la mediana, el p95 y
+# el máximo en µs.
+# Con --json se guardan los resultados; con --comparar se contrastan con
+# los de una versión anterior y se marcan las operaciones más lentas que
+# UMBRAL_REGRESION (el programa termina con código 1 si hay alguna).
+#
+# Uso:
+#   python benchmark_clinica.py --escala pequeña --json resultados.json
+#   python benchmark_clinica.py --bd clinica_prueba.db --comparar resultados.json
+import argparse
+import json
+import os
+import pathlib
+import pickle
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import base_datos
+import consultas
+from agenda_citas import proximos_libres_bd
+from generar_datos import APELLIDOS, NOMBRES, generar
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+ESCALAS = {
+    "pequeña": {"pacientes": 20000, "citas": 5000, "personal": 20, "años": 1},
+    "mediana": {"pacientes": 200000, "citas": 40000, "personal": 40, "años": 3},
+    "grande": {"pacientes": 1000000, "citas": 200000, "personal": 60, "años": 5},
+}
+REPETICIONES = 200
+UMBRAL_REGRESION = 0.2          # 20 % más lenta (en la mediana) que la versión anterior
+
+# ============================
+#   MEDICIÓN
+# ============================
+def medir(funcion, parametros):
+    """Llama funcion(*p) para cada p; devuelve las estadísticas en µs"""
+    tiempos = []
+    for argumentos in parametros:
+        inicio = time.perf_counter_ns()
+        funcion(*argumentos)
+        tiempos.append((time.perf_counter_ns() - inicio) / 1000)
+    tiempos.sort()
+    total = sum(tiempos)
+    return {
+        "repeticiones": len(tiempos),
+        "mediana_us": round(tiempos[len(tiempos) // 2], 1),
+        "p95_us": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 1),
+        "maximo_us": round(tiempos[-1], 1),
+        "por_segundo": round(len(tiempos) / (total / 1e6)) if total else None,
+    }
+
+def _rango_datos():
+    """(primer día, último día) de las atenciones de la base"""
+    primero, ultimo = base_datos.obtener_gestor().lectura().execute(
+        "SELECT MIN(fecha_atencion_iso), MAX(fecha_atencion_iso) FROM pacientes").fetchone()
+    if primero is None:
+        hoy = datetime.now()
+        return hoy, hoy
+    return datetime.strptime(primero[:10], "%Y-%m-%d"), datetime.strptime(ultimo[:10], "%Y-%m-%d")
+
+def _reconocer(conocidos, rostro):
+    # Lo mismo que face_recognition.face_distance + compare_faces en la interfaz
+    distancias = np.linalg.norm(conocidos - rostro, axis=1)
+    indice = int(np.argmin(distancias))
+    return indice if distancias[indice] <= 0.6 else None
+
+# ============================
+#   OPERACIONES
+# ============================
+def operaciones(repeticiones, azar):
+    """[(nombre, función, [argumentos])] de cada operación a medir, lecturas primero"""
+    lectura = base_datos.obtener_gestor().lectura()
+    desde, hasta = _rango_datos()
+    dias = max(1, (hasta - desde).days)
+    fechas = [desde + timedelta(days=azar.randrange(dias + 1)) for _ in range(repeticiones)]
+    medicos = [fila[0] for fila in lectura.execute("SELECT DISTINCT doctor FROM citas")] or ["Dr. Juan Pérez"]
+    personal = lectura.execute("SELECT nombre, cargo FROM personal").fetchall()
+    busquedas = [(f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)[:azar.randint(2, 5)]}",)
+                 for _ in range(repeticiones)]
+
+    lista = [
+        ("consultar_paciente", base_datos.consultar_paciente, busquedas),
+        ("pagina_pacientes", lambda: consultas.pagina("pacientes", orden="fecha_atencion_iso", descendente=True),
+         [()] * repeticiones),
+        ("pagina_citas", lambda: consultas.pagina("citas", orden="fecha_hora_iso", descendente=True),
+         [()] * repeticiones),
+        ("pagina_asistencia", lambda: consultas.pagina("asistencia", orden="fecha_iso", descendente=True),
+         [()] * repeticiones),
+        ("obtener_atenciones_por_dia", base_datos.obtener_atenciones_por_dia,
+         [(fecha.year, fecha.month) for fecha in fechas]),
+        ("consultar_citas_por_fecha", base_datos.consultar_citas_por_fecha,
+         [(fecha.strftime("%d/%m/%Y"),) for fecha in fechas]),
+        ("obtener_asistencia_mes_bd", base_datos.obtener_asistencia_mes_bd,
+         [(fecha.year, fecha.month) for fecha in fechas]),
+        ("proximos_libres_bd", proximos_libres_bd,
+         [(azar.choice(medicos), fecha.strftime("%Y-%m-%d 08:00:00")) for fecha in fechas]),
+    ]
+
+    encodings = [pickle.loads(fila[2]) for fila in base_datos.obtener_encodings_personal_bd()]
+    if np is not None and encodings:
+        conocidos = np.array(encodings)
+        rostros = [conocidos[azar.randrange(len(conocidos))] + np.random.default_rng(azar.randrange(2 ** 32))
+                   .normal(0, 0.02, conocidos.shape[1]) for _ in range(repeticiones)]
+        lista.append(("reconocer_rostro", _reconocer, [(conocidos, rostro) for rostro in rostros]))
+        lista.append(("obtener_encodings_personal_bd", base_datos.obtener_encodings_personal_bd,
+                      [()] * repeticiones))
+
+    # Escrituras: citas en días posteriores a los datos (sin choques) y
+    # marcas de personal nuevo, para no depender de lo que ya hay hoy
+    libre = hasta + timedelta(days=400)
+    citas = [("Paciente Benchmark", "900000000", "Control", "Dr. Benchmark",
+              (libre + timedelta(days=i // 20)).strftime("%d/%m/%Y"), f"{8 + (i % 20) // 2:02d}:{(i % 2) * 30:02d}")
+             for i in range(repeticiones)]
+    marcas = [(f"Benchmark {i:05d} {azar.choice(APELLIDOS)}", (personal and azar.choice(personal)[1]) or "Doctor")
+              for i in range(repeticiones)]
+    lista += [
+        ("guardar_paciente_bd", base_datos.guardar_paciente_bd,
+         [(f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}", azar.randint(0, 90),
+           "Cortes", "Dr. Juan Pérez", datetime.now().strftime("%d/%m/%Y %H:%M:%S")) for _ in range(repeticiones)]),
+        ("guardar_cita_bd", base_datos.guardar_cita_bd, citas),
+        ("registrar_entrada", base_datos.registrar_entrada_salida_bd,
+         [(nombre, cargo, "entrada") for nombre, cargo in marcas]),
+        ("registrar_salida", base_datos.registrar_entrada_salida_bd,
+         [(nombre, cargo, "salida") for nombre, cargo in marcas]),
+    ]
+    return lista
+
+def ejecutar(repeticiones=REPETICIONES, semilla=2024):
+    azar = random.Random(semilla)
+    resultados = {}
+    for nombre, funcion, parametros in operaciones(repeticiones, azar):
+        resultados[nombre] = medir(funcion, parametros)
+        print(f"  {nombre:<30} mediana {resultados[nombre]['mediana_us']:10.1f} µs   "
+              f"p95 {resultados[nombre]['p95_us']:10.1f} µs")
+    return resultados
+
+def comparar(actuales, anteriores, umbral=UMBRAL_REGRESION):
+    """Imprime la diferencia de cada mediana; devuelve las operaciones que empeoraron"""
+    peores = []
+    for nombre, actual in actuales.items():
+        anterior = anteriores.get(nombre)
+        if not anterior or not anterior.get("mediana_us"):
+            print(f"  {nombre:<30} (nueva)")
+            continue
+        cambio = actual["mediana_us"] / anterior["mediana_us"] - 1
+        marca = ""
+        if cambio > umbral:
+            marca = "  ⚠️ más lenta"
+            peores.append(nombre)
+        print(f"  {nombre:<30} {anterior['mediana_us']:10.1f} -> {actual['mediana_us']:10.1f} µs  "
+              f"({cambio:+.0%}){marca}")
+    return peores
+
+def _contar_filas():
+    lectura = base_datos.obtener_gestor().lectura()
+    return {tabla: lectura.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+            for tabla in ("pacientes", "citas", "personal", "asistencia")}
+
+def _copiar_bd(origen, destino):
+    """Copia consistente de origen (abierta solo para lectura, con su WAL) en destino"""
+    fuente = sqlite3.connect(pathlib.Path(origen).resolve().as_uri() + "?mode=ro", uri=True)
+    copia = sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las operaciones de datos de la clínica")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequeña")
+    parser.add_argument("--bd", default=None, help="medir sobre una copia de esta base (no se modifica) en vez de generar una")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--json", default=None, help="guardar los resultados en este archivo")
+    parser.add_argument("--comparar", default=None, help="resultados JSON de una versión anterior")
+    args = parser.parse_args()
+    if args.bd and not os.path.isfile(args.bd):
+        parser.error(f"no existe la base de datos {args.bd}")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "benchmark.db")
+        if args.bd:
+            # Las escrituras medidas (pacientes, citas y marcas de prueba) van a
+            # la copia: la base original queda intacta
+            print(f"Copiando {args.bd}...")
+            _copiar_bd(args.bd, ruta)
+            base_datos.configurar_bd(ruta)
+            base_datos.conectar_bd()
+        else:
+            print(f"Generando datos ({args.escala}: {ESCALAS[args.escala]})...")
+            resumen = generar(ruta, semilla=args.semilla, **ESCALAS[args.escala])
+            print(f"  {resumen['segundos']} s")
+        datos = _contar_filas()
+        print(f"Midiendo ({datos}):")
+        resultados = ejecutar(args.repeticiones, args.semilla)
+        base_datos.cerrar_bd()
+
+    informe = {
+        "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "escala": None if args.bd else args.escala,
+        "datos": datos,
+        "repeticiones": args.repeticiones,
+        "semilla": args.semilla,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "operaciones": resultados,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+        print(f"Comparación con {args.comparar} ({anterior.get('fecha')}):")
+        if comparar(resultados, anterior.get("operaciones", {})):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
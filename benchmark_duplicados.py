@@ -0,0 +1,84 @@
+# ============================
+#   BENCHMARK DE PACIENTES DUPLICADOS
+# ============================
+# Genera siempre las mismas personas (semilla fija) y, para una parte de
+# ellas, variantes escritas como en recepción: sin tildes, b/v o s/z
+# cambiadas, apellido antes del nombre o una letra de más. Mide cuánto
+# tarda buscar_duplicados() y cuántas variantes encuentra, sin base de datos.
+# Uso: python benchmark_duplicados.py [--nombres 50000 100000 200000] [--variantes 0.1]
+import argparse
+import json
+import random
+import time
+
+from duplicados_pacientes import buscar_duplicados
+
+NOMBRES = ("José", "Juan", "María", "Luis", "Carlos", "Ana", "Rosa", "Víctor", "Jorge", "Elena",
+           "Sebastián", "Gabriela", "Héctor", "Beatriz", "Zulema", "Cecilia", "Javier", "Valeria")
+SILABAS = ("ba", "ve", "qui", "ma", "ni", "ro", "ja", "gue", "za", "ce", "lla", "cho", "ta", "hu", "mo", "pe",
+           "dal", "fer", "gon", "lu", "mar", "nes", "pan", "rin", "sal", "tor", "cas", "del", "gar", "men")
+CAMBIOS = (("á", "a"), ("é", "e"), ("í", "i"), ("ó", "o"), ("ú", "u"),
+           ("v", "b"), ("b", "v"), ("z", "s"), ("s", "z"), ("ll", "y"))
+
+def _apellido(azar):
+    return "".join(azar.choice(SILABAS) for _ in range(azar.randint(2, 4))).capitalize()
+
+def _variante(nombre, azar):
+    """Una escritura distinta de la misma persona"""
+    forma = azar.randrange(3)
+    if forma == 0:
+        for original, cambio in azar.sample(CAMBIOS, len(CAMBIOS)):
+            if original in nombre:
+                return nombre.replace(original, cambio, 1)
+    if forma == 1:
+        palabras = nombre.split()
+        return " ".join(palabras[1:] + palabras[:1])
+    posicion = azar.randrange(1, len(nombre))
+    return nombre[:posicion] + nombre[posicion - 1] + nombre[posicion:]
+
+def generar_nombres(cantidad, variantes, semilla=2024):
+    """([(nombre, atenciones, edad mín., edad máx.)], {variante: nombre original})"""
+    azar = random.Random(semilla)
+    filas, originales, vistos = [], {}, set()
+    while len(filas) < cantidad:
+        nombre = f"{azar.choice(NOMBRES)} {_apellido(azar)} {_apellido(azar)}"
+        if nombre in vistos:
+            continue
+        vistos.add(nombre)
+        edad = azar.randint(1, 90)
+        filas.append((nombre, azar.randint(1, 6), edad, edad + azar.randint(0, 3)))
+        if azar.random() < variantes:
+            otra = _variante(nombre, azar)
+            if otra not in vistos:
+                vistos.add(otra)
+                originales[otra] = nombre
+                filas.append((otra, 1, edad, edad))
+    return filas, originales
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la detección de pacientes duplicados")
+    parser.add_argument("--nombres", type=int, nargs="+", default=[50000, 100000, 200000])
+    parser.add_argument("--variantes", type=float, default=0.1, help="fracción de personas con otra escritura")
+    parser.add_argument("--semilla", type=int, default=2024)
+    args = parser.parse_args()
+
+    for cantidad in args.nombres:
+        filas, originales = generar_nombres(cantidad, args.variantes, args.semilla)
+        inicio = time.perf_counter()
+        sugerencias, estadisticas = buscar_duplicados(filas)
+        duracion = time.perf_counter() - inicio
+
+        grupo = {}
+        for sugerencia in sugerencias:
+            for nombre in sugerencia["atenciones"]:
+                grupo[nombre] = sugerencia["nombre"]
+        encontradas = sum(1 for variante, nombre in originales.items()
+                          if variante in grupo and grupo.get(nombre) == grupo[variante])
+        agrupados = sum(len(s["atenciones"]) for s in sugerencias)
+        print(f"{len(filas)} nombres escritos: {duracion:.1f} s, "
+              f"{encontradas}/{len(originales)} variantes encontradas, "
+              f"{agrupados - 2 * encontradas} nombres agrupados de más")
+        print(json.dumps(estadisticas, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
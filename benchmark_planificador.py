@@ -0,0 +1,72 @@
+# ============================
+#   BENCHMARK DEL PLANIFICADOR DE CITAS
+# ============================
+# Genera siempre el mismo día de trabajo (semilla fija): varios doctores
+# por motivo con parte de su agenda ya ocupada y un lote de solicitudes
+# con ventanas preferidas y urgencias. Mide cuánto tarda planificar() y
+# compara el resultado con la asignación fija de antes (cada motivo con un
+# solo doctor, el primer horario libre), en espera y reparto de carga.
+# Uso: python benchmark_planificador.py [--solicitudes 200 400 600] [--doctores-por-motivo 10]
+import argparse
+import json
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from agenda_citas import HORARIO_ATENCION, IndiceAgenda
+from planificador_citas import Solicitud, planificar, resumen_plan
+
+MOTIVOS = ("Cortes", "Quemaduras", "Fracturas", "Convulsiones", "Control")     # "Control": cualquier doctor
+VENTANAS = ((), ((480, 720),), ((840, 1080),), ((480, 600), (900, 1080)), ((600, 840),))
+DIA = date(2024, 6, 3)
+
+def generar_dia(solicitudes, doctores_por_motivo, ocupacion=0.3, semilla=2024):
+    """(doctores_por_motivo, citas ya reservadas, solicitudes), siempre iguales para la misma semilla"""
+    azar = random.Random(semilla)
+    especialidades = {motivo: [f"Dr. {motivo[:3]} {numero:02d}" for numero in range(doctores_por_motivo)]
+                      for motivo in MOTIVOS[:-1]}
+    abre, cierra = HORARIO_ATENCION
+    base = datetime.combine(DIA, datetime.min.time())
+    reservadas = [(doctor, base + timedelta(minutes=minuto))
+                  for doctores in especialidades.values() for doctor in doctores
+                  for minuto in range(abre, cierra, 30) if azar.random() < ocupacion]
+    lote = [Solicitud(numero, f"Paciente {numero}", f"9{numero:08d}", azar.choice(MOTIVOS),
+                      azar.choice(VENTANAS), azar.choices((1, 2, 3), (70, 20, 10))[0])
+            for numero in range(solicitudes)]
+    return especialidades, reservadas, lote
+
+def _indice(reservadas):
+    indice = IndiceAgenda()
+    for doctor, inicio in reservadas:
+        indice.agregar(doctor, inicio)
+    return indice
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del planificador automático de citas")
+    parser.add_argument("--solicitudes", type=int, nargs="+", default=[200, 400, 600])
+    parser.add_argument("--doctores-por-motivo", type=int, default=10)
+    parser.add_argument("--ocupacion", type=float, default=0.3, help="fracción de la agenda ya reservada")
+    parser.add_argument("--semilla", type=int, default=2024)
+    args = parser.parse_args()
+
+    for cantidad in args.solicitudes:
+        especialidades, reservadas, lote = generar_dia(cantidad, args.doctores_por_motivo,
+                                                       args.ocupacion, args.semilla)
+        indice = _indice(reservadas)
+        inicio = time.perf_counter()
+        asignadas, pendientes = planificar(lote, DIA, especialidades, indice)
+        duracion = time.perf_counter() - inicio
+
+        # Antes: doctores_asignados daba un solo doctor por motivo
+        fijo = {motivo: doctores[0] for motivo, doctores in especialidades.items()}
+        asignadas_fijo, pendientes_fijo = planificar(lote, DIA, fijo, _indice(reservadas), peso_carga=0)
+
+        print(f"{cantidad} solicitudes, {len(especialidades) * args.doctores_por_motivo} doctores, "
+              f"{len(reservadas)} citas ya reservadas: {duracion * 1000:.0f} ms "
+              f"({duracion / cantidad * 1e6:.0f} µs por solicitud)")
+        print(json.dumps({"planificador": resumen_plan(asignadas, pendientes),
+                          "un_doctor_por_motivo": resumen_plan(asignadas_fijo, pendientes_fijo)},
+                         indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
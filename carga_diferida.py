@@ -0,0 +1,78 @@
+# ============================
+#   CARGA DIFERIDA DE OPENCV, NUMPY, FACE_RECOGNITION Y PIL
+# ============================
+# Estas librerías tardan segundos en importarse (face_recognition carga
+# dlib y sus modelos) y solo se usan en el control de asistencia. En vez
+# de importarlas al abrir TRABAJO ELVIS.py se importan la primera vez que
+# se piden, una sola vez por proceso aunque las pidan varios hilos:
+#   modulo("numpy")     -> el módulo, o None si no está instalado
+#   cargar()            -> Vision con cv2, np, face_recognition, Image e
+#                          ImageTk (None los que falten)
+#   precargar()         -> las importa en un hilo aparte, para que ya
+#                          estén listas cuando se abra el control de asistencia
+# Se guarda cuánto tardó cada importación (tiempos_importacion()).
+import importlib
+import threading
+import time
+from collections import namedtuple
+
+# Nombre para mostrar -> (módulo a importar, paquete de pip)
+MODULOS = {
+    "cv2": ("cv2", "opencv-python"),
+    "np": ("numpy", "numpy"),
+    "face_recognition": ("face_recognition", "face-recognition"),
+    "Image": ("PIL.Image", "Pillow"),
+    "ImageTk": ("PIL.ImageTk", "Pillow"),
+}
+
+Vision = namedtuple("Vision", MODULOS)
+
+_candado = threading.Lock()
+_cargados = {}          # módulo -> módulo importado o None
+_tiempos = {}           # módulo -> segundos que tardó importarlo
+_errores = {}           # módulo -> mensaje de ImportError
+
+def modulo(nombre):
+    """Importa el módulo la primera vez que se pide; None si no está instalado"""
+    if nombre in _cargados:
+        return _cargados[nombre]
+    with _candado:
+        if nombre not in _cargados:
+            inicio = time.perf_counter()
+            try:
+                _cargados[nombre] = importlib.import_module(nombre)
+            except ImportError as e:
+                _cargados[nombre] = None
+                _errores[nombre] = str(e)
+            _tiempos[nombre] = time.perf_counter() - inicio
+    return _cargados[nombre]
+
+def cargar():
+    """Importa (si hace falta) todo lo del reconocimiento facial y lo devuelve como Vision"""
+    return Vision(*(modulo(importar) for importar, _ in MODULOS.values()))
+
+def faltantes():
+    """Paquetes de pip que no se pudieron importar (importa los que falte probar)"""
+    cargar()
+    paquetes = []
+    for importar, paquete in MODULOS.values():
+        if _cargados[importar] is None and paquete not in paquetes:
+            paquetes.append(paquete)
+    return paquetes
+
+def precargar(al_terminar=None):
+    """Importa todo en un hilo de fondo; al_terminar(faltantes) se llama en ese hilo"""
+    def trabajar():
+        paquetes = faltantes()
+        if al_terminar:
+            al_terminar(paquetes)
+
+    hilo = threading.Thread(target=trabajar, name="precarga_vision", daemon=True)
+    hilo.start()
+    return hilo
+
+def tiempos_importacion():
+    """{módulo: ms} de lo importado hasta ahora, con los errores de los que faltan"""
+    with _candado:
+        return {nombre: {"ms": round(segundos * 1000, 1), "error": _errores.get(nombre)}
+                for nombre, segundos in _tiempos.items()}
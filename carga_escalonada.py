@@ -0,0 +1,72 @@
+# ============================
+#   CARGA ESCALONADA DEL ARRANQUE
+# ============================
+# La ventana se muestra con las tablas vacías (esqueleto) y los datos
+# llegan después, por fases:
+#   fase 1: esquema de la base de datos (conectar_bd, en el hilo escritor)
+#   fase 2: tablas de pacientes y citas y el calendario, en paralelo
+# Una fase empieza cuando terminaron (bien o mal) todas las etapas de la
+# anterior. Cada etapa es una función iniciar(listo, fallo) que lanza su
+# trabajo con el EjecutorBD y llama listo(resultado) o fallo(error) desde
+# el hilo de la interfaz. El tiempo de cada etapa se anota en
+# perfil_arranque con el momento en que empezó.
+import logging
+
+import perfil_arranque
+
+log = logging.getLogger(__name__)
+
+class CargaEscalonada:
+    """Ejecuta fases de etapas asíncronas, una fase tras otra"""
+
+    def __init__(self, al_terminar=None, al_fallar=None):
+        self.fases = []
+        self.al_terminar = al_terminar
+        self.al_fallar = al_fallar
+        self.errores = {}           # etapa -> excepción
+        self._pendientes = 0
+
+    def fase(self, **etapas):
+        """Agrega una fase: nombre_etapa=iniciar(listo, fallo)"""
+        if etapas:
+            self.fases.append(etapas)
+        return self
+
+    def empezar(self):
+        """Lanza la primera fase (llamar desde el hilo de la interfaz)"""
+        self._siguiente_fase()
+
+    def _siguiente_fase(self):
+        if not self.fases:
+            if self.al_terminar:
+                self.al_terminar()
+            return
+        etapas = self.fases.pop(0)
+        self._pendientes = len(etapas)
+        for nombre, iniciar in etapas.items():
+            self._lanzar(nombre, iniciar)
+
+    def _lanzar(self, nombre, iniciar):
+        inicio = perfil_arranque.ahora()
+
+        def listo(_resultado=None):
+            perfil_arranque.marcar(nombre, desde=inicio)
+            self._etapa_terminada()
+
+        def fallo(error):
+            perfil_arranque.marcar(f"{nombre} (error)", desde=inicio)
+            self.errores[nombre] = error
+            log.error("Error en la etapa de arranque %s: %s", nombre, error)
+            if self.al_fallar:
+                self.al_fallar(error)
+            self._etapa_terminada()
+
+        try:
+            iniciar(listo, fallo)
+        except Exception as e:
+            fallo(e)
+
+    def _etapa_terminada(self):
+        self._pendientes -= 1
+        if self._pendientes == 0:
+            self._siguiente_fase()
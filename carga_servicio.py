@@ -0,0 +1,191 @@
+# ============================
+#   PRUEBA DE CARGA DEL SERVICIO
+# ============================
+# Lanza N clientes asyncio contra servicio_clinica.py, cada uno con una
+# conexión keep-alive, durante unos segundos, con una mezcla de búsquedas,
+# páginas de la tabla, calendario y altas de pacientes. Informa
+# peticiones por segundo y latencias p50 / p95 / p99.
+# Sin --direccion arranca su propio servidor sobre una base temporal.
+#
+# Uso:
+#   python carga_servicio.py --clientes 32 --segundos 10
+#   python carga_servicio.py --direccion 127.0.0.1:8765 --lote 10
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+NOMBRES = ("Ana", "Luis", "María", "José", "Carmen", "Pedro", "Lucía", "Jorge", "Rosa", "Elvis")
+APELLIDOS = ("Rojas", "Guzmán", "Pérez", "Quispe", "Mamani", "Flores", "Torres", "Vargas")
+
+def _operacion(azar, proporcion_escrituras):
+    """Una operación de la mezcla: (nombre, args)"""
+    if azar.random() < proporcion_escrituras:
+        return "guardar_paciente_bd", [f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)}",
+                                       azar.randint(1, 90), "Control", "Dr. Rojas",
+                                       f"{azar.randint(1, 28):02d}/{azar.randint(1, 12):02d}/2024 10:00:00"]
+    eleccion = azar.random()
+    if eleccion < 0.6:
+        return "consultar_paciente", [azar.choice(NOMBRES)[:3]]
+    if eleccion < 0.85:
+        return "pagina", ["pacientes", None, "nombre", False, None, 100]
+    return "obtener_atenciones_por_dia", [2024, azar.randint(1, 12)]
+
+# ============================
+#   CLIENTE HTTP MÍNIMO
+# ============================
+class _Conexion:
+    def __init__(self, host, puerto):
+        self.host, self.puerto = host, puerto
+        self.lector = self.escritor = None
+
+    async def pedir(self, ruta, datos):
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+        cuerpo = json.dumps(datos).encode("utf-8")
+        self.escritor.write(f"POST {ruta} HTTP/1.1\r\nHost: {self.host}\r\n"
+                            f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n\r\n"
+                            .encode("latin-1") + cuerpo)
+        await self.escritor.drain()
+        cabecera = await self.lector.readuntil(b"\r\n\r\n")
+        estado = int(cabecera.split(b" ", 2)[1])
+        largo = 0
+        for linea in cabecera.split(b"\r\n"):
+            if linea.lower().startswith(b"content-length:"):
+                largo = int(linea.split(b":", 1)[1])
+        await self.lector.readexactly(largo)
+        return estado
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+# ============================
+#   CARGA
+# ============================
+async def _cliente(numero, host, puerto, fin, lote, proporcion_escrituras, latencias, errores):
+    azar = random.Random(numero)
+    conexion = _Conexion(host, puerto)
+    try:
+        while time.perf_counter() < fin:
+            if lote > 1:
+                ruta = "/api/lote"
+                datos = [{"operacion": op, "args": args}
+                         for op, args in (_operacion(azar, proporcion_escrituras) for _ in range(lote))]
+            else:
+                operacion, args = _operacion(azar, proporcion_escrituras)
+                ruta, datos = f"/api/{operacion}", {"args": args}
+            inicio = time.perf_counter()
+            try:
+                estado = await conexion.pedir(ruta, datos)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errores.append("conexion")
+                conexion.cerrar()
+                conexion = _Conexion(host, puerto)
+                continue
+            latencias.append(time.perf_counter() - inicio)
+            if estado != 200:
+                errores.append(estado)
+    finally:
+        conexion.cerrar()
+
+async def _cargar(host, puerto, clientes, segundos, lote, proporcion_escrituras):
+    latencias, errores = [], []
+    inicio = time.perf_counter()
+    fin = inicio + segundos
+    await asyncio.gather(*(_cliente(i, host, puerto, fin, lote, proporcion_escrituras, latencias, errores)
+                           for i in range(clientes)))
+    return time.perf_counter() - inicio, latencias, errores
+
+def _percentil(ordenadas, p):
+    return ordenadas[min(int(p * len(ordenadas)), len(ordenadas) - 1)] * 1000 if ordenadas else 0.0
+
+def medir(host, puerto, clientes, segundos, lote=1, proporcion_escrituras=0.1):
+    """Corre la carga y devuelve un resumen (dict)"""
+    total, latencias, errores = asyncio.run(_cargar(host, puerto, clientes, segundos, lote, proporcion_escrituras))
+    latencias.sort()
+    return {
+        "clientes": clientes,
+        "operaciones_por_peticion": lote,
+        "peticiones": len(latencias),
+        "errores": len(errores),
+        "peticiones_por_segundo": round(len(latencias) / total, 1),
+        "operaciones_por_segundo": round(len(latencias) * lote / total, 1),
+        "latencia_ms": {"p50": round(_percentil(latencias, 0.50), 2), "p95": round(_percentil(latencias, 0.95), 2),
+                        "p99": round(_percentil(latencias, 0.99), 2), "max": round(_percentil(latencias, 1.0), 2)},
+    }
+
+# ============================
+#   SERVIDOR LOCAL PARA LA PRUEBA
+# ============================
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _arrancar_servidor(ruta_bd, pacientes):
+    puerto = _puerto_libre()
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    proceso = subprocess.Popen([sys.executable, os.path.join(carpeta, "servicio_clinica.py"),
+                                "--puerto", str(puerto), "--bd", ruta_bd],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 15
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", puerto), timeout=0.2).close()
+            break
+        except OSError:
+            if time.monotonic() > limite or proceso.poll() is not None:
+                proceso.kill()
+                raise RuntimeError("El servidor no arrancó")
+            time.sleep(0.1)
+
+    # Pacientes iniciales para que las búsquedas encuentren algo
+    async def poblar():
+        azar = random.Random(0)
+        conexion = _Conexion("127.0.0.1", puerto)
+        for _ in range(0, pacientes, 500):
+            await conexion.pedir("/api/lote", [{"operacion": op, "args": args}
+                                               for op, args in (_operacion(azar, 1.0) for _ in range(500))])
+        conexion.cerrar()
+    asyncio.run(poblar())
+    return proceso, puerto
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de servicio_clinica.py")
+    parser.add_argument("--direccion", help="host:puerto de un servidor ya en marcha")
+    parser.add_argument("--clientes", type=int, default=32, help="conexiones simultáneas")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--lote", type=int, default=1, help="operaciones por petición (/api/lote si es > 1)")
+    parser.add_argument("--escrituras", type=float, default=0.1, help="proporción de altas de pacientes")
+    parser.add_argument("--pacientes", type=int, default=5000, help="pacientes iniciales del servidor propio")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="carga_servicio_") as carpeta:
+        proceso = None
+        if args.direccion:
+            host, _, puerto = args.direccion.rpartition(":")
+            puerto = int(puerto)
+        else:
+            proceso, puerto = _arrancar_servidor(os.path.join(carpeta, "pacientes.db"), args.pacientes)
+            host = "127.0.0.1"
+        try:
+            resumen = medir(host, puerto, args.clientes, args.segundos, args.lote, args.escrituras)
+        finally:
+            # El servidor propio se detiene antes de borrar su base temporal
+            if proceso:
+                proceso.terminate()
+                proceso.wait()
+    print(json.dumps(resumen, indent=2, ensure_ascii=False))
+    print(f"{resumen['peticiones_por_segundo']} peticiones/s "
+          f"({resumen['operaciones_por_segundo']} operaciones/s), p99 {resumen['latencia_ms']['p99']} ms, "
+          f"{resumen['errores']} errores")
+
+if __name__ == "__main__":
+    main()
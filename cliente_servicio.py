@@ -0,0 +1,148 @@
+# ============================
+#   CLIENTE DEL SERVICIO DE LA CLÍNICA
+# ============================
+# Permite que la interfaz use servicio_clinica.py en lugar de su propia
+# pacientes.db. Ofrece las mismas funciones que base_datos (y pagina /
+# clave de consultas, para TablaVirtual), con los mismos argumentos y
+# resultados, así que el resto de la interfaz no cambia.
+# Cada hilo mantiene abierta su propia conexión HTTP (keep-alive).
+import http.client
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from base_datos import CitaOcupada
+from servicio_clinica import OPERACIONES, a_json, desde_json
+
+TIEMPO_ESPERA_S = 30
+
+# Excepciones que el servidor informa por nombre y se vuelven a lanzar aquí
+ERRORES = {
+    "CitaOcupada": CitaOcupada,
+    "IntegrityError": sqlite3.IntegrityError,
+    "OperationalError": sqlite3.OperationalError,
+    "ValueError": ValueError,
+    "TypeError": TypeError,
+    "KeyError": KeyError,
+}
+
+class ErrorServicio(Exception):
+    """Error del servicio que no corresponde a una excepción conocida"""
+
+def _es_lectura(operacion):
+    return OPERACIONES.get(operacion, ("",))[0] == "lectura"
+
+def _excepcion(datos):
+    return ERRORES.get(datos.get("error"), ErrorServicio)(datos.get("mensaje", ""))
+
+class ClienteServicio:
+    """Llama a las operaciones de servicio_clinica.py por HTTP/JSON"""
+
+    def __init__(self, direccion, tiempo_espera=TIEMPO_ESPERA_S):
+        host, _, puerto = direccion.rpartition(":")
+        self.host = host or "127.0.0.1"
+        self.puerto = int(puerto)
+        self.tiempo_espera = tiempo_espera
+        self._local = threading.local()
+
+    # ============================
+    #   HTTP
+    # ============================
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            conexion = http.client.HTTPConnection(self.host, self.puerto, timeout=self.tiempo_espera)
+            self._local.conexion = conexion
+        return conexion
+
+    def _pedir(self, metodo, ruta, datos=None, repetible=False):
+        """Envía la petición; repetible=True si repetirla no cambia nada (lecturas)"""
+        cuerpo = json.dumps(a_json(datos)).encode("utf-8") if datos is not None else None
+        encabezados = {"Content-Type": "application/json"} if cuerpo is not None else {}
+        for intento in range(2):
+            conexion = self._conexion()
+            reutilizada = conexion.sock is not None
+            try:
+                conexion.request(metodo, ruta, cuerpo, encabezados)
+                respuesta = conexion.getresponse()
+                return json.loads(respuesta.read())
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                conexion.close()
+                self._local.conexion = None
+                if not reutilizada or intento:
+                    raise
+                # Se reintenta una vez con otra conexión si el servidor cerró la
+                # keep-alive inactiva sin responder nada (RemoteDisconnected), o
+                # si la petición es una lectura. Un reset a mitad de una
+                # escritura puede llegar después del commit: repetirla la
+                # duplicaría, así que el error se deja subir
+                if not (repetible or isinstance(e, http.client.RemoteDisconnected)):
+                    raise
+
+    def llamar(self, operacion, *args, **kwargs):
+        """Ejecuta una operación en el servidor y devuelve su resultado"""
+        datos = self._pedir("POST", f"/api/{operacion}", {"args": args, "kwargs": kwargs},
+                            repetible=_es_lectura(operacion))
+        if "error" in datos:
+            raise _excepcion(datos)
+        return desde_json(datos["resultado"])
+
+    def lote(self, operaciones):
+        """Ejecuta [(operacion, args), ...] en una sola petición.
+
+        Devuelve los resultados en el mismo orden; una operación que falló
+        aparece como su excepción en lugar de un resultado.
+        """
+        operaciones = list(operaciones)
+        datos = self._pedir("POST", "/api/lote",
+                            [{"operacion": operacion, "args": args} for operacion, args in operaciones],
+                            repetible=all(_es_lectura(operacion) for operacion, _ in operaciones))
+        if "error" in datos:
+            raise _excepcion(datos)
+        return [_excepcion(r) if "error" in r else desde_json(r["resultado"]) for r in datos["resultados"]]
+
+    def estadisticas(self):
+        return self._pedir("GET", "/estadisticas", repetible=True)
+
+    # ============================
+    #   MISMA INTERFAZ QUE base_datos / consultas
+    # ============================
+    def funcion(self, operacion):
+        """Función con el nombre y los argumentos de la de base_datos, ejecutada en el servidor"""
+        def llamada(*args, **kwargs):
+            return self.llamar(operacion, *args, **kwargs)
+        llamada.__name__ = operacion
+        return llamada
+
+    def pagina(self, *args, **kwargs):
+        return self.llamar("pagina", *args, **kwargs)
+
+    def clave(self, *args, **kwargs):
+        return self.llamar("clave", *args, **kwargs)
+
+    def escritura_agrupada(self):
+        return EscrituraRemota(self)
+
+class EscrituraRemota:
+    """Reemplazo de EscrituraAgrupada: el servidor agrupa los commits de todas las recepciones"""
+
+    def __init__(self, cliente, hilos=4):
+        self.cliente = cliente
+        self._hilos = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="escritura_remota")
+
+    def guardar_paciente(self, nombre, edad, accidente, doctor, fecha):
+        return self._hilos.submit(self.cliente.llamar, "guardar_paciente_bd", nombre, edad, accidente, doctor, fecha)
+
+    def registrar_entrada_salida(self, nombre, cargo, tipo_registro, observaciones=""):
+        return self._hilos.submit(self.cliente.llamar, "registrar_entrada_salida_bd",
+                                  nombre, cargo, tipo_registro, observaciones)
+
+    def cerrar(self):
+        self._hilos.shutdown(wait=True)
+
+    def reporte(self):
+        try:
+            return f"en el servidor: {self.cliente.estadisticas()['reporte_escritura_agrupada']}"
+        except OSError as e:
+            return f"servidor no disponible ({e})"
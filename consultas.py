@@ -0,0 +1,173 @@
+# ============================
+#   CONSULTAS PAGINADAS
+# ============================
+# Lectura por páginas con "keyset" (se busca a partir de la última clave
+# de orden + id vista, en lugar de OFFSET) y solo con las columnas que se
+# van a mostrar. Así cada página cuesta lo mismo sin importar cuántas filas
+# haya antes, y nunca se carga la tabla completa en memoria.
+from base_datos import obtener_gestor
+
+# Para cada tabla: columnas que se pueden pedir, columnas por las que se
+# puede ordenar (con la expresión SQL de orden), filtro fijo y columna de
+# fecha ISO para los rangos. Solo se aceptan nombres de esta lista.
+# Las columnas que admiten NULL se ordenan con IFNULL(...): (NULL, id) > (?, ?)
+# nunca es verdadero y el keyset se saltaría esas filas. Las fechas ISO de
+# filas antiguas son NULL hasta que rellenar_fechas_iso() las completa.
+# Cada expresión tiene su índice (migraciones 5 y 10).
+TABLAS = {
+    "pacientes": {
+        "columnas": ("id", "nombre", "edad", "accidente", "doctor_asignado", "fecha_atencion_iso"),
+        "orden": {
+            "id": "id",
+            "nombre": "nombre",
+            "edad": "IFNULL(edad, -1)",
+            "accidente": "accidente",
+            "doctor_asignado": "doctor_asignado",
+            "fecha_atencion_iso": "IFNULL(fecha_atencion_iso, '')",
+        },
+        "filtro": "1",
+        "fecha": "fecha_atencion_iso",
+    },
+    "citas": {
+        "columnas": ("id", "nombre_paciente", "telefono", "motivo", "doctor",
+                     "fecha_hora_iso", "hora_cita", "estado"),
+        "orden": {
+            "id": "id",
+            "nombre_paciente": "nombre_paciente",
+            "telefono": "IFNULL(telefono, '')",
+            "motivo": "motivo",
+            "doctor": "doctor",
+            "fecha_hora_iso": "IFNULL(fecha_hora_iso, '')",
+            "hora_cita": "hora_cita",
+            "estado": "IFNULL(estado, '')",
+        },
+        "filtro": "1",
+        "fecha": "fecha_hora_iso",
+    },
+    "personal": {
+        # foto_encoding queda fuera a propósito: es un BLOB que no se muestra
+        "columnas": ("id", "nombre", "cargo", "codigo", "fecha_registro"),
+        "orden": {"id": "id", "nombre": "nombre", "cargo": "cargo", "codigo": "codigo",
+                  "fecha_registro": "fecha_registro"},
+        "filtro": "activo = 1",
+        "fecha": None,
+    },
+    "asistencia": {
+        "columnas": ("id", "nombre_personal", "cargo", "fecha_iso", "hora_entrada",
+                     "hora_salida", "estado", "observaciones"),
+        "orden": {
+            "id": "id",
+            "nombre_personal": "nombre_personal",
+            "cargo": "cargo",
+            "fecha_iso": "IFNULL(fecha_iso, '')",
+            "hora_entrada": "IFNULL(hora_entrada, '')",
+            "hora_salida": "IFNULL(hora_salida, '')",
+            "estado": "IFNULL(estado, '')",
+            "observaciones": "IFNULL(observaciones, '')",
+        },
+        "filtro": "1",
+        "fecha": "fecha_iso",
+    },
+}
+
+def _definicion(tabla):
+    if tabla not in TABLAS:
+        raise ValueError(f"Tabla no permitida: {tabla}")
+    return TABLAS[tabla]
+
+def _condiciones(definicion, rango):
+    condiciones = [definicion["filtro"]]
+    parametros = []
+    if rango is not None:
+        if not definicion["fecha"]:
+            raise ValueError("La tabla no tiene columna de fecha para filtrar por rango")
+        inicio, fin = rango
+        # Misma expresión que el orden por fecha, para que un solo índice
+        # sirva al rango y al ORDER BY (las filas sin fecha quedan fuera igual)
+        fecha = definicion["orden"][definicion["fecha"]]
+        condiciones.append(f"{fecha} >= ? AND {fecha} < ?")
+        parametros += [inicio, fin]
+    return condiciones, parametros
+
+def pagina(tabla, columnas=None, orden="id", descendente=False, despues_de=None, limite=100, rango=None,
+           con_clave=False):
+    """Devuelve (filas, siguiente) de una página de la tabla.
+
+    columnas: tupla con las columnas a traer (por defecto las de la vista).
+    despues_de: valor "siguiente" devuelto por la página anterior, o None
+    para la primera. siguiente es None cuando ya no hay más filas.
+    rango: (inicio, fin) ISO sobre la columna de fecha de la tabla.
+    con_clave: si es True cada fila se devuelve como (fila, clave), donde
+    clave sirve como despues_de para seguir desde esa fila.
+    """
+    definicion = _definicion(tabla)
+    columnas = tuple(columnas or definicion["columnas"])
+    for columna in columnas:
+        if columna not in definicion["columnas"]:
+            raise ValueError(f"Columna no permitida en {tabla}: {columna}")
+    if orden not in definicion["orden"]:
+        raise ValueError(f"No se puede ordenar {tabla} por {orden}")
+
+    expresion = definicion["orden"][orden]
+    sentido = "DESC" if descendente else "ASC"
+    comparador = "<" if descendente else ">"
+    condiciones, parametros = _condiciones(definicion, rango)
+    if despues_de is not None:
+        # La primera condición (redundante) deja que SQLite busque en el índice
+        # de la expresión; con solo la comparación de filas lo recorre entero
+        condiciones.append(f"{expresion} {comparador}= ? AND ({expresion}, id) {comparador} (?, ?)")
+        parametros += [despues_de[0], *despues_de]
+
+    sql = (f"SELECT {', '.join(columnas)}, {expresion}, id FROM {tabla} "
+           f"WHERE {' AND '.join(condiciones)} "
+           f"ORDER BY {expresion} {sentido}, id {sentido} LIMIT ?")
+    filas = obtener_gestor().lectura().execute(sql, parametros + [limite]).fetchall()
+
+    siguiente = (filas[-1][-2], filas[-1][-1]) if len(filas) == limite else None
+    if con_clave:
+        return [(fila[:-2], (fila[-2], fila[-1])) for fila in filas], siguiente
+    return [fila[:-2] for fila in filas], siguiente
+
+def iterar(tabla, columnas=None, orden="id", descendente=False, lote=1000, rango=None):
+    """Recorre la tabla completa por páginas, sin cargarla entera en memoria"""
+    despues_de = None
+    while True:
+        filas, despues_de = pagina(tabla, columnas, orden, descendente, despues_de, lote, rango)
+        yield from filas
+        if despues_de is None:
+            return
+
+def cursor(tabla, columnas=None, orden="id", descendente=False, rango=None):
+    """Cursor abierto sobre toda la tabla (o el rango), para leer con fetchmany()
+
+    A diferencia de iterar(), es una sola consulta: todas las filas salen de
+    la misma instantánea de la base de datos aunque se lean poco a poco.
+    Se usa en una conexión de lectura propia del hilo, no compartida.
+    """
+    definicion = _definicion(tabla)
+    columnas = tuple(columnas or definicion["columnas"])
+    for columna in columnas:
+        if columna not in definicion["columnas"]:
+            raise ValueError(f"Columna no permitida en {tabla}: {columna}")
+    if orden not in definicion["orden"]:
+        raise ValueError(f"No se puede ordenar {tabla} por {orden}")
+    sentido = "DESC" if descendente else "ASC"
+    condiciones, parametros = _condiciones(definicion, rango)
+    return obtener_gestor().lectura().execute(
+        f"SELECT {', '.join(columnas)} FROM {tabla} WHERE {' AND '.join(condiciones)} "
+        f"ORDER BY {definicion['orden'][orden]} {sentido}, id {sentido}", parametros)
+
+def contar(tabla, rango=None):
+    """Número de filas de la tabla (con su filtro fijo y el rango indicado)"""
+    definicion = _definicion(tabla)
+    condiciones, parametros = _condiciones(definicion, rango)
+    return obtener_gestor().lectura().execute(
+        f"SELECT COUNT(*) FROM {tabla} WHERE {' AND '.join(condiciones)}", parametros).fetchone()[0]
+
+def clave(tabla, id_fila, orden="id"):
+    """Clave de keyset (valor de orden, id) de una fila, o None si no existe"""
+    definicion = _definicion(tabla)
+    if orden not in definicion["orden"]:
+        raise ValueError(f"No se puede ordenar {tabla} por {orden}")
+    return obtener_gestor().lectura().execute(
+        f"SELECT {definicion['orden'][orden]}, id FROM {tabla} WHERE id = ?", (id_fila,)).fetchone()
@@ -0,0 +1,349 @@
+# ============================
+#   PACIENTES DUPLICADOS (MISMA PERSONA, VARIOS NOMBRES)
+# ============================
+# Cada atención en pacientes guarda el nombre escrito a mano, así que la
+# misma persona aparece como "Jose Perez", "José Pérez" o "Perez Jose".
+# Este módulo sugiere qué nombres fusionar sin comparar todos contra todos:
+#   1. Se leen los nombres distintos con su número de atenciones y rango
+#      de edades (GROUP BY nombre, por el índice idx_pacientes_nombre).
+#   2. Cada nombre se normaliza (sin tildes, minúsculas, solo letras) y
+#      los que quedan iguales ya son la misma persona.
+#   3. Cada nombre normalizado recibe claves de bloque, todas con las
+#      palabras ordenadas (así "Perez Jose" cae con "Jose Perez"): el código
+#      fonético de cada palabra (b/v, s/z/c, j/g, h muda, ...), sus tres
+#      primeras letras, sus tres últimas (un error al inicio de una palabra)
+#      y, con tres palabras o más, las primeras letras sin una de ellas
+#      (solo contra nombres más cortos: "Jose Luis Perez" con "Jose Perez").
+#      Solo se comparan nombres que comparten alguna clave, y los bloques
+#      más grandes que MAXIMO_BLOQUE se descartan (claves demasiado comunes).
+#   4. Cada par candidato se puntúa con Jaro-Winkler (el mejor entre el
+#      orden escrito y las palabras ordenadas), con una penalización si
+#      las edades no son compatibles. Los pares cuyos largos ya no pueden
+#      llegar al umbral se descartan sin calcularlo.
+#   5. Los pares sobre UMBRAL_SIMILITUD se agrupan (unión-búsqueda) y cada
+#      grupo propone como nombre correcto la escritura más usada. Un grupo
+#      es "encadenado" si algún par de sus nombres no llegó al umbral y solo
+#      quedó unido a través de otro ("Jose Luis Perez" ~ "Jose Perez" ~
+#      "Josue Perez"): esas sugerencias nunca se aplican sin revisión.
+# fusionar_nombres_bd() aplica una sugerencia en pacientes y en citas.
+#
+# Uso:
+#   python duplicados_pacientes.py [--umbral 0.92] [--json sugerencias.json]
+#   python duplicados_pacientes.py --fusionar      (aplica las sugerencias no encadenadas)
+#   python duplicados_pacientes.py --aplicar sugerencias.json   (aplica un archivo ya revisado)
+import argparse
+import json
+import logging
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from itertools import combinations
+
+from base_datos import conectar_bd, configurar_bd, obtener_gestor
+
+log = logging.getLogger(__name__)
+
+UMBRAL_SIMILITUD = 0.92
+MAXIMO_BLOQUE = 200          # bloques más grandes no se comparan (clave poco útil)
+DIFERENCIA_EDAD = 5          # años entre atenciones que aún se consideran la misma persona
+PENALIZACION_EDAD = 0.15
+PARTICULAS = {"de", "del", "la", "las", "los", "y"}
+
+# ============================
+#   NORMALIZACIÓN Y CLAVES DE BLOQUE
+# ============================
+def normalizar(nombre):
+    """'  José  PÉREZ-gómez ' -> 'jose perez gomez'"""
+    sin_tildes = unicodedata.normalize("NFKD", nombre).encode("ascii", "ignore").decode("ascii")
+    return " ".join(re.sub(r"[^a-z]+", " ", sin_tildes.lower()).split())
+
+# Reglas en orden: primero los grupos de letras, después las letras sueltas
+REGLAS_FONETICAS = (
+    ("ch", "x"), ("ll", "y"), ("qu", "k"),
+    ("ce", "se"), ("ci", "si"), ("ge", "je"), ("gi", "ji"), ("gue", "ge"), ("gui", "gi"),
+    ("c", "k"), ("z", "s"), ("v", "b"), ("w", "b"), ("h", ""), ("i", "y"),
+)
+
+def fonetico(palabra):
+    """Código fonético simple para el español: primera letra sonora + consonantes sin repetir"""
+    for grupo, reemplazo in REGLAS_FONETICAS:
+        palabra = palabra.replace(grupo, reemplazo)
+    if not palabra:
+        return ""
+    codigo = palabra[0]
+    for letra in palabra[1:]:
+        if letra not in "aeiouy" and letra != codigo[-1]:
+            codigo += letra
+    return codigo
+
+def _palabras(normalizado):
+    palabras = [p for p in normalizado.split() if p not in PARTICULAS]
+    return palabras or normalizado.split()
+
+def claves_bloque(normalizado):
+    """Claves fonética, de prefijos y de sufijos (3 letras) de las palabras ordenadas"""
+    palabras = sorted(_palabras(normalizado))
+    if not palabras:
+        return set()
+    prefijos = [p[:3] for p in palabras]
+    claves = {
+        "f:" + "|".join(fonetico(p) for p in palabras),
+        "n:" + "|".join(prefijos),
+        "s:" + "|".join(p[-3:] for p in palabras),
+    }
+    if len(palabras) > 2:
+        # Una palabra de más o de menos (segundo nombre o segundo apellido):
+        # "d:x" solo se compara con los nombres cortos de la clave "n:x"
+        for omitida in range(len(palabras)):
+            claves.add("d:" + "|".join(prefijos[:omitida] + prefijos[omitida + 1:]))
+    return claves
+
+# ============================
+#   SIMILITUD
+# ============================
+def jaro_winkler(a, b):
+    """Similitud de Jaro-Winkler entre dos textos (1.0 = iguales)"""
+    if a == b:
+        return 1.0
+    largo_a, largo_b = len(a), len(b)
+    if not largo_a or not largo_b:
+        return 0.0
+    ventana = max(max(largo_a, largo_b) // 2 - 1, 0)
+    usadas_b = [False] * largo_b
+    coincidencias_a = []
+    for i, letra in enumerate(a):
+        fin = min(largo_b, i + ventana + 1)
+        j = b.find(letra, max(0, i - ventana), fin)
+        while j != -1 and usadas_b[j]:
+            j = b.find(letra, j + 1, fin)
+        if j != -1:
+            usadas_b[j] = True
+            coincidencias_a.append(letra)
+    m = len(coincidencias_a)
+    if not m:
+        return 0.0
+    coincidencias_b = [b[j] for j in range(largo_b) if usadas_b[j]]
+    transposiciones = sum(x != y for x, y in zip(coincidencias_a, coincidencias_b)) / 2
+    jaro = (m / largo_a + m / largo_b + (m - transposiciones) / m) / 3
+    prefijo = 0
+    for x, y in zip(a[:4], b[:4]):
+        if x != y:
+            break
+        prefijo += 1
+    return jaro + prefijo * 0.1 * (1 - jaro)
+
+def cota_jaro_winkler(largo_a, largo_b):
+    """Máximo Jaro-Winkler posible entre textos de esos largos (todas las letras coinciden)"""
+    if not largo_a or not largo_b:
+        return 0.0
+    jaro = (2 + min(largo_a, largo_b) / max(largo_a, largo_b)) / 3
+    return jaro + 0.4 * (1 - jaro)
+
+def _edades_compatibles(rango_a, rango_b):
+    (min_a, max_a), (min_b, max_b) = rango_a, rango_b
+    if min_a is None or min_b is None:
+        return True
+    return min_a - DIFERENCIA_EDAD <= max_b and min_b - DIFERENCIA_EDAD <= max_a
+
+def similitud(a, b, rango_a=(None, None), rango_b=(None, None)):
+    """Puntaje entre dos nombres normalizados (0 a 1), con las edades si se conocen"""
+    puntaje = max(jaro_winkler(a, b),
+                  jaro_winkler(" ".join(sorted(_palabras(a))), " ".join(sorted(_palabras(b)))))
+    if not _edades_compatibles(rango_a, rango_b):
+        puntaje -= PENALIZACION_EDAD
+    return puntaje
+
+# ============================
+#   DETECCIÓN
+# ============================
+def leer_nombres():
+    """[(nombre, atenciones, edad mínima, edad máxima)] de cada nombre escrito distinto"""
+    return obtener_gestor().lectura().execute(
+        "SELECT nombre, COUNT(*), MIN(edad), MAX(edad) FROM pacientes GROUP BY nombre").fetchall()
+
+def buscar_duplicados(nombres, umbral=UMBRAL_SIMILITUD, maximo_bloque=MAXIMO_BLOQUE):
+    """Sugerencias de fusión a partir de [(nombre, atenciones, edad mín., edad máx.)].
+
+    Devuelve (sugerencias, estadísticas). Cada sugerencia es un dict con el
+    nombre propuesto, las variantes a reemplazar, las atenciones de cada una,
+    el menor puntaje del grupo y si es encadenada (no todos sus pares
+    llegaron al umbral).
+    """
+    # Nombres normalizados iguales: misma persona sin necesidad de comparar
+    variantes = defaultdict(list)       # normalizado -> [(nombre, atenciones)]
+    edades = {}
+    for nombre, atenciones, edad_min, edad_max in nombres:
+        normalizado = normalizar(nombre or "")
+        if not normalizado:
+            continue
+        variantes[normalizado].append((nombre, atenciones))
+        anterior = edades.get(normalizado)
+        if anterior is None or anterior[0] is None:
+            edades[normalizado] = (edad_min, edad_max)
+        elif edad_min is not None:
+            edades[normalizado] = (min(anterior[0], edad_min), max(anterior[1], edad_max))
+
+    # Largos del orden escrito y de las palabras ordenadas, para la cota
+    largos = {normalizado: (len(normalizado), len(" ".join(_palabras(normalizado))))
+              for normalizado in variantes}
+
+    bloques = defaultdict(list)
+    for normalizado in variantes:
+        for clave in claves_bloque(normalizado):
+            bloques[clave].append(normalizado)
+
+    # Pares candidatos: los que comparten al menos un bloque no demasiado grande
+    candidatos = set()
+    descartados = 0
+    for clave, miembros in bloques.items():
+        if clave.startswith("d:"):
+            cortos = bloques.get("n:" + clave[2:], ())
+            if len(miembros) + len(cortos) > maximo_bloque:
+                descartados += 1
+                continue
+            candidatos.update((min(a, b), max(a, b)) for a in miembros for b in cortos)
+            continue
+        if len(miembros) > maximo_bloque:
+            descartados += 1
+            continue
+        candidatos.update(combinations(sorted(miembros), 2))
+
+    padre = {}
+
+    def raiz(x):
+        while padre.get(x, x) != x:
+            x = padre[x]
+        return x
+
+    puntajes = {}
+    pares = set()                       # pares (ordenados) que llegaron al umbral
+    comparados = 0
+    for a, b in candidatos:
+        (largo_a, ordenado_a), (largo_b, ordenado_b) = largos[a], largos[b]
+        if max(cota_jaro_winkler(largo_a, largo_b), cota_jaro_winkler(ordenado_a, ordenado_b)) < umbral:
+            continue
+        comparados += 1
+        puntaje = similitud(a, b, edades[a], edades[b])
+        if puntaje >= umbral:
+            pares.add((a, b))
+            ra, rb = raiz(a), raiz(b)
+            if ra != rb:
+                padre[rb] = ra
+            puntajes[a] = min(puntajes.get(a, 1.0), puntaje)
+            puntajes[b] = min(puntajes.get(b, 1.0), puntaje)
+
+    grupos = defaultdict(list)
+    for normalizado, lista in variantes.items():
+        grupos[raiz(normalizado)].extend((nombre, atenciones, normalizado) for nombre, atenciones in lista)
+
+    sugerencias = []
+    for miembros in grupos.values():
+        if len(miembros) < 2:
+            continue
+        # La escritura más usada; a igualdad, la que lleva tildes
+        miembros.sort(key=lambda m: (-m[1], m[0].isascii(), m[0]))
+        propuesto = miembros[0][0]
+        normalizados = sorted({normalizado for _, _, normalizado in miembros})
+        sugerencias.append({
+            "nombre": propuesto,
+            "variantes": [nombre for nombre, _, _ in miembros[1:]],
+            "atenciones": {nombre: atenciones for nombre, atenciones, _ in miembros},
+            "puntaje": round(min((puntajes.get(n, 1.0) for _, _, n in miembros), default=1.0), 3),
+            "encadenada": any(par not in pares for par in combinations(normalizados, 2)),
+        })
+    sugerencias.sort(key=lambda s: (-sum(s["atenciones"].values()), s["nombre"]))
+    estadisticas = {
+        "nombres_escritos": len(nombres),
+        "nombres_normalizados": len(variantes),
+        "bloques": len(bloques),
+        "bloques_descartados": descartados,
+        "pares_candidatos": len(candidatos),
+        "pares_comparados": comparados,
+        "pares_posibles": len(variantes) * (len(variantes) - 1) // 2,
+        "sugerencias": len(sugerencias),
+        "encadenadas": sum(sugerencia["encadenada"] for sugerencia in sugerencias),
+    }
+    return sugerencias, estadisticas
+
+def buscar_duplicados_bd(umbral=UMBRAL_SIMILITUD):
+    """buscar_duplicados() sobre los nombres de la base de datos"""
+    return buscar_duplicados(leer_nombres(), umbral)
+
+def fusionar_nombres_bd(nombre, variantes):
+    """Reemplaza las variantes por nombre en pacientes y citas; devuelve las filas cambiadas"""
+    variantes = [v for v in variantes if v != nombre]
+    if not variantes:
+        return 0
+    marcas = ", ".join("?" * len(variantes))
+    with obtener_gestor().escritura() as conexion:
+        pacientes = conexion.execute(f"UPDATE pacientes SET nombre = ? WHERE nombre IN ({marcas})",
+                                     [nombre, *variantes]).rowcount
+        citas = conexion.execute(f"UPDATE citas SET nombre_paciente = ? WHERE nombre_paciente IN ({marcas})",
+                                 [nombre, *variantes]).rowcount
+    log.info("Fusionados en '%s': %d atenciones y %d citas", nombre, pacientes, citas)
+    return pacientes + citas
+
+def leer_sugerencias(ruta):
+    """Sugerencias de un archivo JSON (el que escribe --json, después de revisarlo)"""
+    with open(ruta, encoding="utf-8") as archivo:
+        sugerencias = json.load(archivo)
+    if not isinstance(sugerencias, list):
+        raise ValueError(f"{ruta}: se esperaba una lista de sugerencias")
+    for numero, sugerencia in enumerate(sugerencias, 1):
+        if (not isinstance(sugerencia, dict) or not isinstance(sugerencia.get("nombre"), str)
+                or not isinstance(sugerencia.get("variantes"), list)
+                or not all(isinstance(v, str) for v in sugerencia["variantes"])):
+            raise ValueError(f"{ruta}: la sugerencia {numero} necesita 'nombre' y una lista 'variantes'")
+    return sugerencias
+
+def main():
+    parser = argparse.ArgumentParser(description="Sugerencias de pacientes duplicados por variantes del nombre")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_SIMILITUD)
+    parser.add_argument("--json", default=None, help="guardar las sugerencias en un archivo JSON")
+    parser.add_argument("--fusionar", action="store_true",
+                        help="aplicar las sugerencias en las que todos los pares superan el umbral")
+    parser.add_argument("--aplicar", default=None, metavar="JSON",
+                        help="aplicar las sugerencias de un archivo revisado (el de --json) y nada más")
+    parser.add_argument("--bd", default=None, help="ruta de la base de datos")
+    args = parser.parse_args()
+    if args.aplicar and (args.fusionar or args.json):
+        parser.error("--aplicar no se combina con --fusionar ni --json")
+
+    if args.bd:
+        configurar_bd(args.bd)
+    conectar_bd()
+    if args.aplicar:
+        try:
+            sugerencias = leer_sugerencias(args.aplicar)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        cambiadas = sum(fusionar_nombres_bd(s["nombre"], s["variantes"]) for s in sugerencias)
+        print(f"{len(sugerencias)} sugerencias aplicadas, {cambiadas} filas cambiadas")
+        return
+    inicio = time.perf_counter()
+    nombres = leer_nombres()
+    lectura = time.perf_counter() - inicio
+    sugerencias, estadisticas = buscar_duplicados(nombres, args.umbral)
+    estadisticas["segundos_lectura"] = round(lectura, 2)
+    estadisticas["segundos_total"] = round(time.perf_counter() - inicio, 2)
+
+    for sugerencia in sugerencias[:50]:
+        aviso = "  [encadenada: revisar]" if sugerencia["encadenada"] else ""
+        print(f"{sugerencia['nombre']}  <-  {', '.join(sugerencia['variantes'])}  ({sugerencia['puntaje']}){aviso}")
+    if len(sugerencias) > 50:
+        print(f"... y {len(sugerencias) - 50} sugerencias más")
+    print(json.dumps(estadisticas, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(sugerencias, archivo, indent=2, ensure_ascii=False)
+    if args.fusionar:
+        # Las encadenadas unen nombres que no se parecen entre sí: solo con --aplicar
+        directas = [sugerencia for sugerencia in sugerencias if not sugerencia["encadenada"]]
+        for sugerencia in directas:
+            fusionar_nombres_bd(sugerencia["nombre"], sugerencia["variantes"])
+        print(f"{len(directas)} sugerencias aplicadas; {len(sugerencias) - len(directas)} encadenadas "
+              "sin aplicar (revisarlas con --json y aplicarlas con --aplicar)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# ============================
+#   EJECUTOR DE BASE DE DATOS EN SEGUNDO PLANO
+# ============================
+# Las llamadas a la base de datos se hacen fuera del hilo de Tk para que
+# un disco lento o una base bloqueada no congelen la ventana:
+#   - un único hilo escritor (las escrituras ya se serializan en SQLite)
+#   - un grupo de hilos lectores (cada uno con su conexión de lectura WAL)
+# Cada envío devuelve un Future. Los callbacks al_terminar / al_fallar no
+# se ejecutan en el hilo de trabajo: el resultado se deja en una cola que
+# el hilo de Tk vacía periódicamente con ventana.after().
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+LECTORES = 2
+INTERVALO_SONDEO_MS = 20
+
+class EjecutorBD:
+    """Ejecuta funciones *_bd en hilos de trabajo y devuelve los resultados al hilo de la interfaz"""
+
+    def __init__(self, lectores=LECTORES):
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritor_bd")
+        self._lectores = ThreadPoolExecutor(max_workers=lectores, thread_name_prefix="lector_bd")
+        self._resultados = queue.SimpleQueue()
+        self._ventana = None
+        self._intervalo = INTERVALO_SONDEO_MS
+
+    # ============================
+    #   ENVÍO DE TRABAJOS
+    # ============================
+    def _enviar(self, grupo, funcion, args, kwargs, al_terminar, al_fallar):
+        return self.seguir(grupo.submit(funcion, *args, **kwargs), al_terminar, al_fallar, funcion)
+
+    def seguir(self, futuro, al_terminar=None, al_fallar=None, funcion=None):
+        """Entrega al hilo de la interfaz el resultado de un Future creado en otro lado"""
+        futuro.add_done_callback(lambda f: self._resultados.put((f, funcion, al_terminar, al_fallar)))
+        return futuro
+
+    def leer(self, funcion, *args, al_terminar=None, al_fallar=None, **kwargs):
+        """Ejecuta una consulta en el grupo de lectores"""
+        return self._enviar(self._lectores, funcion, args, kwargs, al_terminar, al_fallar)
+
+    def escribir(self, funcion, *args, al_terminar=None, al_fallar=None, **kwargs):
+        """Ejecuta una escritura en el hilo escritor, en el orden en que se envían"""
+        return self._enviar(self._escritor, funcion, args, kwargs, al_terminar, al_fallar)
+
+    # ============================
+    #   ENTREGA DE RESULTADOS
+    # ============================
+    def procesar_resultados(self):
+        """Ejecuta, en el hilo que llama, los callbacks de los trabajos ya terminados"""
+        while True:
+            try:
+                futuro, funcion, al_terminar, al_fallar = self._resultados.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                error = futuro.exception()
+                if error is None:
+                    if al_terminar:
+                        al_terminar(futuro.result())
+                elif al_fallar:
+                    al_fallar(error)
+                else:
+                    log.error("Error en %s: %s", getattr(funcion, "__name__", "operación"), error)
+            except Exception as e:
+                log.exception("Error en el callback de %s: %s", getattr(funcion, "__name__", "operación"), e)
+
+    def conectar_a_tk(self, ventana, intervalo_ms=INTERVALO_SONDEO_MS):
+        """Empieza a vaciar la cola de resultados desde el bucle de Tk"""
+        self._ventana = ventana
+        self._intervalo = intervalo_ms
+        ventana.after(intervalo_ms, self._sondear)
+
+    def _sondear(self):
+        try:
+            self.procesar_resultados()
+        finally:
+            self._ventana.after(self._intervalo, self._sondear)
+
+    def cerrar(self, esperar=True):
+        """Termina los hilos; con esperar=True deja acabar las escrituras pendientes"""
+        self._lectores.shutdown(wait=esperar)
+        self._escritor.shutdown(wait=esperar)
@@ -0,0 +1,210 @@
+# ============================
+#   ESCRITURA AGRUPADA (GROUP COMMIT)
+# ============================
+# Altas de pacientes y registros de asistencia que llegan casi a la vez
+# (por ejemplo, todo el personal marcando entrada en el cambio de turno)
+# se juntan en una sola transacción: un hilo espera unos milisegundos
+# desde la primera operación, o hasta reunir un máximo de operaciones, y
+# las confirma juntas con un único commit durable (synchronous = FULL).
+# Cada operación corre dentro de su propio SAVEPOINT, así que un error
+# en una no anula las demás. El Future de cada operación se completa
+# recién después del commit: cuando la interfaz confirma, ya está en disco.
+#
+# Uso desde consola (simula un cambio de turno):
+#   python escritura_agrupada.py --personal 60 --carpeta /tmp
+# La simulación borra y llena la tabla asistencia, por eso corre siempre
+# sobre una base temporal propia (que se borra al terminar), nunca sobre
+# pacientes.db.
+import argparse
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+from base_datos import insertar_paciente, obtener_gestor, registrar_asistencia
+
+VENTANA_MS = 5
+MAXIMO_LOTE = 128
+LATENCIAS_GUARDADAS = 1000
+
+class EscrituraAgrupada:
+    """Cola de escrituras que se confirman por lotes en una sola transacción"""
+
+    def __init__(self, ventana_ms=VENTANA_MS, maximo=MAXIMO_LOTE, durable=True):
+        self.ventana = ventana_ms / 1000
+        self.maximo = maximo
+        self.durable = durable
+        self._cola = queue.Queue()
+        self._tamanos = Counter()                               # tamaño de lote -> veces
+        self._latencias = deque(maxlen=LATENCIAS_GUARDADAS)     # ms de cada commit
+        self._candado = threading.Lock()
+        self._hilo = threading.Thread(target=self._bucle, name="escritura_agrupada", daemon=True)
+        self._hilo.start()
+
+    # ============================
+    #   OPERACIONES
+    # ============================
+    def enviar(self, operacion, *args):
+        """Encola operacion(conexion, *args) y devuelve un Future con su resultado"""
+        futuro = Future()
+        self._cola.put((operacion, args, futuro))
+        return futuro
+
+    def guardar_paciente(self, nombre, edad, accidente, doctor, fecha):
+        """Como guardar_paciente_bd(), pero agrupado. El Future devuelve la fila"""
+        return self.enviar(insertar_paciente, nombre, edad, accidente, doctor, fecha)
+
+    def registrar_entrada_salida(self, nombre, cargo, tipo_registro, observaciones=""):
+        """Como registrar_entrada_salida_bd(), pero agrupado. El Future devuelve (resultado, hora)"""
+        return self.enviar(registrar_asistencia, nombre, cargo, tipo_registro, observaciones)
+
+    # ============================
+    #   HILO DE ESCRITURA
+    # ============================
+    def _bucle(self):
+        while True:
+            primera = self._cola.get()
+            if primera is None:
+                return
+            lote = [primera]
+            terminar = False
+            limite = time.monotonic() + self.ventana
+            while len(lote) < self.maximo:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    siguiente = self._cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if siguiente is None:
+                    terminar = True
+                    break
+                lote.append(siguiente)
+            self._escribir(lote)
+            if terminar:
+                return
+
+    def _escribir(self, lote):
+        resultados = []
+        try:
+            with obtener_gestor().escritura(durable=self.durable) as conexion:
+                for operacion, args, futuro in lote:
+                    conexion.execute("SAVEPOINT operacion")
+                    try:
+                        resultados.append((futuro, operacion(conexion, *args), None))
+                    except Exception as e:
+                        conexion.execute("ROLLBACK TO operacion")
+                        resultados.append((futuro, None, e))
+                    conexion.execute("RELEASE operacion")
+                inicio_commit = time.perf_counter()
+            latencia = (time.perf_counter() - inicio_commit) * 1000
+        except Exception as e:
+            # Falló el commit: ninguna operación del lote quedó guardada
+            for _, _, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        with self._candado:
+            self._tamanos[len(lote)] += 1
+            self._latencias.append(latencia)
+        for futuro, valor, error in resultados:
+            if error is None:
+                futuro.set_result(valor)
+            else:
+                futuro.set_exception(error)
+
+    def cerrar(self):
+        """Confirma lo que quede en la cola y termina el hilo"""
+        self._cola.put(None)
+        self._hilo.join()
+
+    # ============================
+    #   ESTADÍSTICAS
+    # ============================
+    def estadisticas(self):
+        """Tamaños de lote y latencia de commit (ms) desde que se creó la cola"""
+        with self._candado:
+            tamanos = dict(self._tamanos)
+            latencias = sorted(self._latencias)
+        lotes = sum(tamanos.values())
+        operaciones = sum(tamano * veces for tamano, veces in tamanos.items())
+
+        def percentil(p):
+            return round(latencias[min(int(p * len(latencias)), len(latencias) - 1)], 3) if latencias else 0.0
+
+        histograma = Counter()
+        for tamano, veces in tamanos.items():
+            inferior = 1 << (tamano.bit_length() - 1)   # 1, 2-3, 4-7, 8-15, ...
+            histograma[f"{inferior}-{inferior * 2 - 1}" if inferior > 1 else "1"] += veces
+        return {
+            "lotes": lotes,
+            "operaciones": operaciones,
+            "media_por_lote": round(operaciones / lotes, 2) if lotes else 0.0,
+            "max_por_lote": max(tamanos, default=0),
+            "histograma_lotes": dict(sorted(histograma.items(), key=lambda item: int(item[0].split("-")[0]))),
+            "commit_ms": {"p50": percentil(0.50), "p95": percentil(0.95), "max": percentil(1.0)},
+        }
+
+    def reporte(self):
+        datos = self.estadisticas()
+        return (f"{datos['operaciones']} operaciones en {datos['lotes']} lotes "
+                f"(media {datos['media_por_lote']}, máx {datos['max_por_lote']}); "
+                f"commit p50 {datos['commit_ms']['p50']} ms, p95 {datos['commit_ms']['p95']} ms; "
+                f"lotes {datos['histograma_lotes']}")
+
+# ============================
+#   SIMULACIÓN DE CAMBIO DE TURNO
+# ============================
+def _simular(personal, ventana_ms, maximo):
+    agrupada = EscrituraAgrupada(ventana_ms=ventana_ms, maximo=maximo)
+    barrera = threading.Barrier(personal)
+    esperas = []
+
+    def marcar(numero):
+        barrera.wait()
+        inicio = time.perf_counter()
+        agrupada.registrar_entrada_salida(f"Empleado {numero}", "Enfermería", "entrada").result()
+        esperas.append((time.perf_counter() - inicio) * 1000)
+
+    hilos = [threading.Thread(target=marcar, args=(i,)) for i in range(personal)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - inicio
+    agrupada.cerrar()
+    esperas.sort()
+    return total, esperas[len(esperas) // 2], agrupada.reporte()
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula un cambio de turno con y sin escritura agrupada")
+    parser.add_argument("--personal", type=int, default=60, help="empleados marcando a la vez")
+    parser.add_argument("--ventana-ms", type=float, default=VENTANA_MS)
+    parser.add_argument("--carpeta", default=None,
+                        help="dónde crear la base temporal (por defecto la del sistema); sirve para medir otro disco")
+    args = parser.parse_args()
+
+    from base_datos import cerrar_bd, conectar_bd, configurar_bd
+    with tempfile.TemporaryDirectory(prefix="escritura_agrupada_", dir=args.carpeta) as carpeta:
+        configurar_bd(os.path.join(carpeta, "pacientes.db"))
+        try:
+            conectar_bd()
+            for nombre, ventana_ms, maximo in (("un commit por registro", 0, 1),
+                                               ("escritura agrupada", args.ventana_ms, MAXIMO_LOTE)):
+                # La base es de esta simulación: se vacía entre una medición y otra
+                with obtener_gestor().escritura() as conexion:
+                    conexion.execute("DELETE FROM asistencia")
+                total, mediana, reporte = _simular(args.personal, ventana_ms, maximo)
+                print(f"{nombre}: {args.personal} entradas en {total * 1000:.1f} ms, "
+                      f"espera mediana {mediana:.1f} ms\n   {reporte}")
+        finally:
+            # Cerrar las conexiones antes de borrar la carpeta (con sus -wal y -shm)
+            cerrar_bd()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# ============================
+#   PRUEBA DE ESTRÉS CON VARIOS PROCESOS
+# ============================
+# Lanza N procesos que usan a la vez la misma base de datos con una mezcla
+# de lecturas (búsquedas, páginas, calendario) y escrituras (altas de
+# pacientes, marcas de asistencia, cambios de pacientes), como varias
+# copias de la interfaz abiertas. Opcionalmente agrega procesos "legados"
+# que escriben como los scripts antiguos (sqlite3.connect + INSERT +
+# commit). Informa operaciones por segundo, errores "database is locked",
+# reintentos y el histograma de espera por el candado de escritura.
+#
+# Uso:
+#   python estres_concurrencia.py --procesos 8 --segundos 10
+#   python estres_concurrencia.py --procesos 8 --espera-ms 0 --reintentos 0   (sin espera ni reintentos)
+# La prueba inserta y modifica pacientes y asistencia de mentira, así que
+# corre siempre sobre una base temporal que se borra al terminar.
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+
+import base_datos
+from base_datos import ESPERA_BLOQUEO_MS, REINTENTOS_ESCRITURA, esta_bloqueada
+from consultas import pagina
+
+NOMBRES = ("Ana", "Luis", "María", "José", "Carmen", "Pedro", "Lucía", "Jorge")
+
+def _percentil(ordenadas, p):
+    return round(ordenadas[min(int(p * len(ordenadas)), len(ordenadas) - 1)], 2) if ordenadas else 0.0
+
+# ============================
+#   TRABAJO DE CADA PROCESO
+# ============================
+def _operacion(azar, numero, proporcion_escrituras, creados):
+    """Devuelve (tipo, función sin argumentos) de una operación de la mezcla.
+
+    creados son los ids de los pacientes que dio de alta este proceso: los
+    cambios de pacientes solo tocan esos.
+    """
+    if azar.random() < proporcion_escrituras:
+        eleccion = azar.random()
+        if eleccion < 0.5 or (eleccion >= 0.8 and not creados):
+            def alta():
+                fila = base_datos.guardar_paciente_bd(
+                    f"{azar.choice(NOMBRES)} {numero}", azar.randint(1, 90), "Control", "Dr. Rojas",
+                    f"{azar.randint(1, 28):02d}/{azar.randint(1, 12):02d}/2024 10:00:00")
+                creados.append(fila[0])
+            return "escritura", alta
+        if eleccion < 0.8:
+            return "escritura", lambda: base_datos.registrar_entrada_salida_bd(
+                f"Empleado {numero}-{azar.randint(1, 50)}", "Enfermería", azar.choice(("entrada", "salida")))
+        return "escritura", lambda: base_datos.actualizar_paciente_bd(
+            azar.choice(creados), f"{azar.choice(NOMBRES)} {numero}", azar.randint(1, 90),
+            "Control", "Dr. Rojas", "01/06/2024 09:00:00")
+    eleccion = azar.random()
+    if eleccion < 0.5:
+        return "lectura", lambda: base_datos.consultar_paciente(azar.choice(NOMBRES))
+    if eleccion < 0.8:
+        return "lectura", lambda: pagina("pacientes", orden="nombre", limite=100)
+    return "lectura", lambda: base_datos.obtener_atenciones_por_dia(2024, azar.randint(1, 12))
+
+def _trabajador(numero, ruta, segundos, proporcion_escrituras, espera_ms, reintentos, inicio, salida):
+    # Con "spawn" cada proceso importa base_datos de nuevo: se configura aquí
+    gestor = base_datos.configurar_bd(ruta, espera_ms, reintentos)
+    azar = random.Random(numero)
+    latencias = {"lectura": [], "escritura": []}
+    errores = Counter()
+    creados = []
+    inicio.wait()
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        tipo, funcion = _operacion(azar, numero, proporcion_escrituras, creados)
+        antes = time.perf_counter()
+        try:
+            funcion()
+        except sqlite3.OperationalError as e:
+            errores["bloqueada" if esta_bloqueada(e) else str(e)] += 1
+            continue
+        latencias[tipo].append((time.perf_counter() - antes) * 1000)
+    salida.put({"lecturas": latencias["lectura"], "escrituras": latencias["escritura"],
+                "errores": dict(errores), "bloqueo": gestor.estadisticas_bloqueo()})
+
+def _trabajador_legado(numero, ruta, segundos, inicio, salida):
+    """Escribe como practica3.py: conexión propia, transacción implícita y commit"""
+    conexion = sqlite3.connect(ruta)      # timeout por defecto de sqlite3: 5 s
+    latencias = []
+    errores = Counter()
+    inicio.wait()
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        antes = time.perf_counter()
+        try:
+            conexion.execute("INSERT INTO pacientes (nombre, edad, accidente, doctor_asignado, fecha_atencion) "
+                             "VALUES (?, 30, 'Control', 'Dr. Rojas', '01/06/2024')", (f"Legado {numero}",))
+            conexion.commit()
+        except sqlite3.OperationalError as e:
+            conexion.rollback()
+            errores["bloqueada" if esta_bloqueada(e) else str(e)] += 1
+            continue
+        latencias.append((time.perf_counter() - antes) * 1000)
+        time.sleep(0.01)
+    conexion.close()
+    salida.put({"lecturas": [], "escrituras": latencias, "errores": dict(errores), "bloqueo": None})
+
+# ============================
+#   COORDINACIÓN
+# ============================
+def estresar(ruta, procesos, segundos, proporcion_escrituras=0.3, espera_ms=ESPERA_BLOQUEO_MS,
+             reintentos=REINTENTOS_ESCRITURA, legados=0):
+    """Corre la prueba y devuelve un resumen (dict)"""
+    contexto = multiprocessing.get_context("spawn")
+    inicio = contexto.Event()
+    salida = contexto.Queue()
+    hijos = [contexto.Process(target=_trabajador, args=(i, ruta, segundos, proporcion_escrituras,
+                                                         espera_ms, reintentos, inicio, salida))
+             for i in range(procesos)]
+    hijos += [contexto.Process(target=_trabajador_legado, args=(i, ruta, segundos, inicio, salida))
+              for i in range(legados)]
+    for hijo in hijos:
+        hijo.start()
+    time.sleep(1.0)     # que todos terminen de importar antes de largar
+    inicio.set()
+    resultados = [salida.get() for _ in hijos]
+    for hijo in hijos:
+        hijo.join()
+
+    lecturas = sorted(ms for r in resultados for ms in r["lecturas"])
+    escrituras = sorted(ms for r in resultados for ms in r["escrituras"])
+    errores = Counter()
+    esperas = Counter()
+    reintentos_hechos = fallos = 0
+    for r in resultados:
+        errores.update(r["errores"])
+        if r["bloqueo"]:
+            esperas.update(r["bloqueo"]["esperas_ms"])
+            reintentos_hechos += r["bloqueo"]["reintentos"]
+            fallos += r["bloqueo"]["fallos"]
+    return {
+        "procesos": procesos,
+        "legados": legados,
+        "espera_bloqueo_ms": espera_ms,
+        "reintentos": reintentos,
+        "operaciones_por_segundo": round((len(lecturas) + len(escrituras)) / segundos, 1),
+        "lecturas_por_segundo": round(len(lecturas) / segundos, 1),
+        "escrituras_por_segundo": round(len(escrituras) / segundos, 1),
+        "errores": dict(errores),
+        "lectura_ms": {"p50": _percentil(lecturas, 0.5), "p99": _percentil(lecturas, 0.99)},
+        "escritura_ms": {"p50": _percentil(escrituras, 0.5), "p99": _percentil(escrituras, 0.99),
+                         "max": _percentil(escrituras, 1.0)},
+        "espera_candado_ms": dict(sorted(esperas.items(), key=lambda item: float(item[0].lstrip("<")))),
+        "reintentos_hechos": reintentos_hechos,
+        "rendiciones": fallos,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Varios procesos leyendo y escribiendo la misma base de datos")
+    parser.add_argument("--procesos", type=int, default=8)
+    parser.add_argument("--legados", type=int, default=0, help="procesos que escriben como los scripts antiguos")
+    parser.add_argument("--segundos", type=float, default=10)
+    parser.add_argument("--escrituras", type=float, default=0.3, help="proporción de escrituras")
+    parser.add_argument("--espera-ms", type=int, default=ESPERA_BLOQUEO_MS, help="busy_timeout")
+    parser.add_argument("--reintentos", type=int, default=REINTENTOS_ESCRITURA)
+    parser.add_argument("--carpeta", default=None,
+                        help="dónde crear la base temporal (por defecto la del sistema); sirve para medir otro disco")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="estres_", dir=args.carpeta) as carpeta:
+        ruta = os.path.join(carpeta, "pacientes.db")
+        base_datos.configurar_bd(ruta)
+        try:
+            base_datos.conectar_bd()
+            resumen = estresar(ruta, args.procesos, args.segundos, args.escrituras, args.espera_ms,
+                               args.reintentos, args.legados)
+        finally:
+            base_datos.cerrar_bd()
+    print(json.dumps(resumen, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# ============================
+#   EXPORTACIÓN DE PACIENTES, CITAS Y ASISTENCIA
+# ============================
+# Escribe una tabla (o un rango de fechas de ella) en CSV, JSONL o en un
+# formato binario por columnas, opcionalmente comprimido con gzip.
+# Las filas salen de un único cursor (consultas.cursor) leído con
+# fetchmany(), así que la memoria usada depende del tamaño del lote y no
+# del tamaño de la tabla, y todo el archivo corresponde a una misma
+# instantánea de la base de datos.
+#
+# Uso:
+#   python exportar_datos.py pacientes --mes 2024-01
+#   python exportar_datos.py citas --desde 2024-01-01 --hasta 2024-03-31 --formato jsonl --gzip
+#   python exportar_datos.py asistencia --formato ecol -o asistencia.ecol
+#
+# Formato binario por columnas (.ecol), enteros en little-endian:
+#   cabecera: b"ECOL1\n" + uint32 longitud + JSON {"tabla", "columnas"}
+#   bloques:  uint32 número de filas (0 marca el final) y, por columna,
+#             uint8 tipo + uint32 longitud + datos
+#   tipo 0: columna toda NULL en el bloque (sin datos)
+#   tipo 1: enteros: máscara de nulos (1 bit por fila) + int64 por fila
+#   tipo 2: texto con diccionario: máscara de nulos + uint32 nº de valores
+#           distintos + uint32 longitud de cada uno + sus bytes UTF-8 +
+#           índice de cada fila (uint16, o uint32 si hay 65536 o más)
+import argparse
+import csv
+import gzip
+import io
+import json
+import struct
+import sys
+import time
+from array import array
+from datetime import date, timedelta
+
+from base_datos import conectar_bd, configurar_bd
+from consultas import TABLAS, cursor
+from fechas import rango_mes
+
+LOTE = 5000
+FORMATOS = ("csv", "jsonl", "ecol")
+TABLAS_EXPORTABLES = ("pacientes", "citas", "asistencia")
+# Fin de rango mayor que cualquier fecha ISO (también '9999-12-31 HH:MM:SS')
+FIN_SIN_LIMITE = "9999-12-32"
+
+MAGICO_COLUMNAR = b"ECOL1\n"
+_BIG_ENDIAN = sys.byteorder == "big"
+
+# ============================
+#   ESCRITORES POR FORMATO
+# ============================
+class _EscritorCSV:
+    def __init__(self, salida, columnas):
+        self.salida = io.TextIOWrapper(salida, encoding="utf-8", newline="")
+        self.csv = csv.writer(self.salida)
+        self.csv.writerow(columnas)
+
+    def escribir(self, filas):
+        self.csv.writerows(filas)
+
+    def cerrar(self):
+        self.salida.close()
+
+class _EscritorJSONL:
+    def __init__(self, salida, columnas):
+        self.salida = io.TextIOWrapper(salida, encoding="utf-8", newline="\n")
+        self.columnas = columnas
+
+    def escribir(self, filas):
+        columnas = self.columnas
+        self.salida.write("".join(
+            json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + "\n" for fila in filas))
+
+    def cerrar(self):
+        self.salida.close()
+
+def _mascara_nulos(valores):
+    mascara = bytearray((len(valores) + 7) // 8)
+    for i, valor in enumerate(valores):
+        if valor is None:
+            mascara[i >> 3] |= 1 << (i & 7)
+    return bytes(mascara)
+
+def _a_bytes(arreglo):
+    if _BIG_ENDIAN:
+        arreglo.byteswap()
+    return arreglo.tobytes()
+
+def _codificar_columna(valores):
+    """Devuelve (tipo, datos) de una columna de un bloque"""
+    presentes = [valor for valor in valores if valor is not None]
+    if not presentes:
+        return 0, b""
+    mascara = _mascara_nulos(valores)
+    if all(type(valor) is int for valor in presentes):
+        return 1, mascara + _a_bytes(array("q", (0 if valor is None else valor for valor in valores)))
+
+    diccionario = {}
+    indices = [diccionario.setdefault("" if valor is None else str(valor), len(diccionario))
+               for valor in valores]
+    textos = [texto.encode("utf-8") for texto in diccionario]
+    tipo_indice = "H" if len(textos) < 65536 else "I"
+    return 2, (mascara + struct.pack("<I", len(textos)) + _a_bytes(array("I", map(len, textos)))
+               + b"".join(textos) + _a_bytes(array(tipo_indice, indices)))
+
+class _EscritorColumnar:
+    def __init__(self, salida, columnas, tabla):
+        self.salida = salida
+        cabecera = json.dumps({"tabla": tabla, "columnas": list(columnas)}).encode("utf-8")
+        salida.write(MAGICO_COLUMNAR + struct.pack("<I", len(cabecera)) + cabecera)
+
+    def escribir(self, filas):
+        if not filas:
+            return
+        partes = [struct.pack("<I", len(filas))]
+        for valores in zip(*filas):
+            tipo, datos = _codificar_columna(valores)
+            partes.append(struct.pack("<BI", tipo, len(datos)))
+            partes.append(datos)
+        self.salida.write(b"".join(partes))
+
+    def cerrar(self):
+        self.salida.write(struct.pack("<I", 0))
+        self.salida.close()
+
+# ============================
+#   LECTURA DEL FORMATO POR COLUMNAS
+# ============================
+def _desde_bytes(tipo, datos):
+    arreglo = array(tipo)
+    arreglo.frombytes(datos)
+    if _BIG_ENDIAN:
+        arreglo.byteswap()
+    return arreglo
+
+def _decodificar_columna(tipo, datos, filas):
+    if tipo == 0:
+        return [None] * filas
+    largo_mascara = (filas + 7) // 8
+    mascara, datos = datos[:largo_mascara], datos[largo_mascara:]
+    if tipo == 1:
+        valores = list(_desde_bytes("q", datos))
+    else:
+        distintos = struct.unpack_from("<I", datos)[0]
+        largos = _desde_bytes("I", datos[4:4 + 4 * distintos])
+        posicion = 4 + 4 * distintos
+        textos = []
+        for largo in largos:
+            textos.append(datos[posicion:posicion + largo].decode("utf-8"))
+            posicion += largo
+        indices = _desde_bytes("H" if distintos < 65536 else "I", datos[posicion:])
+        valores = [textos[i] for i in indices]
+    for i in range(filas):
+        if mascara[i >> 3] & (1 << (i & 7)):
+            valores[i] = None
+    return valores
+
+def leer_columnar(ruta):
+    """Recorre un archivo .ecol (o .ecol.gz). Devuelve (columnas, generador de filas)"""
+    entrada = gzip.open(ruta, "rb") if ruta.endswith(".gz") else open(ruta, "rb")
+    if entrada.read(len(MAGICO_COLUMNAR)) != MAGICO_COLUMNAR:
+        entrada.close()
+        raise ValueError(f"{ruta} no es un archivo ECOL1")
+    largo = struct.unpack("<I", entrada.read(4))[0]
+    columnas = json.loads(entrada.read(largo))["columnas"]
+
+    def filas():
+        with entrada:
+            while True:
+                cantidad = struct.unpack("<I", entrada.read(4))[0]
+                if cantidad == 0:
+                    return
+                valores = []
+                for _ in columnas:
+                    tipo, largo_datos = struct.unpack("<BI", entrada.read(5))
+                    valores.append(_decodificar_columna(tipo, entrada.read(largo_datos), cantidad))
+                yield from zip(*valores)
+
+    return columnas, filas()
+
+# ============================
+#   EXPORTACIÓN
+# ============================
+def exportar(tabla, ruta, formato="csv", rango=None, comprimir=False, lote=LOTE, al_progresar=None):
+    """Exporta la tabla (o el rango ISO [inicio, fin) de su fecha) a ruta. Devuelve un resumen (dict)"""
+    if tabla not in TABLAS_EXPORTABLES:
+        raise ValueError(f"Tabla no exportable: {tabla}")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}")
+    if comprimir and not ruta.endswith(".gz"):
+        ruta += ".gz"
+    columnas = TABLAS[tabla]["columnas"]
+    orden = TABLAS[tabla]["fecha"] if rango else "id"
+
+    inicio = time.perf_counter()
+    filas_cursor = cursor(tabla, columnas, orden, rango=rango)
+    salida = gzip.open(ruta, "wb", compresslevel=6) if comprimir else open(ruta, "wb")
+    if formato == "csv":
+        escritor = _EscritorCSV(salida, columnas)
+    elif formato == "jsonl":
+        escritor = _EscritorJSONL(salida, columnas)
+    else:
+        escritor = _EscritorColumnar(salida, columnas, tabla)
+
+    total = 0
+    try:
+        while True:
+            filas = filas_cursor.fetchmany(lote)
+            if not filas:
+                break
+            escritor.escribir(filas)
+            total += len(filas)
+            if al_progresar:
+                al_progresar(total)
+    finally:
+        filas_cursor.close()
+        escritor.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    return {"tabla": tabla, "archivo": ruta, "formato": formato, "filas": total,
+            "segundos": round(segundos, 3), "filas_por_segundo": round(total / segundos) if segundos else 0}
+
+# ============================
+#   LÍNEA DE COMANDOS
+# ============================
+def _rango_argumentos(args):
+    if args.mes:
+        año, mes = (int(parte) for parte in args.mes.split("-"))
+        return rango_mes(año, mes)
+    if args.desde or args.hasta:
+        desde = args.desde or "0000-01-01"
+        # --hasta es inclusivo: el rango termina al empezar el día siguiente.
+        # Después del último día que admite date el fin es FIN_SIN_LIMITE
+        hasta = date.fromisoformat(args.hasta) if args.hasta else date.max
+        fin = (hasta + timedelta(days=1)).isoformat() if hasta < date.max else FIN_SIN_LIMITE
+        return desde, fin
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta pacientes, citas o asistencia")
+    parser.add_argument("tabla", choices=TABLAS_EXPORTABLES)
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--mes", help="mes a exportar, YYYY-MM")
+    parser.add_argument("--desde", help="primer día incluido, YYYY-MM-DD")
+    parser.add_argument("--hasta", help="último día incluido, YYYY-MM-DD")
+    parser.add_argument("--gzip", action="store_true", help="comprimir la salida")
+    parser.add_argument("--lote", type=int, default=LOTE, help="filas leídas y escritas por vez")
+    parser.add_argument("-o", "--salida", help="archivo de salida")
+    parser.add_argument("--bd", default=None, help="archivo de base de datos (por defecto pacientes.db)")
+    args = parser.parse_args()
+
+    if args.bd:
+        configurar_bd(args.bd)
+    conectar_bd()
+    rango = _rango_argumentos(args)
+    sufijo = args.mes or (f"{args.desde or 'inicio'}_{args.hasta or 'fin'}" if rango else "completo")
+    ruta = args.salida or f"{args.tabla}_{sufijo}.{args.formato}"
+    resumen = exportar(args.tabla, ruta, args.formato, rango, args.gzip, args.lote)
+    print(f"{resumen['archivo']}: {resumen['filas']} filas de {resumen['tabla']} en "
+          f"{resumen['segundos']} s ({resumen['filas_por_segundo']} filas/s)")
+
+if __name__ == "__main__":
+    main()
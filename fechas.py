@@ -0,0 +1,77 @@
+# ============================
+#   FORMATO DE FECHAS
+# ============================
+# En la base de datos las fechas se guardan en ISO-8601 (YYYY-MM-DD
+# [HH:MM[:SS]]) para que se ordenen bien y los rangos usen índices.
+# En pantalla se siguen mostrando como DD/MM/YYYY.
+from datetime import date, datetime, timedelta
+
+FORMATOS_ENTRADA = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y",
+                    "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d")
+
+def _parsear(texto):
+    texto = (texto or "").strip()
+    for formato in FORMATOS_ENTRADA:
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+# ============================
+#   CONVERSIÓN A ISO (PARA GUARDAR)
+# ============================
+def a_iso_fecha(texto):
+    """'15/01/2024' -> '2024-01-15'. Devuelve '' si no se puede interpretar"""
+    fecha = _parsear(texto)
+    return fecha.strftime("%Y-%m-%d") if fecha else ""
+
+def a_iso_fecha_hora(texto, hora=None):
+    """'15/01/2024 14:30:05' -> '2024-01-15 14:30:05'. Devuelve '' si no se puede interpretar"""
+    if hora:
+        texto = f"{texto} {hora}"
+    fecha = _parsear(texto)
+    return fecha.strftime("%Y-%m-%d %H:%M:%S") if fecha else ""
+
+# ============================
+#   FORMATO PARA MOSTRAR
+# ============================
+def formatear_fecha(iso):
+    """'2024-01-15[ ...]' -> '15/01/2024'"""
+    if not iso or len(iso) < 10:
+        return iso or ""
+    return f"{iso[8:10]}/{iso[5:7]}/{iso[0:4]}"
+
+def formatear_fecha_hora(iso):
+    """'2024-01-15 14:30:05' -> '15/01/2024 14:30:05'"""
+    if not iso or len(iso) < 10:
+        return iso or ""
+    return formatear_fecha(iso) + iso[10:]
+
+def formatear_fila(fila, columnas_fecha=(), columnas_fecha_hora=()):
+    """Devuelve una copia de la fila con las columnas ISO indicadas en formato DD/MM/YYYY"""
+    fila = list(fila)
+    for i in columnas_fecha:
+        fila[i] = formatear_fecha(fila[i])
+    for i in columnas_fecha_hora:
+        fila[i] = formatear_fecha_hora(fila[i])
+    return fila
+
+# ============================
+#   RANGOS DE CONSULTA
+# ============================
+def rango_dia(dia):
+    """Límites ISO [inicio, fin) de un día"""
+    return dia.isoformat(), (dia + timedelta(days=1)).isoformat()
+
+def rango_semana(dia=None):
+    """Límites ISO [lunes, lunes siguiente) de la semana que contiene el día"""
+    dia = dia or date.today()
+    lunes = dia - timedelta(days=dia.weekday())
+    return lunes.isoformat(), (lunes + timedelta(days=7)).isoformat()
+
+def rango_mes(año, mes):
+    """Límites ISO [día 1, día 1 del mes siguiente) de un mes"""
+    inicio = date(año, mes, 1)
+    fin = date(año + 1, 1, 1) if mes == 12 else date(año, mes + 1, 1)
+    return inicio.isoformat(), fin.isoformat()
@@ -0,0 +1,258 @@
+# ============================
+#   GENERADOR DE DATOS SINTÉTICOS DE LA CLÍNICA
+# ============================
+# Llena una base nueva con pacientes, citas, personal y asistencia
+# parecidos a los reales, siempre iguales para la misma semilla y escala:
+#   - pacientes: atenciones día por día (más los lunes, menos los
+#     domingos), muchas personas que vuelven y algunas con el nombre
+#     escrito de otra forma (sin tildes, apellido primero)
+#   - citas: horarios de 30 minutos de varios doctores, sin choques
+#   - personal: cargos de la clínica y, si numpy está instalado, un
+#     encoding facial de 128 valores por persona
+#   - asistencia: un registro por persona y día laborable, con tardanzas,
+#     horas extra y algún día sin salida
+# Las filas se escriben por lotes con importar_datos.insertar_lote (los
+# triggers de FTS y de conteos diarios se aplican de una vez por lote).
+#
+# Uso:
+#   python generar_datos.py clinica_prueba.db --pacientes 1000000 --citas 200000 --años 5
+import argparse
+import os
+import pickle
+import random
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+
+from agenda_citas import DIAS_ATENCION, HORARIO_ATENCION
+from base_datos import configurar_bd, conectar_bd, obtener_gestor
+from importar_datos import LOTE, insertar_lote
+from migraciones import DOCTORES_MIGRACION_1
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HASTA = date(2025, 6, 30)       # último día generado (fijo: los datos no dependen de hoy)
+
+NOMBRES = ("José", "Juan", "Luis", "Carlos", "Jorge", "Miguel", "Víctor", "César", "Raúl", "Andrés",
+           "María", "Rosa", "Ana", "Carmen", "Elena", "Lucía", "Sofía", "Gabriela", "Beatriz", "Inés")
+APELLIDOS = ("Quispe", "Mamani", "Flores", "Rodríguez", "Sánchez", "García", "Rojas", "Gonzales",
+             "Huamán", "Vásquez", "Chávez", "Ramos", "Ramírez", "Torres", "Mendoza", "Castillo",
+             "Guzmán", "Pérez", "Gómez", "Díaz", "Vargas", "Condori", "Cruz", "Ríos", "Espinoza",
+             "Gutiérrez", "Salazar", "Cáceres", "Valverde", "Zúñiga", "Huanca", "Ticona", "Apaza")
+ACCIDENTES = tuple(DOCTORES_MIGRACION_1)
+MOTIVOS_CITA = ACCIDENTES + ("Control",)
+PESO_DIA = (1.3, 1.1, 1.0, 1.0, 1.1, 0.8, 0.5)      # atenciones relativas de lunes a domingo
+VARIANTES = 0.03                # atenciones con el nombre escrito de otra forma
+# Cargo: (proporción del personal, entrada, salida en minutos). Son los
+# turnos de reporte_asistencia.TURNOS, que no se importa porque necesita numpy
+CARGOS = {
+    "Doctor": (0.3, 8 * 60, 16 * 60),
+    "Enfermería": (0.35, 7 * 60, 15 * 60),
+    "Recepción": (0.2, 8 * 60, 17 * 60),
+    "Limpieza": (0.15, 6 * 60, 14 * 60),
+}
+
+def _sin_tildes(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+
+def _persona(azar):
+    nombre = azar.choice(NOMBRES)
+    if azar.random() < 0.3:
+        nombre += " " + azar.choice(NOMBRES)
+    return f"{nombre} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}"
+
+def _escrito(nombre, azar):
+    """El nombre tal como lo escribió recepción (casi siempre igual)"""
+    if azar.random() >= VARIANTES:
+        return nombre
+    palabras = nombre.split()
+    forma = azar.randrange(3)
+    if forma == 0:
+        return _sin_tildes(nombre)
+    if forma == 1:
+        return " ".join(palabras[-2:] + palabras[:-2])
+    return " ".join(palabras[:1] + palabras[-2:-1])    # sin segundo nombre ni segundo apellido
+
+def _dias(desde, hasta):
+    dia = desde
+    while dia <= hasta:
+        yield dia
+        dia += timedelta(days=1)
+
+def _hora(minutos, segundos=0):
+    return f"{minutos // 60:02d}:{minutos % 60:02d}:{segundos:02d}"
+
+# ============================
+#   FILAS POR TABLA
+# ============================
+def filas_pacientes(cantidad, desde, hasta, azar):
+    """Filas de importar_datos.TABLAS["pacientes"] en orden cronológico"""
+    dias = list(_dias(desde, hasta))
+    pesos = [PESO_DIA[dia.weekday()] for dia in dias]
+    por_dia = [0] * len(dias)
+    for indice in azar.choices(range(len(dias)), pesos, k=cantidad):
+        por_dia[indice] += 1
+    # Un 40 % de personas distintas; las primeras vuelven mucho más
+    personas = [(_persona(azar), azar.randint(0, 90)) for _ in range(max(1, int(cantidad * 0.4)))]
+    for dia, atenciones in zip(dias, por_dia):
+        for segundo in sorted(azar.randrange(7 * 3600, 22 * 3600) for _ in range(atenciones)):
+            nombre, edad = personas[int(len(personas) * azar.random() ** 2)]
+            edad = min(130, edad + (dia - desde).days // 365)
+            accidente = azar.choice(ACCIDENTES)
+            hora = _hora(segundo // 60, segundo % 60)
+            yield (_escrito(nombre, azar), edad, accidente, DOCTORES_MIGRACION_1[accidente],
+                   f"{dia:%d/%m/%Y} {hora}", f"{dia:%Y-%m-%d} {hora}")
+
+def doctores(cantidad):
+    """Los doctores de la clínica más otros hasta completar cantidad"""
+    lista = list(DOCTORES_MIGRACION_1.values())
+    return (lista + [f"Dr. Médico {numero:02d}" for numero in range(cantidad - len(lista))])[:cantidad]
+
+def filas_citas(cantidad, desde, hasta, medicos, azar):
+    """Filas de importar_datos.TABLAS["citas"]: horarios de 30 minutos sin choques"""
+    abre, cierra = HORARIO_ATENCION
+    dias = [dia for dia in _dias(desde, hasta) if dia.weekday() in DIAS_ATENCION]
+    horarios = len(dias) * len(medicos) * ((cierra - abre) // 30)
+    probabilidad = min(1.0, cantidad / horarios) if horarios else 0.0
+    creacion = f"{desde:%d/%m/%Y} 08:00:00"
+    generadas = 0
+    for dia in dias:
+        for minuto in range(abre, cierra, 30):
+            for medico in medicos:
+                if generadas >= cantidad:
+                    return
+                if azar.random() >= probabilidad:
+                    continue
+                generadas += 1
+                hora = _hora(minuto)[:5]
+                yield (_escrito(_persona(azar), azar), f"9{azar.randrange(10 ** 8):08d}",
+                       azar.choice(MOTIVOS_CITA), medico, f"{dia:%d/%m/%Y}", hora, "Programada",
+                       creacion, f"{dia:%Y-%m-%d} {hora}:00")
+
+def filas_personal(cantidad, desde, azar, semilla):
+    """(nombre, cargo, codigo, foto_encoding, fecha_registro) del personal"""
+    cargos = azar.choices(list(CARGOS), [proporcion for proporcion, _, _ in CARGOS.values()], k=cantidad)
+    rostros = np.random.default_rng(semilla) if np is not None else None
+    filas, nombres = [], set()
+    for numero, cargo in enumerate(cargos, 1):
+        nombre = _persona(azar)
+        while nombre in nombres:            # la asistencia se identifica por el nombre
+            nombre = _persona(azar)
+        nombres.add(nombre)
+        encoding = pickle.dumps(rostros.normal(0, 0.1, 128)) if rostros is not None else None
+        filas.append((nombre, cargo, f"EMP{numero:04d}", encoding, f"{desde:%d/%m/%Y} 08:00:00"))
+    return filas
+
+def filas_asistencia(personal, desde, hasta, azar):
+    """Un registro por persona y día laborable (lunes a sábado), con faltas y tardanzas"""
+    for dia in _dias(desde, hasta):
+        if dia.weekday() == 6:
+            continue
+        for nombre, cargo, *_ in personal:
+            if azar.random() < 0.06:               # falta o día libre
+                continue
+            _, entrada, salida = CARGOS[cargo]
+            tarde = azar.randint(10, 45) if azar.random() < 0.1 else azar.randint(-15, 8)
+            llegada = entrada + tarde
+            hora_salida = None
+            if azar.random() >= 0.02:              # algunos días no marcan la salida
+                hora_salida = _hora(salida + azar.choice((0, 0, 0, 15, 30, 60, 90)), azar.randrange(60))
+            yield (nombre, cargo, f"{dia:%d/%m/%Y}", _hora(llegada, azar.randrange(60)), hora_salida,
+                   "Presente", "", f"{dia:%Y-%m-%d}")
+
+# ============================
+#   ESCRITURA
+# ============================
+SQL_PERSONAL = """
+    INSERT INTO personal (nombre, cargo, codigo, foto_encoding, fecha_registro) VALUES (?, ?, ?, ?, ?)
+"""
+SQL_ASISTENCIA = """
+    INSERT INTO asistencia (nombre_personal, cargo, fecha, hora_entrada, hora_salida, estado,
+                            observaciones, fecha_iso)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def _por_lotes(filas, lote):
+    actual = []
+    for fila in filas:
+        actual.append(fila)
+        if len(actual) >= lote:
+            yield actual
+            actual = []
+    if actual:
+        yield actual
+
+def _escribir(filas, lote, tabla=None, sql=None):
+    """Escribe las filas por lotes (una transacción cada uno); devuelve cuántas"""
+    total = 0
+    for filas_lote in _por_lotes(filas, lote):
+        with obtener_gestor().escritura() as conexion:
+            if tabla:
+                insertar_lote(conexion, tabla, filas_lote)
+            else:
+                conexion.executemany(sql, filas_lote)
+        total += len(filas_lote)
+    return total
+
+def generar(ruta, pacientes=100000, citas=20000, personal=40, años=2, medicos=12, semilla=2024,
+            hasta=HASTA, lote=LOTE, al_progresar=None):
+    """Crea ruta (no debe existir) con datos sintéticos. Devuelve un resumen (dict)"""
+    if os.path.exists(ruta):
+        raise FileExistsError(f"{ruta} ya existe")
+    desde = hasta - timedelta(days=365 * años - 1)
+    configurar_bd(ruta)
+    conectar_bd()
+    resumen = {"archivo": ruta, "semilla": semilla, "desde": desde.isoformat(), "hasta": hasta.isoformat()}
+    inicio = time.perf_counter()
+
+    # Un generador por tabla: cambiar la escala de una no cambia las demás
+    lista_personal = filas_personal(personal, desde, random.Random(f"{semilla}-personal"), semilla)
+    pasos = (
+        ("pacientes", lambda: _escribir(filas_pacientes(pacientes, desde, hasta, random.Random(f"{semilla}-pacientes")),
+                                        lote, tabla="pacientes")),
+        ("citas", lambda: _escribir(filas_citas(citas, desde, hasta, doctores(medicos),
+                                                random.Random(f"{semilla}-citas")), lote, tabla="citas")),
+        ("personal", lambda: _escribir(lista_personal, lote, sql=SQL_PERSONAL)),
+        ("asistencia", lambda: _escribir(filas_asistencia(lista_personal, desde, hasta,
+                                                          random.Random(f"{semilla}-asistencia")),
+                                         lote, sql=SQL_ASISTENCIA)),
+    )
+    for tabla, paso in pasos:
+        resumen[tabla] = paso()
+        if al_progresar:
+            al_progresar(tabla, resumen[tabla])
+    with obtener_gestor().escritura() as conexion:
+        conexion.execute("ANALYZE")
+    resumen["encodings"] = np is not None
+    resumen["segundos"] = round(time.perf_counter() - inicio, 2)
+    return resumen
+
+def main():
+    parser = argparse.ArgumentParser(description="Base de datos sintética de la clínica (determinista)")
+    parser.add_argument("ruta", help="archivo de base de datos a crear")
+    parser.add_argument("--pacientes", type=int, default=100000)
+    parser.add_argument("--citas", type=int, default=20000)
+    parser.add_argument("--personal", type=int, default=40)
+    parser.add_argument("--medicos", type=int, default=12, help="doctores con citas")
+    parser.add_argument("--años", type=int, default=2)
+    parser.add_argument("--hasta", default=HASTA.isoformat(), help="último día (YYYY-MM-DD)")
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--reemplazar", action="store_true", help="borrar ruta si ya existe")
+    args = parser.parse_args()
+
+    if os.path.exists(args.ruta):
+        if not args.reemplazar:
+            parser.error(f"{args.ruta} ya existe (use --reemplazar)")
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(args.ruta + sufijo):
+                os.remove(args.ruta + sufijo)
+    resumen = generar(args.ruta, args.pacientes, args.citas, args.personal, args.años, args.medicos,
+                      args.semilla, datetime.strptime(args.hasta, "%Y-%m-%d").date(),
+                      al_progresar=lambda tabla, filas: print(f"{tabla}: {filas} filas"))
+    print(resumen)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+# ============================
+#   IMPORTACIÓN MASIVA DE PACIENTES Y CITAS
+# ============================
+# Carga archivos CSV o JSONL (también .gz) en pacientes.db sin pasar por
+# guardar_paciente_bd() fila a fila:
+#   - el archivo se lee en streaming y se procesa por lotes
+#   - cada registro se valida y normaliza (fechas a ISO, edad, espacios)
+#   - cada lote entra con un solo executemany dentro de una transacción
+#   - el punto de control (registros ya procesados) se guarda en la tabla
+#     importaciones dentro de esa misma transacción, así que si el proceso
+#     se corta se puede reanudar sin duplicar ni perder filas
+# Los registros inválidos se escriben en <archivo>.rechazados.jsonl.
+#
+# Uso:
+#   python importar_datos.py visitas.csv
+#   python importar_datos.py citas.jsonl.gz --tabla citas --lote 100000
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache, partial
+from itertools import chain
+
+from base_datos import conectar_bd, configurar_bd, obtener_gestor
+from migraciones import CONTEOS_DIARIOS, DOCTORES_MIGRACION_1
+
+LOTE = 50000
+
+# ============================
+#   NORMALIZACIÓN DE REGISTROS
+# ============================
+# Nombres alternativos aceptados en la cabecera o en las claves JSON
+ALIAS = {
+    "pacientes": {"doctor": "doctor_asignado", "fecha": "fecha_atencion"},
+    "citas": {"nombre": "nombre_paciente", "paciente": "nombre_paciente", "fecha": "fecha_cita",
+              "hora": "hora_cita"},
+}
+
+_DIA_DMY = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})$")
+_DIA_ISO = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})$")
+_HORA = re.compile(r"(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+
+# Un archivo histórico repite muchas veces los mismos días y horas, así
+# que cada parte se valida una sola vez y después sale de la caché.
+@lru_cache(maxsize=None)
+def _dia_iso(texto):
+    """'15/01/2024' o '2024-01-15' -> '2024-01-15' (ValueError si no es una fecha válida)"""
+    partes = _DIA_DMY.match(texto)
+    if partes:
+        dia, mes, año = partes.groups()
+    else:
+        partes = _DIA_ISO.match(texto)
+        if not partes:
+            raise ValueError(f"fecha no reconocida: {texto!r}")
+        año, mes, dia = partes.groups()
+    return date(int(año), int(mes), int(dia)).isoformat()  # valida días por mes y bisiestos
+
+@lru_cache(maxsize=None)
+def _hora_iso(texto):
+    """'9:05' o '09:05:30' -> '09:05:00' / '09:05:30' (ValueError si no es una hora válida)"""
+    partes = _HORA.match(texto)
+    if not partes:
+        raise ValueError(f"hora no reconocida: {texto!r}")
+    hora, minuto, segundo = int(partes.group(1)), int(partes.group(2)), int(partes.group(3) or 0)
+    if hora > 23 or minuto > 59 or segundo > 59:
+        raise ValueError(f"hora no válida: {texto!r}")
+    return f"{hora:02d}:{minuto:02d}:{segundo:02d}"
+
+def _fecha_hora_iso(texto, hora=None):
+    """Fecha (con hora opcional, o la hora aparte) -> 'YYYY-MM-DD HH:MM:SS'"""
+    texto = (texto or "").strip()
+    separador = texto.find(" ")
+    if separador < 0:
+        separador = texto.find("T")
+    if separador >= 0:
+        texto, hora_texto = texto[:separador], texto[separador + 1:].strip()
+        hora = hora or hora_texto
+    return f"{_dia_iso(texto)} {_hora_iso(hora.strip()) if hora else '00:00:00'}"
+
+def _texto(registro, campo, obligatorio=True):
+    valor = str(registro.get(campo) or "").strip()
+    if "  " in valor:
+        valor = " ".join(valor.split())
+    if obligatorio and not valor:
+        raise ValueError(f"falta {campo}")
+    return valor
+
+def normalizar_paciente(registro):
+    """Registro de entrada -> valores de INSERT de pacientes"""
+    nombre = _texto(registro, "nombre")
+    accidente = _texto(registro, "accidente").capitalize()
+    doctor = (_texto(registro, "doctor_asignado", obligatorio=False)
+              or DOCTORES_MIGRACION_1.get(accidente, "Doctor no asignado"))
+    edad = registro.get("edad")
+    if edad in (None, ""):
+        edad = None
+    else:
+        # El rango se comprueba antes de int(): "1e400" es inf y "nan" no es comparable
+        valor = float(edad)
+        if not 0 <= valor <= 130:
+            raise ValueError(f"edad fuera de rango: {edad}")
+        edad = int(valor)
+    iso = _fecha_hora_iso(registro.get("fecha_atencion"))
+    # fecha_atencion conserva el formato DD/MM/YYYY HH:MM:SS de la interfaz
+    fecha = f"{iso[8:10]}/{iso[5:7]}/{iso[0:4]}{iso[10:]}"
+    return (nombre, edad, accidente, doctor, fecha, iso)
+
+def normalizar_cita(registro, creacion=None):
+    """Registro de entrada -> valores de INSERT de citas
+
+    creacion: fecha_creacion de las citas que no la traen (por defecto, ahora).
+    """
+    nombre = _texto(registro, "nombre_paciente")
+    telefono = _texto(registro, "telefono", obligatorio=False)
+    motivo = _texto(registro, "motivo")
+    doctor = _texto(registro, "doctor")
+    iso = _fecha_hora_iso(registro.get("fecha_cita"), registro.get("hora_cita"))
+    estado = _texto(registro, "estado", obligatorio=False) or "Programada"
+    creacion = (_texto(registro, "fecha_creacion", obligatorio=False) or creacion
+                or datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+    # fecha_cita y hora_cita conservan los formatos DD/MM/YYYY y HH:MM de la interfaz
+    return (nombre, telefono, motivo, doctor, f"{iso[8:10]}/{iso[5:7]}/{iso[0:4]}", iso[11:16],
+            estado, creacion, iso)
+
+# Para cada tabla: normalizador, INSERT y triggers de inserción que se
+# suspenden durante el lote (sus efectos se recalculan de una vez después)
+TABLAS = {
+    "pacientes": {
+        "normalizar": normalizar_paciente,
+        "insert": "INSERT INTO pacientes (nombre, edad, accidente, doctor_asignado, fecha_atencion, "
+                  "fecha_atencion_iso) VALUES (?, ?, ?, ?, ?, ?)",
+        "triggers": ("pacientes_fts_insert", "pacientes_conteo_insert"),
+    },
+    "citas": {
+        "normalizar": normalizar_cita,
+        "insert": "INSERT INTO citas (nombre_paciente, telefono, motivo, doctor, fecha_cita, hora_cita, "
+                  "estado, fecha_creacion, fecha_hora_iso) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "triggers": ("citas_conteo_insert",),
+    },
+}
+
+def detectar_tabla(campos):
+    """Deduce la tabla destino a partir de los nombres de campo"""
+    campos = set(campos)
+    if campos & {"nombre_paciente", "motivo", "hora_cita", "hora"}:
+        return "citas"
+    return "pacientes"
+
+# ============================
+#   LECTURA EN STREAMING
+# ============================
+# Línea de un JSONL que no se pudo decodificar: va a los rechazos como
+# cualquier registro inválido en lugar de cortar la importación
+LineaInvalida = namedtuple("LineaInvalida", "texto motivo")
+
+class _Lector:
+    """Recorre un CSV o JSONL (opcionalmente .gz) devolviendo dicts y cuántos bytes lleva leídos"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.total_bytes = os.path.getsize(ruta)
+        self._crudo = open(ruta, "rb")
+        nombre = ruta.lower()
+        if nombre.endswith(".gz"):
+            nombre = nombre[:-3]
+            binario = gzip.GzipFile(fileobj=self._crudo)
+        else:
+            binario = self._crudo
+        self.es_csv = nombre.endswith(".csv")
+        self._texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+        self.campos = None
+        if self.es_csv:
+            self._filas = csv.reader(self._texto)
+            self.campos = [campo.strip().lower() for campo in next(self._filas, [])]
+
+    def bytes_leidos(self):
+        return self._crudo.tell()
+
+    def __iter__(self):
+        if self.es_csv:
+            campos = self.campos
+            for fila in self._filas:
+                if fila:
+                    yield dict(zip(campos, fila))
+        else:
+            for linea in self._texto:
+                if linea.strip():
+                    try:
+                        yield json.loads(linea)
+                    except ValueError as e:
+                        yield LineaInvalida(linea.rstrip("\r\n"), f"JSON inválido: {e}")
+
+    def cerrar(self):
+        self._texto.close()
+
+def _renombrar(registro, alias):
+    for origen, destino in alias.items():
+        if origen in registro and destino not in registro:
+            registro[destino] = registro.pop(origen)
+    return registro
+
+# ============================
+#   ESCRITURA POR LOTES
+# ============================
+def _recalcular_derivados(conexion, tabla, primer_id):
+    """Aplica de una vez lo que habrían hecho los triggers suspendidos para ids >= primer_id"""
+    if tabla == "pacientes":
+        conexion.execute("""
+            INSERT INTO pacientes_fts (rowid, nombre, accidente, doctor_asignado)
+            SELECT id, nombre, accidente, doctor_asignado FROM pacientes WHERE id >= ?
+        """, (primer_id,))
+    columna = dict(CONTEOS_DIARIOS)[tabla]
+    conexion.execute(f"""
+        INSERT INTO daily_counts (tipo, dia, cantidad)
+        SELECT '{tabla}', substr({columna}, 1, 10), COUNT(*) FROM {tabla}
+        WHERE id >= ? AND {columna} <> '' GROUP BY 2
+        ON CONFLICT (tipo, dia) DO UPDATE SET cantidad = cantidad + excluded.cantidad
+    """, (primer_id,))
+
+def insertar_lote(conexion, tabla, filas):
+    """INSERT de filas ya normalizadas en una transacción abierta, con los triggers suspendidos.
+
+    El DROP/CREATE TRIGGER va en la misma transacción, así que también se
+    revierte si algo falla.
+    """
+    definicion = TABLAS[tabla]
+    triggers = conexion.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ? "
+        f"AND name IN ({', '.join('?' * len(definicion['triggers']))})",
+        (tabla, *definicion["triggers"])).fetchall()
+    primer_id = conexion.execute(f"SELECT IFNULL(MAX(id), 0) + 1 FROM {tabla}").fetchone()[0]
+    for nombre, _ in triggers:
+        conexion.execute(f"DROP TRIGGER {nombre}")
+    conexion.executemany(definicion["insert"], filas)
+    _recalcular_derivados(conexion, tabla, primer_id)
+    for _, sql in triggers:
+        conexion.execute(sql)
+
+def _escribir_lote(tabla, filas, clave, registros, insertadas, rechazadas, terminada=False):
+    with obtener_gestor().escritura() as conexion:
+        insertar_lote(conexion, tabla, filas)
+        conexion.execute("""
+            INSERT INTO importaciones (clave, tabla, registros, filas, rechazadas, terminada, actualizada)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (clave) DO UPDATE SET registros = excluded.registros, filas = excluded.filas,
+                rechazadas = excluded.rechazadas, terminada = excluded.terminada,
+                actualizada = excluded.actualizada
+        """, (clave, tabla, registros, insertadas, rechazadas, int(terminada),
+              datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+def _punto_de_control(clave):
+    fila = obtener_gestor().lectura().execute(
+        "SELECT registros, filas, rechazadas, terminada FROM importaciones WHERE clave = ?", (clave,)).fetchone()
+    return fila or (0, 0, 0, 0)
+
+# ============================
+#   IMPORTACIÓN
+# ============================
+def importar_archivo(ruta, tabla=None, lote=LOTE, al_progresar=None, reanudar=True):
+    """Importa un archivo CSV/JSONL en pacientes o citas. Devuelve un resumen (dict)
+
+    tabla: "pacientes", "citas" o None para deducirla de los campos.
+    al_progresar(fraccion, filas, rechazadas): se llama después de cada lote.
+    reanudar: si el archivo ya se importó en parte, continúa donde quedó;
+    con False se vuelve a importar desde el principio.
+    """
+    lector = _Lector(ruta)
+    registros_iter = iter(lector)
+    if tabla is None:
+        if lector.campos is None:
+            # La tabla sale del primer registro que se pudo decodificar
+            primeros = []
+            for registro in registros_iter:
+                primeros.append(registro)
+                if isinstance(registro, dict):
+                    break
+            tabla = detectar_tabla(primeros[-1] if primeros and isinstance(primeros[-1], dict) else {})
+            registros_iter = chain(primeros, registros_iter)
+        else:
+            tabla = detectar_tabla(lector.campos)
+    if tabla not in TABLAS:
+        raise ValueError(f"Tabla no permitida: {tabla}")
+    normalizar = TABLAS[tabla]["normalizar"]
+    if tabla == "citas":
+        # Todas las citas del archivo sin fecha_creacion llevan la hora de esta importación
+        normalizar = partial(normalizar, creacion=datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+    alias = ALIAS[tabla]
+
+    clave = f"{os.path.abspath(ruta)}|{lector.total_bytes}|{tabla}"
+    ya_procesados, insertadas, rechazadas, terminada = _punto_de_control(clave) if reanudar else (0, 0, 0, 0)
+    resumen = {"archivo": ruta, "tabla": tabla, "filas": insertadas, "rechazadas": rechazadas,
+               "reanudado_en": ya_procesados, "segundos": 0.0, "filas_por_segundo": 0.0}
+    if terminada:
+        lector.cerrar()
+        resumen["ya_importado"] = True
+        return resumen
+
+    ruta_rechazos = ruta + ".rechazados.jsonl"
+    rechazos = open(ruta_rechazos, "a" if ya_procesados else "w", encoding="utf-8")
+    inicio = time.perf_counter()
+    filas_nuevas = 0
+    registros = 0
+    filas = []
+    # Mientras un hilo escribe un lote (SQLite suelta el GIL), aquí se
+    # normaliza el siguiente. Nunca hay más de un lote en vuelo, así que
+    # los puntos de control se confirman en orden.
+    escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="importador")
+    en_vuelo = None
+    try:
+        for registro in registros_iter:
+            registros += 1
+            if registros <= ya_procesados:
+                continue
+            try:
+                if isinstance(registro, LineaInvalida):
+                    raise ValueError(registro.motivo)
+                filas.append(normalizar(_renombrar(registro, alias)))
+            except (ValueError, TypeError, AttributeError) as e:
+                rechazadas += 1
+                datos = registro.texto if isinstance(registro, LineaInvalida) else registro
+                rechazos.write(json.dumps({"registro": registros, "motivo": str(e), "datos": datos},
+                                          ensure_ascii=False) + "\n")
+            if len(filas) >= lote:
+                insertadas += len(filas)
+                filas_nuevas += len(filas)
+                if en_vuelo:
+                    en_vuelo.result()
+                rechazos.flush()
+                en_vuelo = escritor.submit(_escribir_lote, tabla, filas, clave, registros, insertadas, rechazadas)
+                filas = []
+                if al_progresar:
+                    al_progresar(lector.bytes_leidos() / (lector.total_bytes or 1), insertadas, rechazadas)
+        insertadas += len(filas)
+        filas_nuevas += len(filas)
+        if en_vuelo:
+            en_vuelo.result()
+        _escribir_lote(tabla, filas, clave, registros, insertadas, rechazadas, terminada=True)
+        if al_progresar:
+            al_progresar(1.0, insertadas, rechazadas)
+    finally:
+        escritor.shutdown(wait=True)
+        rechazos.close()
+        lector.cerrar()
+
+    segundos = time.perf_counter() - inicio
+    if not rechazadas:
+        os.remove(ruta_rechazos)
+    resumen.update(filas=insertadas, rechazadas=rechazadas, segundos=round(segundos, 3),
+                   filas_por_segundo=round(filas_nuevas / segundos) if segundos else 0.0)
+    return resumen
+
+# ============================
+#   LÍNEA DE COMANDOS
+# ============================
+def _barra(fraccion, filas, rechazadas, ancho=30):
+    llenos = int(fraccion * ancho)
+    sys.stderr.write(f"\r[{'#' * llenos}{'.' * (ancho - llenos)}] {fraccion:6.1%}  "
+                     f"{filas} filas  {rechazadas} rechazadas")
+    sys.stderr.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa pacientes o citas desde CSV/JSONL")
+    parser.add_argument("archivos", nargs="+", help="archivos .csv, .jsonl (o .gz)")
+    parser.add_argument("--tabla", choices=sorted(TABLAS), help="tabla destino (por defecto se deduce)")
+    parser.add_argument("--lote", type=int, default=LOTE, help="filas por transacción")
+    parser.add_argument("--bd", default=None, help="archivo de base de datos (por defecto pacientes.db)")
+    parser.add_argument("--desde-cero", action="store_true",
+                        help="ignorar el punto de control y volver a importar todo el archivo")
+    args = parser.parse_args()
+
+    if args.bd:
+        configurar_bd(args.bd)
+    conectar_bd()
+    for ruta in args.archivos:
+        resumen = importar_archivo(ruta, args.tabla, args.lote, al_progresar=_barra,
+                                   reanudar=not args.desde_cero)
+        sys.stderr.write("\n")
+        if resumen.get("ya_importado"):
+            print(f"{ruta}: ya importado anteriormente ({resumen['filas']} filas)")
+            continue
+        print(f"{ruta}: {resumen['filas']} filas en {resumen['tabla']}, "
+              f"{resumen['rechazadas']} rechazadas, {resumen['segundos']} s "
+              f"({resumen['filas_por_segundo']} filas/s)")
+        if resumen["reanudado_en"]:
+            print(f"   (reanudado después del registro {resumen['reanudado_en']})")
+        if resumen["rechazadas"]:
+            print(f"   Rechazos en {ruta}.rechazados.jsonl")
+
+if __name__ == "__main__":
+    main()
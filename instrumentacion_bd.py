@@ -0,0 +1,356 @@
+# ============================
+#   INSTRUMENTACIÓN DE CONSULTAS SQL
+# ============================
+# Mide cada sentencia que pasa por el gestor de base_datos: veces, tiempo
+# total y máximo, histograma en ms y filas devueltas o cambiadas. El
+# tiempo de una consulta incluye el de leer sus filas (fetchone/fetchall
+# o recorrer el cursor), no solo el del execute.
+# Las sentencias que pasan el umbral de lentas se escriben, una línea JSON
+# cada una, en un log rotativo (RUTA_LOG, RUTA_LOG.1, ...).
+# reporte_consultas_bd() ordena las sentencias por tiempo total y corre
+# EXPLAIN QUERY PLAN de las peores, marcando las que recorren una tabla
+# completa (SCAN, aunque sea en el orden de un índice) o necesitan un
+# B-tree temporal para ordenar.
+#
+# Apagada no cuesta nada: base_datos abre conexiones sqlite3 normales.
+# activar() cambia base_datos.FABRICA_CONEXION por ConexionMedida y
+# cierra las conexiones abiertas, así que conviene llamarla al inicio.
+#
+# Uso:
+#   ELVIS_INSTRUMENTAR=50 python "TRABAJO ELVIS.py"     (umbral de lentas en ms)
+#   python servicio_clinica.py --instrumentar 50
+#   python instrumentacion_bd.py [--log consultas_lentas.log] [--top 10]
+#       (reporte a partir del log, con los planes sobre pacientes.db)
+import argparse
+import glob
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from logging.handlers import RotatingFileHandler
+
+import base_datos
+
+UMBRAL_LENTA_MS = 100
+RUTA_LOG = "consultas_lentas.log"
+TAMANO_LOG = 1024 * 1024            # bytes por archivo antes de rotar
+COPIAS_LOG = 3
+TOP_REPORTE = 10
+# Sentencias que no tienen plan de ejecución que mirar
+SIN_PLAN = {"BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT", "RELEASE", "PRAGMA", "ATTACH",
+            "DETACH", "CREATE", "DROP", "ALTER", "VACUUM", "ANALYZE", "REINDEX", "EXPLAIN"}
+
+registro_lentas = logging.getLogger("elvis.consultas_lentas")
+registro_lentas.propagate = False
+_umbral_lenta_s = UMBRAL_LENTA_MS / 1000
+_SIN_PARAMETROS = object()          # executescript no recibe parámetros
+
+def _cubeta(ms):
+    """Límite superior (potencia de 2, en ms) del histograma; 0 para menos de 1 ms"""
+    return (1 << int(ms).bit_length()) if ms >= 1 else 0
+
+def _serializable(parametros):
+    """Parámetros aptos para JSON (los BLOB se guardan como None)"""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {clave: None if isinstance(valor, (bytes, memoryview)) else valor
+                for clave, valor in parametros.items()}
+    return [None if isinstance(valor, (bytes, memoryview)) else valor for valor in parametros]
+
+# ============================
+#   ESTADÍSTICAS POR SENTENCIA
+# ============================
+class EstadisticasConsultas:
+    """Acumula tiempos y filas por texto de sentencia (espacios normalizados)"""
+
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._sentencias = {}
+
+    def anotar(self, sql, segundos, filas, parametros=None):
+        sql = " ".join(sql.split())
+        with self._candado:
+            datos = self._sentencias.get(sql)
+            if datos is None:
+                datos = self._sentencias[sql] = {"veces": 0, "segundos": 0.0, "maximo": 0.0,
+                                                 "filas": 0, "histograma": Counter()}
+            datos["veces"] += 1
+            datos["segundos"] += segundos
+            datos["maximo"] = max(datos["maximo"], segundos)
+            datos["filas"] += filas
+            datos["histograma"][_cubeta(segundos * 1000)] += 1
+            datos["parametros"] = parametros
+
+    def resumen(self):
+        """Sentencias ordenadas por tiempo total, de mayor a menor"""
+        with self._candado:
+            copia = [(sql, dict(datos, histograma=dict(datos["histograma"])))
+                     for sql, datos in self._sentencias.items()]
+        filas = []
+        for sql, datos in copia:
+            filas.append({
+                "sql": sql,
+                "veces": datos["veces"],
+                "total_ms": round(datos["segundos"] * 1000, 2),
+                "promedio_ms": round(datos["segundos"] * 1000 / datos["veces"], 3),
+                "maximo_ms": round(datos["maximo"] * 1000, 2),
+                "filas": datos["filas"],
+                "histograma_ms": {("<1" if limite == 0 else f"<{limite}"): veces
+                                  for limite, veces in sorted(datos["histograma"].items())},
+                "parametros": datos["parametros"],
+            })
+        filas.sort(key=lambda fila: -fila["total_ms"])
+        return filas
+
+    def limpiar(self):
+        with self._candado:
+            self._sentencias.clear()
+
+
+estadisticas = EstadisticasConsultas()
+
+# ============================
+#   CONEXIÓN Y CURSOR MEDIDOS
+# ============================
+class CursorMedido(sqlite3.Cursor):
+    """Cursor que anota su sentencia cuando termina de leer las filas (o al descartarse)"""
+
+    _sql = None
+
+    def _medir(self, metodo, sql, parametros, muestra):
+        # muestra son los parámetros que se guardan para el plan y el log
+        self._terminar()
+        self._sql, self._parametros, self._filas = sql, muestra, 0
+        inicio = time.perf_counter()
+        try:
+            metodo(self, sql, *(() if parametros is _SIN_PARAMETROS else (parametros,)))
+        except BaseException:
+            self._segundos = time.perf_counter() - inicio
+            self._terminar()
+            raise
+        self._segundos = time.perf_counter() - inicio
+        if self.description is None:         # INSERT, UPDATE, DELETE...: ya terminó
+            self._terminar(max(self.rowcount, 0))
+        return self
+
+    def execute(self, sql, parametros=()):
+        return self._medir(sqlite3.Cursor.execute, sql, parametros, parametros)
+
+    def executemany(self, sql, parametros):
+        # Del lote solo se guarda la primera fila (sirve para el plan); nunca
+        # el lote entero, que puede ser un generador o miles de pacientes
+        muestra = parametros[0] if isinstance(parametros, (list, tuple)) and parametros else None
+        self._medir(sqlite3.Cursor.executemany, sql, parametros, muestra)
+        return self
+
+    def executescript(self, script):
+        return self._medir(sqlite3.Cursor.executescript, script, _SIN_PARAMETROS, _SIN_PARAMETROS)
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        self._segundos += time.perf_counter() - inicio
+        if fila is None:
+            self._terminar()
+        else:
+            self._filas += 1
+        return fila
+
+    def fetchmany(self, size=None):
+        tamano = self.arraysize if size is None else size
+        inicio = time.perf_counter()
+        filas = super().fetchmany(tamano)
+        self._segundos += time.perf_counter() - inicio
+        self._filas += len(filas)
+        if len(filas) < tamano:
+            self._terminar()
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        self._segundos += time.perf_counter() - inicio
+        self._terminar(len(filas))
+        return filas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            self._segundos += time.perf_counter() - inicio
+            self._terminar()
+            raise
+        self._segundos += time.perf_counter() - inicio
+        self._filas += 1
+        return fila
+
+    def __del__(self):
+        # Consultas de las que solo se leyó fetchone()[0]
+        try:
+            self._terminar()
+        except Exception:
+            pass
+
+    def _terminar(self, filas=0):
+        if self._sql is None:
+            return
+        sql, parametros, self._sql = self._sql, self._parametros, None
+        filas += self._filas
+        if parametros is _SIN_PARAMETROS or not isinstance(parametros, (list, tuple, dict)):
+            parametros = None
+        else:
+            parametros = _serializable(parametros)
+        estadisticas.anotar(sql, self._segundos, filas, parametros)
+        if self._segundos >= _umbral_lenta_s and registro_lentas.handlers:
+            registro_lentas.warning(json.dumps({
+                "hora": time.strftime("%Y-%m-%d %H:%M:%S"), "ms": round(self._segundos * 1000, 2),
+                "filas": filas, "sql": " ".join(sql.split()), "parametros": parametros,
+            }, ensure_ascii=False, default=str))
+
+
+class ConexionMedida(sqlite3.Connection):
+    """Conexión cuyos execute* pasan por CursorMedido"""
+
+    def cursor(self, factory=CursorMedido):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+# ============================
+#   ACTIVAR / DESACTIVAR
+# ============================
+def activar(umbral_ms=UMBRAL_LENTA_MS, ruta_log=RUTA_LOG):
+    """Mide todas las sentencias desde ahora; las que tardan umbral_ms o más van a ruta_log"""
+    global _umbral_lenta_s
+    _umbral_lenta_s = umbral_ms / 1000
+    if ruta_log and not registro_lentas.handlers:
+        manejador = RotatingFileHandler(ruta_log, maxBytes=TAMANO_LOG, backupCount=COPIAS_LOG,
+                                        encoding="utf-8")
+        manejador.setFormatter(logging.Formatter("%(message)s"))
+        registro_lentas.addHandler(manejador)
+        registro_lentas.setLevel(logging.INFO)
+    if base_datos.FABRICA_CONEXION is not ConexionMedida:
+        base_datos.FABRICA_CONEXION = ConexionMedida
+        base_datos.cerrar_bd()          # las siguientes conexiones se abren ya medidas
+
+def desactivar():
+    """Vuelve a conexiones sqlite3 normales (las estadísticas se conservan)"""
+    if base_datos.FABRICA_CONEXION is not sqlite3.Connection:
+        base_datos.FABRICA_CONEXION = sqlite3.Connection
+        base_datos.cerrar_bd()
+    for manejador in list(registro_lentas.handlers):
+        registro_lentas.removeHandler(manejador)
+        manejador.close()
+
+def activa():
+    return base_datos.FABRICA_CONEXION is ConexionMedida
+
+# ============================
+#   PLANES DE EJECUCIÓN Y REPORTE
+# ============================
+def explicar(conexion, sql, parametros=None):
+    """(líneas de EXPLAIN QUERY PLAN, alertas) de una sentencia; sin medirla"""
+    if parametros is None:
+        parametros = [None] * sql.count("?")
+    cursor = sqlite3.Cursor(conexion)           # cursor normal: no se anota
+    try:
+        filas = sqlite3.Cursor.execute(cursor, "EXPLAIN QUERY PLAN " + sql, parametros).fetchall()
+    except sqlite3.Error as e:
+        return [], [f"sin plan: {e}"]
+    finally:
+        cursor.close()
+    plan, alertas = [], []
+    for fila in filas:
+        detalle = fila[-1]
+        plan.append(detalle)
+        # SCAN visita todas las filas (con o sin índice); SEARCH usa el índice para buscar
+        recorrido = re.match(r"SCAN (?:TABLE )?(\S+)(?: USING (?:COVERING )?INDEX (\S+))?", detalle)
+        if recorrido and "VIRTUAL TABLE" not in detalle:
+            tabla, indice = recorrido.groups()
+            alertas.append(f"recorre la tabla {tabla} completa" + (f" (en el orden de {indice})" if indice else ""))
+        elif detalle.startswith("USE TEMP B-TREE"):
+            alertas.append(f"B-tree temporal ({detalle[len('USE TEMP B-TREE FOR '):].lower()})")
+    return plan, alertas
+
+def reporte_consultas_bd(top=TOP_REPORTE, fuente=None):
+    """Las top sentencias con más tiempo total, con su plan y las alertas de cada una"""
+    fuente = estadisticas if fuente is None else fuente
+    sentencias = fuente.resumen()
+    conexion = base_datos.obtener_gestor().lectura()
+    peores = sentencias[:top]
+    for fila in peores:
+        palabra = fila["sql"].split(None, 1)[0].upper() if fila["sql"] else ""
+        if palabra in SIN_PLAN:
+            fila["plan"], fila["alertas"] = [], []
+        else:
+            fila["plan"], fila["alertas"] = explicar(conexion, fila["sql"], fila["parametros"])
+    return {
+        "activa": activa(),
+        "umbral_lenta_ms": round(_umbral_lenta_s * 1000, 2),
+        "sentencias_distintas": len(sentencias),
+        "ejecuciones": sum(fila["veces"] for fila in sentencias),
+        "total_ms": round(sum(fila["total_ms"] for fila in sentencias), 2),
+        "peores": peores,
+    }
+
+def formatear_reporte(reporte):
+    """Texto del reporte para la consola o un messagebox"""
+    lineas = [f"{reporte['ejecuciones']} ejecuciones de {reporte['sentencias_distintas']} sentencias, "
+              f"{reporte['total_ms']:.0f} ms en total (lentas: >= {reporte['umbral_lenta_ms']:g} ms)"]
+    if not reporte["activa"] and not reporte["peores"]:
+        lineas.append("La instrumentación está apagada (ELVIS_INSTRUMENTAR=ms para activarla)")
+    for numero, fila in enumerate(reporte["peores"], 1):
+        sql = fila["sql"] if len(fila["sql"]) <= 120 else fila["sql"][:117] + "..."
+        lineas.append("")
+        lineas.append(f"{numero}. {sql}")
+        lineas.append(f"   {fila['veces']} {'vez' if fila['veces'] == 1 else 'veces'}, {fila['total_ms']:.1f} ms total, "
+                      f"{fila['promedio_ms']:.2f} ms prom., {fila['maximo_ms']:.1f} ms máx., {fila['filas']} filas")
+        lineas.extend(f"   plan: {detalle}" for detalle in fila["plan"])
+        lineas.extend(f"   ⚠️ {alerta}" for alerta in fila["alertas"])
+    return "\n".join(lineas)
+
+def leer_log(ruta=RUTA_LOG):
+    """EstadisticasConsultas con las sentencias lentas de ruta y sus copias rotadas"""
+    fuente = EstadisticasConsultas()
+    for archivo in sorted(glob.glob(glob.escape(ruta) + "*")):
+        if archivo != ruta and not archivo[len(ruta) + 1:].isdigit():
+            continue
+        with open(archivo, encoding="utf-8") as entrada:
+            for linea in entrada:
+                try:
+                    lenta = json.loads(linea)
+                except ValueError:
+                    continue
+                fuente.anotar(lenta["sql"], lenta["ms"] / 1000, lenta.get("filas", 0), lenta.get("parametros"))
+    return fuente
+
+def main():
+    parser = argparse.ArgumentParser(description="Reporte de consultas lentas con EXPLAIN QUERY PLAN")
+    parser.add_argument("--log", default=RUTA_LOG, help="log de consultas lentas")
+    parser.add_argument("--top", type=int, default=TOP_REPORTE)
+    parser.add_argument("--bd", default=None, help="ruta de la base de datos")
+    parser.add_argument("--json", action="store_true", help="imprimir el reporte en JSON")
+    args = parser.parse_args()
+
+    if args.bd:
+        base_datos.configurar_bd(args.bd)
+    reporte = reporte_consultas_bd(args.top, leer_log(args.log))
+    if args.json:
+        print(json.dumps(reporte, indent=2, ensure_ascii=False))
+    else:
+        print(formatear_reporte(reporte))
+
+if __name__ == "__main__":
+    main()
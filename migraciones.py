@@ -0,0 +1,314 @@
+# ============================
+#   MIGRACIONES DE ESQUEMA
+# ============================
+# La versión del esquema se guarda en PRAGMA user_version. Cada migración
+# se aplica una sola vez, en orden y dentro de su propia transacción
+# (BEGIN IMMEDIATE ... COMMIT), junto con el nuevo número de versión.
+# Si el esquema ya está al día, el arranque solo lee ese entero.
+import logging
+
+log = logging.getLogger(__name__)
+
+# Doctores por tipo de accidente al momento de crear la migración 1.
+# Se copian aquí para que la migración no cambie si cambia la interfaz.
+DOCTORES_MIGRACION_1 = {
+    "Cortes": "Dr. Juan Pérez",
+    "Quemaduras": "Dra. Ana Gómez",
+    "Fracturas": "Dr. Luis Martínez",
+    "Convulsiones": "Dra. Elena Ríos",
+}
+
+COLUMNAS_PACIENTES = ("id", "nombre", "edad", "accidente", "doctor_asignado", "fecha_atencion")
+
+# ============================
+#   MIGRACIONES
+# ============================
+def _columnas(conexion, tabla):
+    return [col[1] for col in conexion.execute(f"PRAGMA table_info({tabla})")]
+
+def _crear_tabla_pacientes(conexion):
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS pacientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            edad INTEGER,
+            accidente TEXT NOT NULL,
+            doctor_asignado TEXT NOT NULL,
+            fecha_atencion TEXT NOT NULL
+        )
+    """)
+
+def _adaptar_pacientes_antiguos(conexion):
+    """Reconstruye una tabla pacientes creada por las apps antiguas conservando sus filas"""
+    existentes = _columnas(conexion, "pacientes")
+    if set(COLUMNAS_PACIENTES).issubset(existentes):
+        return
+
+    casos_doctor = " ".join(
+        f"WHEN '{accidente}' THEN '{doctor}'" for accidente, doctor in DOCTORES_MIGRACION_1.items())
+    valores = {
+        "id": "id",
+        "nombre": "nombre",
+        "edad": "edad" if "edad" in existentes else "NULL",
+        "accidente": "accidente",
+        "doctor_asignado": ("doctor_asignado" if "doctor_asignado" in existentes
+                            else f"CASE accidente {casos_doctor} ELSE 'Doctor no asignado' END"),
+        "fecha_atencion": "fecha_atencion" if "fecha_atencion" in existentes else "''",
+    }
+
+    conexion.execute("ALTER TABLE pacientes RENAME TO pacientes_antigua")
+    _crear_tabla_pacientes(conexion)
+    conexion.execute(f"""
+        INSERT INTO pacientes ({", ".join(COLUMNAS_PACIENTES)})
+        SELECT {", ".join(valores[col] for col in COLUMNAS_PACIENTES)} FROM pacientes_antigua
+    """)
+    conexion.execute("DROP TABLE pacientes_antigua")
+
+def migracion_1_esquema_inicial(conexion):
+    """Tablas pacientes, citas, asistencia y personal"""
+    if _columnas(conexion, "pacientes"):
+        _adaptar_pacientes_antiguos(conexion)
+    else:
+        _crear_tabla_pacientes(conexion)
+
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS citas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_paciente TEXT NOT NULL,
+            telefono TEXT,
+            motivo TEXT NOT NULL,
+            doctor TEXT NOT NULL,
+            fecha_cita TEXT NOT NULL,
+            hora_cita TEXT NOT NULL,
+            estado TEXT DEFAULT 'Programada',
+            fecha_creacion TEXT NOT NULL
+        )
+    """)
+
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS asistencia (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_personal TEXT NOT NULL,
+            cargo TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            hora_entrada TEXT,
+            hora_salida TEXT,
+            estado TEXT DEFAULT 'Presente',
+            observaciones TEXT
+        )
+    """)
+
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS personal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            cargo TEXT NOT NULL,
+            codigo TEXT UNIQUE NOT NULL,
+            foto_encoding BLOB,
+            fecha_registro TEXT NOT NULL,
+            activo INTEGER DEFAULT 1
+        )
+    """)
+
+def migracion_2_indices(conexion):
+    """Índices para las consultas de citas y asistencia"""
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_fecha_hora ON citas (fecha_cita, hora_cita)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_personal_fecha ON asistencia (nombre_personal, fecha)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_personal_activo ON personal (activo)")
+
+def migracion_3_fechas_iso(conexion):
+    """Columnas de fecha ISO-8601 con índices de rango"""
+    # Las columnas DD/MM/YYYY se conservan para las apps antiguas; las filas
+    # existentes se rellenan por lotes con base_datos.rellenar_fechas_iso()
+    conexion.execute("ALTER TABLE pacientes ADD COLUMN fecha_atencion_iso TEXT")
+    conexion.execute("ALTER TABLE citas ADD COLUMN fecha_hora_iso TEXT")
+    conexion.execute("ALTER TABLE asistencia ADD COLUMN fecha_iso TEXT")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_fecha_iso ON pacientes (fecha_atencion_iso)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_fecha_hora_iso ON citas (fecha_hora_iso, doctor)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_fecha_iso ON asistencia (fecha_iso, hora_entrada)")
+
+def migracion_4_busqueda_fts(conexion):
+    """Índice de texto completo FTS5 sobre nombre, accidente y doctor"""
+    # Tabla de contenido externo: el texto vive en pacientes y los
+    # triggers mantienen el índice al día, también para las apps antiguas.
+    # remove_diacritics 2 hace que "jose perez" encuentre "José Pérez".
+    conexion.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS pacientes_fts USING fts5(
+            nombre, accidente, doctor_asignado,
+            content='pacientes', content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2",
+            prefix='2 3'
+        )
+    """)
+    conexion.execute("""
+        CREATE TRIGGER IF NOT EXISTS pacientes_fts_insert AFTER INSERT ON pacientes BEGIN
+            INSERT INTO pacientes_fts (rowid, nombre, accidente, doctor_asignado)
+            VALUES (new.id, new.nombre, new.accidente, new.doctor_asignado);
+        END
+    """)
+    conexion.execute("""
+        CREATE TRIGGER IF NOT EXISTS pacientes_fts_delete AFTER DELETE ON pacientes BEGIN
+            INSERT INTO pacientes_fts (pacientes_fts, rowid, nombre, accidente, doctor_asignado)
+            VALUES ('delete', old.id, old.nombre, old.accidente, old.doctor_asignado);
+        END
+    """)
+    conexion.execute("""
+        CREATE TRIGGER IF NOT EXISTS pacientes_fts_update
+        AFTER UPDATE OF nombre, accidente, doctor_asignado ON pacientes BEGIN
+            INSERT INTO pacientes_fts (pacientes_fts, rowid, nombre, accidente, doctor_asignado)
+            VALUES ('delete', old.id, old.nombre, old.accidente, old.doctor_asignado);
+            INSERT INTO pacientes_fts (rowid, nombre, accidente, doctor_asignado)
+            VALUES (new.id, new.nombre, new.accidente, new.doctor_asignado);
+        END
+    """)
+    conexion.execute("INSERT INTO pacientes_fts (pacientes_fts) VALUES ('rebuild')")
+
+def migracion_5_indices_paginacion(conexion):
+    """Índices (clave de orden, id) para la paginación por keyset"""
+    # El id (rowid) va implícito al final de cada índice, así que
+    # ORDER BY clave, id y (clave, id) > (?, ?) se resuelven sin ordenar.
+    conexion.execute("DROP INDEX IF EXISTS idx_citas_fecha_hora_iso")
+    conexion.execute("DROP INDEX IF EXISTS idx_asistencia_fecha_iso")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_fecha_hora_iso ON citas (fecha_hora_iso)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_fecha_iso ON asistencia (fecha_iso)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_nombre ON pacientes (nombre)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_edad ON pacientes (IFNULL(edad, -1))")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_accidente ON pacientes (accidente)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_doctor ON pacientes (doctor_asignado)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_paciente ON citas (nombre_paciente)")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_doctor ON citas (doctor)")
+
+# Tablas y columnas ISO que se resumen en daily_counts (tipo = nombre de la tabla)
+CONTEOS_DIARIOS = (("pacientes", "fecha_atencion_iso"), ("citas", "fecha_hora_iso"))
+
+def migracion_6_conteos_diarios(conexion):
+    """Tabla daily_counts con el número de pacientes y citas por día, mantenida por triggers"""
+    # Clave (tipo, dia) sin rowid: un mes son como mucho 31 filas contiguas
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS daily_counts (
+            tipo TEXT NOT NULL,
+            dia TEXT NOT NULL,
+            cantidad INTEGER NOT NULL,
+            PRIMARY KEY (tipo, dia)
+        ) WITHOUT ROWID
+    """)
+    for tabla, columna in CONTEOS_DIARIOS:
+        sumar = f"""
+            INSERT INTO daily_counts (tipo, dia, cantidad)
+            SELECT '{tabla}', substr(new.{columna}, 1, 10), 1 WHERE new.{columna} <> ''
+            ON CONFLICT (tipo, dia) DO UPDATE SET cantidad = cantidad + 1;
+        """
+        restar = f"""
+            UPDATE daily_counts SET cantidad = cantidad - 1
+            WHERE tipo = '{tabla}' AND dia = substr(old.{columna}, 1, 10);
+            DELETE FROM daily_counts
+            WHERE tipo = '{tabla}' AND dia = substr(old.{columna}, 1, 10) AND cantidad <= 0;
+        """
+        conexion.execute(f"CREATE TRIGGER IF NOT EXISTS {tabla}_conteo_insert "
+                         f"AFTER INSERT ON {tabla} BEGIN {sumar} END")
+        conexion.execute(f"CREATE TRIGGER IF NOT EXISTS {tabla}_conteo_delete "
+                         f"AFTER DELETE ON {tabla} BEGIN {restar} END")
+        # Solo cuando cambia el día (incluye el relleno NULL -> fecha de rellenar_fechas_iso)
+        conexion.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla}_conteo_update AFTER UPDATE OF {columna} ON {tabla}
+            WHEN substr(old.{columna}, 1, 10) IS NOT substr(new.{columna}, 1, 10)
+            BEGIN {restar} {sumar} END
+        """)
+        conexion.execute(f"""
+            INSERT INTO daily_counts (tipo, dia, cantidad)
+            SELECT '{tabla}', substr({columna}, 1, 10), COUNT(*) FROM {tabla}
+            WHERE {columna} <> '' GROUP BY 2
+        """)
+
+def migracion_7_importaciones(conexion):
+    """Tabla importaciones con el punto de control de cada carga masiva"""
+    # clave identifica archivo + tabla; registros es cuántos registros del
+    # archivo ya se procesaron (se actualiza en la misma transacción del lote)
+    conexion.execute("""
+        CREATE TABLE IF NOT EXISTS importaciones (
+            clave TEXT PRIMARY KEY,
+            tabla TEXT NOT NULL,
+            registros INTEGER NOT NULL DEFAULT 0,
+            filas INTEGER NOT NULL DEFAULT 0,
+            rechazadas INTEGER NOT NULL DEFAULT 0,
+            terminada INTEGER NOT NULL DEFAULT 0,
+            actualizada TEXT NOT NULL
+        )
+    """)
+
+def migracion_8_agenda_doctores(conexion):
+    """Duración de cada cita e índice (doctor, fecha_hora_iso) para detectar choques de horario"""
+    # duracion_min NULL significa la duración por defecto (base_datos.DURACION_CITA_MIN)
+    if "duracion_min" not in _columnas(conexion, "citas"):
+        conexion.execute("ALTER TABLE citas ADD COLUMN duracion_min INTEGER")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_doctor_fecha ON citas (doctor, fecha_hora_iso)")
+
+def migracion_9_asistencia_unica(conexion):
+    """Índice único (nombre_personal, fecha) en asistencia para registrar con UPSERT"""
+    # Si dos registros del mismo día se colaron (dos recepciones a la vez),
+    # se juntan en el más antiguo: la primera entrada y la última salida
+    conexion.execute("""
+        UPDATE asistencia SET
+            hora_entrada = (SELECT MIN(d.hora_entrada) FROM asistencia d
+                            WHERE d.nombre_personal = asistencia.nombre_personal AND d.fecha = asistencia.fecha),
+            hora_salida = (SELECT MAX(d.hora_salida) FROM asistencia d
+                           WHERE d.nombre_personal = asistencia.nombre_personal AND d.fecha = asistencia.fecha)
+        WHERE id IN (SELECT MIN(id) FROM asistencia GROUP BY nombre_personal, fecha HAVING COUNT(*) > 1)
+    """)
+    conexion.execute("DELETE FROM asistencia WHERE id NOT IN (SELECT MIN(id) FROM asistencia "
+                     "GROUP BY nombre_personal, fecha)")
+    conexion.execute("DROP INDEX IF EXISTS idx_asistencia_personal_fecha")
+    conexion.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_asistencia_personal_dia ON asistencia (nombre_personal, fecha)")
+
+def migracion_10_orden_fechas_nulas(conexion):
+    """Índices IFNULL(fecha ISO, '') para paginar por fecha sin saltarse las filas sin fecha"""
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_pacientes_orden_fecha ON pacientes (IFNULL(fecha_atencion_iso, ''))")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_citas_orden_fecha ON citas (IFNULL(fecha_hora_iso, ''))")
+    conexion.execute("CREATE INDEX IF NOT EXISTS idx_asistencia_orden_fecha ON asistencia (IFNULL(fecha_iso, ''))")
+
+# Lista ordenada de (versión, función). Nunca modificar una migración ya
+# publicada: para cambiar el esquema se agrega una nueva al final.
+MIGRACIONES = [
+    (1, migracion_1_esquema_inicial),
+    (2, migracion_2_indices),
+    (3, migracion_3_fechas_iso),
+    (4, migracion_4_busqueda_fts),
+    (5, migracion_5_indices_paginacion),
+    (6, migracion_6_conteos_diarios),
+    (7, migracion_7_importaciones),
+    (8, migracion_8_agenda_doctores),
+    (9, migracion_9_asistencia_unica),
+    (10, migracion_10_orden_fechas_nulas),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+# ============================
+#   MOTOR DE MIGRACIONES
+# ============================
+def version_actual(conexion):
+    return conexion.execute("PRAGMA user_version").fetchone()[0]
+
+def migrar(conexion):
+    """Aplica las migraciones pendientes. Devuelve la lista de versiones aplicadas"""
+    if version_actual(conexion) >= VERSION_ESQUEMA:
+        return []
+
+    aplicadas = []
+    for version, migracion in MIGRACIONES:
+        conexion.commit()
+        conexion.execute("BEGIN IMMEDIATE")
+        try:
+            # Releer dentro de la transacción por si otro proceso ya migró
+            if version_actual(conexion) >= version:
+                conexion.rollback()
+                continue
+            migracion(conexion)
+            conexion.execute(f"PRAGMA user_version = {version}")
+            conexion.commit()
+        except BaseException:
+            conexion.rollback()
+            raise
+        aplicadas.append(version)
+        log.info("Migración %d aplicada: %s", version, migracion.__doc__)
+    return aplicadas
@@ -0,0 +1,213 @@
+# ============================
+#   PERFIL DE ARRANQUE
+# ============================
+# Dos mediciones para mantener el arranque de TRABAJO ELVIS.py por debajo
+# de OBJETIVO_ARRANQUE_S:
+#   - Dentro de la aplicación: marcar(etapa) guarda el tiempo transcurrido
+#     desde que se importó este módulo (lo primero que importa la
+#     interfaz). Las etapas que corren en paralelo (la carga de datos
+#     después de mostrar la ventana) pasan su propio inicio con desde=.
+#     terminar() agrega la corrida a HISTORIAL y, con
+#     ELVIS_PERFIL_ARRANQUE=1, imprime las etapas y las importaciones
+#     diferidas. --historial compara la última corrida con las anteriores.
+#   - Desde la consola: este archivo lee del código de la interfaz las
+#     importaciones que hace al arrancar, las ejecuta en un proceso nuevo
+#     con python -X importtime y muestra las que más tardan.
+#
+# Uso:
+#   python perfil_arranque.py [--top 15] [--objetivo 1.5] [--con-vision] [--json]
+#   python perfil_arranque.py --historial 10
+import time
+
+INICIO = time.perf_counter()
+
+import logging
+import os
+import sys
+
+import carga_diferida
+
+# argparse, ast, json y subprocess solo se usan desde la consola: se
+# importan dentro de esas funciones para no sumar al arranque que se mide
+
+OBJETIVO_ARRANQUE_S = 1.5
+APLICACION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TRABAJO ELVIS.py")
+HISTORIAL = os.path.join(os.path.dirname(APLICACION), "arranque_historial.jsonl")
+UMBRAL_REGRESION = 0.2          # 20 % más lenta que la mediana de las corridas anteriores
+
+_etapas = []                    # (etapa, inicio, fin) en segundos desde INICIO
+_fin_secuencial = 0.0           # fin de la última etapa marcada sin desde=
+
+# ============================
+#   ETAPAS DENTRO DE LA APLICACIÓN
+# ============================
+def ahora():
+    """Segundos desde INICIO (para pasarlo después como desde=)"""
+    return time.perf_counter() - INICIO
+
+def marcar(etapa, desde=None):
+    """Anota que la etapa terminó ahora.
+
+    Sin desde, la etapa empezó donde terminó la anterior marcada así; con
+    desde (un valor de ahora()) se mide desde ese momento.
+    """
+    global _fin_secuencial
+    fin = ahora()
+    if desde is None:
+        desde, _fin_secuencial = _fin_secuencial, fin
+    _etapas.append((etapa, desde, fin))
+
+def etapas():
+    """[{etapa, ms (fin, desde el inicio), duracion_ms}] en orden"""
+    return [{"etapa": etapa, "ms": round(fin * 1000, 1), "duracion_ms": round((fin - desde) * 1000, 1)}
+            for etapa, desde, fin in _etapas]
+
+def _guardar(filas, ruta=HISTORIAL):
+    import json
+    corrida = {"fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "etapas": {fila["etapa"]: fila["duracion_ms"] for fila in filas},
+               "total_ms": filas[-1]["ms"] if filas else 0.0}
+    try:
+        with open(ruta, "a", encoding="utf-8") as archivo:
+            archivo.write(json.dumps(corrida, ensure_ascii=False) + "\n")
+    except OSError as e:
+        logging.getLogger(__name__).warning("No se pudo guardar el perfil de arranque: %s", e)
+
+def terminar(objetivo=OBJETIVO_ARRANQUE_S, etapa="datos_cargados"):
+    """Marca la última etapa, guarda la corrida y, con ELVIS_PERFIL_ARRANQUE, imprime el perfil"""
+    marcar(etapa, desde=0.0)
+    filas = etapas()
+    _guardar(filas)
+    if not os.environ.get("ELVIS_PERFIL_ARRANQUE"):
+        return
+    print("==== Perfil de arranque ====")
+    for fila in filas:
+        print(f"  {fila['etapa']:<24} {fila['duracion_ms']:8.1f} ms   (termina en {fila['ms']:8.1f} ms)")
+    for nombre, medida in carga_diferida.tiempos_importacion().items():
+        print(f"  diferida: {nombre:<20} {medida['ms']:8.1f} ms" + (" (no instalada)" if medida["error"] else ""))
+    visible = next((fila["ms"] for fila in filas if fila["etapa"] == "ventana_visible"), filas[-1]["ms"])
+    if visible > objetivo * 1000:
+        print(f"⚠️  La ventana tardó {visible / 1000:.2f} s en verse, más que el objetivo de {objetivo:.2f} s")
+
+# ============================
+#   HISTORIAL DE CORRIDAS
+# ============================
+def leer_historial(ruta=HISTORIAL):
+    import json
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as archivo:
+        return [json.loads(linea) for linea in archivo if linea.strip()]
+
+def regresiones(corridas, umbral=UMBRAL_REGRESION):
+    """Etapas de la última corrida más lentas que la mediana de las anteriores.
+
+    Devuelve [(etapa, mediana_ms, ultima_ms)].
+    """
+    if len(corridas) < 2:
+        return []
+    ultima, anteriores = corridas[-1]["etapas"], corridas[:-1]
+    peores = []
+    for etapa, ms in ultima.items():
+        previas = sorted(corrida["etapas"][etapa] for corrida in anteriores if etapa in corrida["etapas"])
+        if not previas:
+            continue
+        mediana = previas[len(previas) // 2]
+        if mediana and ms > mediana * (1 + umbral):
+            peores.append((etapa, mediana, ms))
+    return peores
+
+def mostrar_historial(cantidad):
+    corridas = leer_historial()[-cantidad:]
+    if not corridas:
+        print(f"No hay corridas guardadas en {HISTORIAL}")
+        return []
+    nombres = list(dict.fromkeys(etapa for corrida in corridas for etapa in corrida["etapas"]))
+    print(f"{'etapa':<24}" + "".join(f"{corrida['fecha'][5:16]:>13}" for corrida in corridas))
+    for etapa in nombres:
+        print(f"{etapa:<24}" + "".join(f"{corrida['etapas'][etapa]:13.1f}" if etapa in corrida["etapas"]
+                                       else f"{'-':>13}" for corrida in corridas))
+    peores = regresiones(corridas)
+    for etapa, mediana, ms in peores:
+        print(f"⚠️  {etapa}: {mediana:.1f} ms -> {ms:.1f} ms en la última corrida")
+    return peores
+
+# ============================
+#   IMPORTACIONES DE LA INTERFAZ (-X importtime)
+# ============================
+def importaciones_de(ruta=APLICACION):
+    """Sentencias import del nivel superior del archivo (también dentro de try).
+
+    Las de dentro de un if (p. ej. el cliente del modo remoto) no se cuentan:
+    no son parte del arranque normal.
+    """
+    import ast
+    with open(ruta, encoding="utf-8") as archivo:
+        arbol = ast.parse(archivo.read(), ruta)
+    sentencias = []
+    pendientes = list(arbol.body)
+    while pendientes:
+        nodo = pendientes.pop(0)
+        if isinstance(nodo, (ast.Import, ast.ImportFrom)) and not getattr(nodo, "level", 0):
+            sentencias.append(ast.unparse(nodo))
+        elif isinstance(nodo, ast.Try):
+            pendientes[:0] = nodo.body
+    return sentencias
+
+def medir_importaciones(sentencias, carpeta=None):
+    """Ejecuta las sentencias con -X importtime en un proceso nuevo.
+
+    Devuelve {"total_ms", "modulos": [{modulo, propio_ms, acumulado_ms}]}
+    con los módulos del primer nivel (los que se importan directamente),
+    de mayor a menor tiempo acumulado.
+    """
+    import subprocess
+    codigo = "\n".join(f"try:\n    {sentencia}\nexcept ImportError:\n    pass" for sentencia in sentencias)
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                             cwd=carpeta or os.path.dirname(APLICACION),
+                             capture_output=True, text=True, encoding="utf-8")
+    modulos = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|", 2)
+        if not propio.strip().isdigit() or nombre[1:2] == " ":     # cabecera o módulo anidado
+            continue
+        modulos.append({"modulo": nombre.strip(), "propio_ms": round(int(propio) / 1000, 1),
+                        "acumulado_ms": round(int(acumulado) / 1000, 1)})
+    modulos.sort(key=lambda fila: -fila["acumulado_ms"])
+    return {"total_ms": round(sum(fila["acumulado_ms"] for fila in modulos), 1), "modulos": modulos}
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Tiempos de importación del arranque de la interfaz")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--objetivo", type=float, default=OBJETIVO_ARRANQUE_S, help="segundos")
+    parser.add_argument("--con-vision", action="store_true",
+                        help="sumar OpenCV, NumPy, face_recognition y PIL (como antes de la carga diferida)")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--historial", type=int, default=None, metavar="N",
+                        help="mostrar las últimas N corridas de la aplicación en vez de medir las importaciones")
+    args = parser.parse_args()
+
+    if args.historial:
+        sys.exit(1 if mostrar_historial(args.historial) else 0)
+
+    sentencias = importaciones_de()
+    if args.con_vision:
+        sentencias += [f"import {importar}" for importar, _ in carga_diferida.MODULOS.values()]
+    resultado = medir_importaciones(sentencias)
+    resultado["objetivo_ms"] = args.objetivo * 1000
+    if args.json:
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    else:
+        print(f"Importaciones al arrancar: {resultado['total_ms']:.1f} ms (objetivo {args.objetivo:.2f} s)")
+        for fila in resultado["modulos"][:args.top]:
+            print(f"  {fila['modulo']:<32} {fila['acumulado_ms']:9.1f} ms  (propio {fila['propio_ms']:.1f} ms)")
+    if resultado["total_ms"] > args.objetivo * 1000:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# ============================
+#   PLANIFICADOR AUTOMÁTICO DE CITAS
+# ============================
+# Recibe un lote de solicitudes pendientes (motivo, ventanas de horario
+# preferidas y urgencia) y asigna a cada una un doctor y un horario del
+# día, en lugar de que la recepción elija a mano en reservar_cita().
+#   - Los doctores posibles para cada motivo vienen de un diccionario
+#     {motivo: [doctores]} (en la interfaz, doctores_asignados); un motivo
+#     sin especialista puede ir con cualquier doctor.
+#   - Se atiende primero la urgencia más alta; con la misma urgencia, la
+#     solicitud con menos margen (la que su última ventana termina antes) y
+#     después por orden de llegada. Así el resultado es siempre el mismo.
+#   - Para cada solicitud se busca en cada doctor posible el primer horario
+#     libre dentro de sus ventanas (IndiceAgenda.primer_libre) y se elige
+#     el de menor puntaje: minuto de inicio + PESO_CARGA_MIN por cada cita
+#     que el doctor ya tiene ese día. Para una urgencia el peso de la carga
+#     se divide por la urgencia: importa más atender pronto que repartir.
+# El índice se actualiza con cada asignación, así que el plan no tiene
+# choques; guardar_plan() igual vuelve a comprobar cada cita en SQL dentro
+# de la transacción por si otra recepción reservó mientras tanto.
+#
+# Uso desde consola (una solicitud JSON por línea):
+#   python planificador_citas.py solicitudes.jsonl --fecha 2024-06-03 [--guardar]
+#   {"nombre": "Ana", "telefono": "...", "motivo": "Cortes", "ventanas": ["08:00-12:00"], "urgencia": 2}
+import argparse
+import json
+import logging
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import base_datos
+from agenda_citas import HORARIO_ATENCION, IndiceAgenda, _minuto, cargar_agenda
+from base_datos import DURACION_CITA_MIN, CitaOcupada, insertar_cita, obtener_gestor
+
+log = logging.getLogger(__name__)
+
+PESO_CARGA_MIN = 20     # minutos de espera que "vale" cada cita de más de un doctor
+URGENCIAS = {1: "normal", 2: "prioritaria", 3: "urgente"}
+
+# ventanas: ((inicio, fin), ...) en minutos desde la medianoche; vacía = todo el horario
+Solicitud = namedtuple("Solicitud", "id nombre telefono motivo ventanas urgencia")
+
+def leer_ventana(texto):
+    """'08:00-12:00' -> (480, 720)"""
+    inicio, fin = (datetime.strptime(parte.strip(), "%H:%M") for parte in texto.split("-"))
+    return _minuto(inicio), _minuto(fin)
+
+def _lista(doctores):
+    return [doctores] if isinstance(doctores, str) else list(doctores)
+
+def doctores_para(motivo, doctores_por_motivo):
+    """Doctores que pueden atender el motivo; todos si ninguno es especialista en él.
+
+    Los valores de doctores_por_motivo pueden ser un doctor o una lista.
+    """
+    texto = motivo.strip().lower()
+    for clave, doctores in doctores_por_motivo.items():
+        # "Fracturas" también reconoce "fractura de brazo"
+        if clave and (clave.lower() == texto or clave.lower().rstrip("s") in texto):
+            return _lista(doctores)
+    return sorted({doctor for doctores in doctores_por_motivo.values() for doctor in _lista(doctores)})
+
+# ============================
+#   PLANIFICACIÓN
+# ============================
+def planificar(solicitudes, dia, doctores_por_motivo, indice=None, duracion=DURACION_CITA_MIN,
+               horario=HORARIO_ATENCION, desde=None, peso_carga=PESO_CARGA_MIN):
+    """Asigna doctor y horario a cada solicitud para el día dia (date).
+
+    indice: IndiceAgenda con las citas ya reservadas (se le agregan las
+    asignadas). desde: minuto a partir del cual buscar (p. ej. la hora
+    actual si el día es hoy). Devuelve ([(solicitud, doctor, inicio)], [sin asignar]).
+    """
+    indice = indice if indice is not None else IndiceAgenda()
+    abre, cierra = horario
+    desde = max(abre, desde or abre)
+    base = datetime.combine(dia, datetime.min.time())
+    candidatos = {}
+    carga = {}
+
+    def margen(solicitud):
+        return max((fin for _, fin in solicitud.ventanas), default=cierra)
+
+    asignadas, pendientes = [], []
+    for solicitud in sorted(solicitudes, key=lambda s: (-s.urgencia, margen(s), s.id)):
+        if solicitud.motivo not in candidatos:
+            candidatos[solicitud.motivo] = doctores_para(solicitud.motivo, doctores_por_motivo)
+        peso = peso_carga / max(solicitud.urgencia, 1)
+        mejor = None
+        for doctor in candidatos[solicitud.motivo]:
+            if doctor not in carga:
+                carga[doctor] = len(indice.citas_del_dia(doctor, dia))
+            for inicio_ventana, fin_ventana in sorted(solicitud.ventanas) or (horario,):
+                minuto = indice.primer_libre(doctor, dia, max(inicio_ventana, desde), min(fin_ventana, cierra),
+                                             duracion, origen=abre)
+                if minuto is not None:
+                    puntaje = (minuto + peso * carga[doctor], carga[doctor], doctor)
+                    if mejor is None or puntaje < mejor[0]:
+                        mejor = (puntaje, doctor, minuto)
+                    break       # las ventanas siguientes empiezan después
+        if mejor is None:
+            pendientes.append(solicitud)
+            continue
+        _, doctor, minuto = mejor
+        inicio = base + timedelta(minutes=minuto)
+        indice.agregar(doctor, inicio, duracion, None)
+        carga[doctor] += 1
+        asignadas.append((solicitud, doctor, inicio))
+    return asignadas, pendientes
+
+def resumen_plan(asignadas, pendientes, horario=HORARIO_ATENCION):
+    """Espera (minutos desde el inicio de la primera ventana) por urgencia y carga por doctor"""
+    esperas = {}
+    por_doctor = {}
+    for solicitud, doctor, inicio in asignadas:
+        preferido = min((ini for ini, _ in solicitud.ventanas), default=horario[0])
+        esperas.setdefault(URGENCIAS.get(solicitud.urgencia, solicitud.urgencia), []).append(
+            _minuto(inicio) - preferido)
+        por_doctor[doctor] = por_doctor.get(doctor, 0) + 1
+    cargas = sorted(por_doctor.values())
+    media = sum(cargas) / len(cargas) if cargas else 0
+    return {
+        "asignadas": len(asignadas),
+        "sin_asignar": len(pendientes),
+        "espera_min": {urgencia: {"media": round(sum(valores) / len(valores), 1),
+                                  "p95": sorted(valores)[min(int(0.95 * len(valores)), len(valores) - 1)],
+                                  "max": max(valores)}
+                       for urgencia, valores in sorted(esperas.items())},
+        "citas_por_doctor": {"min": cargas[0] if cargas else 0, "max": cargas[-1] if cargas else 0,
+                             "desviacion": round((sum((c - media) ** 2 for c in cargas) / len(cargas)) ** 0.5, 2)
+                             if cargas else 0},
+    }
+
+# ============================
+#   CON LA BASE DE DATOS
+# ============================
+def _rango_dia(dia):
+    return dia.isoformat(), (dia + timedelta(days=1)).isoformat()
+
+def planificar_bd(solicitudes, dia, doctores_por_motivo, duracion=DURACION_CITA_MIN):
+    """planificar() sobre las citas ya guardadas de ese día"""
+    ahora = datetime.now()
+    desde = _minuto(ahora) if dia == ahora.date() else None
+    return planificar(solicitudes, dia, doctores_por_motivo, cargar_agenda(rango=_rango_dia(dia)),
+                      duracion, desde=desde)
+
+def guardar_plan(asignadas, duracion=DURACION_CITA_MIN):
+    """Guarda las citas del plan en una sola transacción.
+
+    Cada cita va en su SAVEPOINT: si otra recepción ocupó ese horario
+    mientras tanto, esa se informa y las demás se guardan igual.
+    Devuelve ([filas guardadas], [(solicitud, error)]).
+    """
+    guardadas, rechazadas = [], []
+    with obtener_gestor().escritura() as conexion:
+        for solicitud, doctor, inicio in asignadas:
+            conexion.execute("SAVEPOINT cita")
+            try:
+                guardadas.append(insertar_cita(conexion, solicitud.nombre, solicitud.telefono, solicitud.motivo,
+                                               doctor, inicio.strftime("%d/%m/%Y"), inicio.strftime("%H:%M"),
+                                               duracion))
+            except (CitaOcupada, ValueError) as e:
+                conexion.execute("ROLLBACK TO cita")
+                rechazadas.append((solicitud, e))
+            conexion.execute("RELEASE cita")
+    log.info("Plan guardado: %d citas, %d rechazadas", len(guardadas), len(rechazadas))
+    return guardadas, rechazadas
+
+def sugerir_cita_bd(motivo, fecha, doctores_por_motivo, urgencia=1, duracion=DURACION_CITA_MIN):
+    """Doctor y hora para una sola cita: (doctor, 'HH:MM'), o None si ese día no hay lugar.
+
+    fecha: 'DD/MM/YYYY'. Es el planificador con una solicitud, para el
+    botón de la ventana de reservas.
+    """
+    dia = datetime.strptime(fecha, "%d/%m/%Y").date()
+    asignadas, _ = planificar_bd([Solicitud(0, "", "", motivo, (), urgencia)], dia, doctores_por_motivo, duracion)
+    if not asignadas:
+        return None
+    _, doctor, inicio = asignadas[0]
+    return doctor, inicio.strftime("%H:%M")
+
+# ============================
+#   CONSOLA
+# ============================
+def leer_solicitudes(ruta):
+    """Solicitudes de un archivo JSONL (una por línea)"""
+    solicitudes = []
+    with open(ruta, encoding="utf-8") as archivo:
+        for numero, linea in enumerate(archivo, 1):
+            if not linea.strip():
+                continue
+            datos = json.loads(linea)
+            solicitudes.append(Solicitud(datos.get("id", numero), datos["nombre"], datos.get("telefono", ""),
+                                         datos["motivo"], tuple(leer_ventana(v) for v in datos.get("ventanas", ())),
+                                         int(datos.get("urgencia", 1))))
+    return solicitudes
+
+def main():
+    parser = argparse.ArgumentParser(description="Asigna doctor y horario a un lote de solicitudes")
+    parser.add_argument("solicitudes", help="archivo JSONL con una solicitud por línea")
+    parser.add_argument("--fecha", default=date.today().isoformat(), help="día a planificar (YYYY-MM-DD)")
+    parser.add_argument("--doctores", default=None,
+                        help='archivo JSON {"motivo": ["doctor", ...]} (por defecto todos los doctores '
+                             'de la base de citas, para cualquier motivo)')
+    parser.add_argument("--guardar", action="store_true", help="guardar las citas asignadas")
+    parser.add_argument("--bd", default=None, help="ruta de la base de datos")
+    args = parser.parse_args()
+
+    if args.bd:
+        base_datos.configurar_bd(args.bd)
+    base_datos.conectar_bd()
+    if args.doctores:
+        with open(args.doctores, encoding="utf-8") as archivo:
+            doctores_por_motivo = json.load(archivo)
+    else:
+        doctores_por_motivo = {"General": [fila[0] for fila in obtener_gestor().lectura().execute(
+            "SELECT DISTINCT doctor FROM citas WHERE doctor <> '' ORDER BY doctor")]}
+    solicitudes = leer_solicitudes(args.solicitudes)
+    dia = date.fromisoformat(args.fecha)
+
+    inicio = time.perf_counter()
+    asignadas, pendientes = planificar_bd(solicitudes, dia, doctores_por_motivo)
+    print(f"{len(solicitudes)} solicitudes planificadas en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    for solicitud, doctor, momento in sorted(asignadas, key=lambda a: (a[2], a[1])):
+        print(f"  {momento:%H:%M}  {doctor:<20} {solicitud.nombre} ({solicitud.motivo})")
+    for solicitud in pendientes:
+        print(f"  sin lugar: {solicitud.nombre} ({solicitud.motivo})")
+    print(json.dumps(resumen_plan(asignadas, pendientes), indent=2, ensure_ascii=False))
+    if args.guardar:
+        guardar_plan(asignadas)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# ============================
+#   REGISTRO DE MENSAJES (LOGGING)
+# ============================
+# Reemplaza los print(...)  # Debug repartidos por la aplicación. Cada
+# módulo usa su propio logger y pasa los datos como argumentos, así el
+# texto solo se arma si el mensaje se va a emitir:
+#   log = logging.getLogger(__name__)
+#   log.debug("Cita guardada: %s - %s", nombre, doctor)
+# Con el nivel en INFO (el de siempre) un log.debug() dentro de un bucle
+# cuesta una comparación de enteros. Si armar los argumentos es caro, se
+# protege con log.isEnabledFor(logging.DEBUG).
+#
+# configurar() (lo llaman la interfaz y el servicio al arrancar) envía
+# los mensajes a:
+#   - la consola (stderr)
+#   - un buffer circular en memoria con los últimos CAPACIDAD_BUFFER, que
+#     la interfaz muestra en la ventana de diagnóstico
+#   - un archivo rotativo escrito por un hilo aparte (QueueHandler +
+#     QueueListener): quien registra no espera al disco
+# El nivel sale de ELVIS_LOG (DEBUG, INFO, WARNING, ERROR) o es INFO.
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+RUTA_LOG = "elvis.log"
+CAPACIDAD_BUFFER = 2000
+TAMANO_ARCHIVO = 1024 * 1024        # bytes por archivo antes de rotar
+ARCHIVOS_VIEJOS = 3
+FORMATO = "%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s"
+NIVELES = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+Entrada = namedtuple("Entrada", "momento nivel origen hilo mensaje")
+
+class BufferRegistro(logging.Handler):
+    """Guarda los últimos mensajes en memoria (los más viejos se descartan)"""
+
+    def __init__(self, capacidad=CAPACIDAD_BUFFER):
+        super().__init__()
+        self.entradas = deque(maxlen=capacidad)
+
+    def emit(self, record):
+        try:
+            mensaje = record.getMessage()
+            if record.exc_info:
+                mensaje += "\n" + logging.Formatter().formatException(record.exc_info)
+            self.entradas.append(Entrada(record.created, record.levelno, record.name, record.threadName, mensaje))
+        except Exception:
+            self.handleError(record)
+
+    def recientes(self, nivel_minimo=logging.DEBUG, cantidad=None):
+        """Entradas con nivel >= nivel_minimo, de la más vieja a la más nueva"""
+        with self.lock:
+            entradas = [entrada for entrada in self.entradas if entrada.nivel >= nivel_minimo]
+        return entradas[-cantidad:] if cantidad else entradas
+
+    def vaciar(self):
+        with self.lock:
+            self.entradas.clear()
+
+_candado = threading.Lock()
+_buffer = None
+_oyente = None
+
+def _nivel(nivel):
+    if isinstance(nivel, int):
+        return nivel
+    return logging.getLevelName(str(nivel).upper()) if str(nivel).upper() in NIVELES else logging.INFO
+
+def configurar(nivel=None, ruta=RUTA_LOG, consola=True, capacidad=CAPACIDAD_BUFFER):
+    """Prepara el registro del proceso (solo la primera vez); devuelve el BufferRegistro"""
+    global _buffer, _oyente
+    with _candado:
+        if _buffer is not None:
+            return _buffer
+        raiz = logging.getLogger()
+        raiz.setLevel(_nivel(nivel or os.environ.get("ELVIS_LOG", "INFO")))
+
+        _buffer = BufferRegistro(capacidad)
+        raiz.addHandler(_buffer)
+        if consola:
+            pantalla = logging.StreamHandler()
+            pantalla.setFormatter(logging.Formatter("%(levelname)s %(name)s: %(message)s"))
+            raiz.addHandler(pantalla)
+        if ruta:
+            archivo = logging.handlers.RotatingFileHandler(ruta, maxBytes=TAMANO_ARCHIVO,
+                                                           backupCount=ARCHIVOS_VIEJOS, encoding="utf-8")
+            archivo.setFormatter(logging.Formatter(FORMATO))
+            cola = queue.SimpleQueue()
+            raiz.addHandler(logging.handlers.QueueHandler(cola))
+            _oyente = logging.handlers.QueueListener(cola, archivo)
+            _oyente.start()
+            atexit.register(cerrar)
+        return _buffer
+
+def cerrar():
+    """Escribe lo que quede en la cola y detiene el hilo del archivo"""
+    global _oyente
+    with _candado:
+        if _oyente is not None:
+            _oyente.stop()
+            for manejador in _oyente.handlers:
+                manejador.close()
+            _oyente = None
+
+def cambiar_nivel(nivel):
+    """Cambia el nivel de todo el proceso en caliente (por ejemplo a DEBUG para diagnosticar)"""
+    logging.getLogger().setLevel(_nivel(nivel))
+
+def nivel_actual():
+    return logging.getLevelName(logging.getLogger().level)
+
+def recientes(nivel_minimo=logging.DEBUG, cantidad=None):
+    """Entradas del buffer en memoria ([] si no se llamó configurar())"""
+    return _buffer.recientes(_nivel(nivel_minimo), cantidad) if _buffer else []
+
+def formatear(entrada):
+    """Una línea de texto para mostrar una Entrada"""
+    hora = time.strftime("%H:%M:%S", time.localtime(entrada.momento))
+    return f"{hora} {logging.getLevelName(entrada.nivel):<7} {entrada.origen} [{entrada.hilo}] {entrada.mensaje}"
@@ -0,0 +1,147 @@
+# ============================
+#   REPORTE DE HORAS TRABAJADAS Y TARDANZAS
+# ============================
+# Para la planilla: por cada persona del personal, en un mes (o un año),
+# días trabajados, horas trabajadas, horas extra, llegadas tarde y minutos
+# de tardanza. Las marcas de asistencia se leen de una vez como columnas
+# y todo el cálculo se hace con arreglos de NumPy (sin recorrer filas en
+# Python):
+#   - las horas 'HH:MM:SS' se convierten a segundos mirando sus caracteres
+#   - el turno de cada marca sale de su cargo (TURNOS)
+#   - los totales por persona se suman con np.bincount
+# Un día sin salida cuenta como incompleto: no suma horas ni horas extra.
+# Las horas extra son las que pasan la duración del turno de ese día.
+#
+# Uso:
+#   python reporte_asistencia.py --año 2024 --mes 6
+#   python reporte_asistencia.py --año 2024 --csv planilla_2024.csv
+import argparse
+import csv
+import time
+
+import numpy as np
+
+from base_datos import conectar_bd, configurar_bd, obtener_gestor
+from fechas import rango_mes
+
+# Turno de cada cargo: (entrada, salida) en minutos desde la medianoche
+TURNOS = {
+    "Doctor": (8 * 60, 16 * 60),
+    "Enfermería": (7 * 60, 15 * 60),
+    "Recepción": (8 * 60, 17 * 60),
+    "Limpieza": (6 * 60, 14 * 60),
+}
+TURNO_GENERAL = (8 * 60, 17 * 60)       # cargos que no están en TURNOS
+TOLERANCIA_MIN = 10                     # minutos de gracia antes de contar una tardanza
+
+COLUMNAS_REPORTE = ("Personal", "Cargo", "Días", "Incompletos", "Horas", "Horas extra",
+                    "Tardanzas", "Min. tarde")
+
+# ============================
+#   LECTURA POR COLUMNAS
+# ============================
+def leer_marcas(inicio, fin):
+    """Columnas (nombres, cargos, entradas, salidas) de asistencia con fecha_iso en [inicio, fin)"""
+    filas = obtener_gestor().lectura().execute(
+        "SELECT nombre_personal, cargo, IFNULL(hora_entrada, ''), IFNULL(hora_salida, '') FROM asistencia "
+        "WHERE fecha_iso >= ? AND fecha_iso < ? ORDER BY fecha_iso", (inicio, fin)).fetchall()
+    if not filas:
+        return (), (), (), ()
+    return tuple(zip(*filas))
+
+def a_segundos(horas):
+    """Textos 'HH:MM:SS' (o 'HH:MM') a segundos; NaN si están vacíos o mal escritos"""
+    # Un arreglo U8 guarda cada hora como 8 códigos UCS-4: se ven como una
+    # matriz de enteros (una fila por hora) y se restan los dígitos por columnas
+    codigos = np.array(horas, dtype="U8").view(np.uint32).reshape(-1, 8).astype(np.int64)
+    digitos = codigos - ord("0")
+    segundos = (digitos[:, 0] * 10 + digitos[:, 1]) * 3600 + (digitos[:, 3] * 10 + digitos[:, 4]) * 60
+    segundos += np.where(codigos[:, 5] == ord(":"), digitos[:, 6] * 10 + digitos[:, 7], 0)
+    cifras = digitos[:, [0, 1, 3, 4]]
+    validas = (codigos[:, 2] == ord(":")) & ((cifras >= 0) & (cifras <= 9)).all(axis=1)
+    return np.where(validas, segundos, np.nan)
+
+# ============================
+#   CÁLCULO
+# ============================
+def calcular_reporte(nombres, cargos, entradas, salidas, turnos=TURNOS, tolerancia=TOLERANCIA_MIN):
+    """Totales por persona: [(nombre, cargo, días, incompletos, horas, horas extra, tardanzas, minutos tarde)]"""
+    if not nombres:
+        return []
+    personas, persona = np.unique(np.array(nombres, dtype=str), return_inverse=True)
+    lista_cargos, cargo = np.unique(np.array(cargos, dtype=str), return_inverse=True)
+
+    # Turno de cada marca, a partir del turno de cada cargo distinto (el
+    # cargo se escribe a mano al registrar al personal: sin mayúsculas)
+    por_cargo = {nombre.strip().lower(): horario for nombre, horario in turnos.items()}
+    turno = np.array([por_cargo.get(c.strip().lower(), TURNO_GENERAL) for c in lista_cargos],
+                     dtype=np.float64).reshape(-1, 2) * 60
+    inicio_turno = turno[cargo, 0]
+    duracion_turno = turno[cargo, 1] - turno[cargo, 0]
+
+    entrada = a_segundos(entradas)
+    salida = a_segundos(salidas)
+    completo = ~np.isnan(entrada) & ~np.isnan(salida) & (salida > entrada)
+    trabajado = np.where(completo, salida - entrada, 0.0)
+    extra = np.where(completo, np.maximum(trabajado - duracion_turno, 0.0), 0.0)
+    retraso = np.where(np.isnan(entrada), 0.0, entrada - inicio_turno)
+    tarde = retraso > tolerancia * 60
+
+    n = len(personas)
+    dias = np.bincount(persona, minlength=n)
+    incompletos = np.bincount(persona, weights=~completo, minlength=n)
+    horas = np.bincount(persona, weights=trabajado, minlength=n) / 3600
+    horas_extra = np.bincount(persona, weights=extra, minlength=n) / 3600
+    tardanzas = np.bincount(persona, weights=tarde, minlength=n)
+    minutos_tarde = np.bincount(persona, weights=np.where(tarde, retraso, 0.0), minlength=n) / 60
+    # Cargo de cada persona: el de su marca más reciente (las filas vienen por fecha)
+    cargo_persona = np.empty(n, dtype=np.int64)
+    cargo_persona[persona] = cargo
+
+    return [(str(personas[i]), str(lista_cargos[cargo_persona[i]]), int(dias[i]), int(incompletos[i]),
+             round(float(horas[i]), 2), round(float(horas_extra[i]), 2), int(tardanzas[i]),
+             int(round(float(minutos_tarde[i]))))
+            for i in range(n)]
+
+def reporte_asistencia_bd(año, mes=None):
+    """Reporte de un mes, o del año completo si mes es None"""
+    if mes is None:
+        inicio, fin = f"{año:04d}-01-01", f"{año + 1:04d}-01-01"
+    else:
+        inicio, fin = rango_mes(año, mes)
+    return calcular_reporte(*leer_marcas(inicio, fin))
+
+def formatear_reporte(filas):
+    """El reporte como tabla de texto de ancho fijo"""
+    anchos = [max(len(str(valor)) for valor in columna)
+              for columna in zip(COLUMNAS_REPORTE, *filas)]
+    lineas = ["  ".join(str(valor).ljust(ancho) for valor, ancho in zip(COLUMNAS_REPORTE, anchos)),
+              "  ".join("-" * ancho for ancho in anchos)]
+    lineas += ["  ".join(str(valor).rjust(ancho) if isinstance(valor, (int, float)) else str(valor).ljust(ancho)
+                         for valor, ancho in zip(fila, anchos)) for fila in filas]
+    return "\n".join(lineas)
+
+def main():
+    parser = argparse.ArgumentParser(description="Horas trabajadas, horas extra y tardanzas del personal")
+    parser.add_argument("--año", type=int, required=True)
+    parser.add_argument("--mes", type=int, default=None, help="sin --mes, el año completo")
+    parser.add_argument("--csv", default=None, help="guardar el reporte en un CSV")
+    parser.add_argument("--bd", default=None, help="ruta de la base de datos")
+    args = parser.parse_args()
+
+    if args.bd:
+        configurar_bd(args.bd)
+    conectar_bd()
+    inicio = time.perf_counter()
+    filas = reporte_asistencia_bd(args.año, args.mes)
+    duracion = time.perf_counter() - inicio
+    print(formatear_reporte(filas))
+    print(f"\n{len(filas)} personas en {duracion * 1000:.0f} ms")
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as archivo:
+            escritor = csv.writer(archivo)
+            escritor.writerow(COLUMNAS_REPORTE)
+            escritor.writerows(filas)
+
+if __name__ == "__main__":
+    main()
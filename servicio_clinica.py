@@ -0,0 +1,330 @@
+# ============================
+#   SERVICIO HTTP/JSON DE LA CLÍNICA
+# ============================
+# Servidor asyncio sin interfaz que expone las operaciones de pacientes,
+# citas, personal y asistencia para que varias recepciones compartan una
+# sola base de datos (ver cliente_servicio.py y ELVIS_SERVIDOR en la
+# interfaz).
+#   - HTTP/1.1 con keep-alive: cada cliente reutiliza su conexión TCP.
+#   - Las lecturas corren en un grupo de hilos, cada uno con su conexión
+#     de lectura WAL (GestorConexiones): un pool de conexiones.
+#   - Las escrituras van al hilo escritor; altas de pacientes y marcas de
+#     asistencia pasan por EscrituraAgrupada, así las que llegan a la vez
+#     desde distintas recepciones se confirman en un solo commit.
+#   - POST /api/lote ejecuta varias operaciones en una sola petición.
+#
+# Protocolo:
+#   POST /api/<operacion>   {"args": [...], "kwargs": {...}} -> {"resultado": ...}
+#   POST /api/lote          [{"operacion": ..., "args": [...]}, ...]
+#                           -> {"resultados": [{"resultado": ...} | {"error": ..., "mensaje": ...}]}
+#   GET  /salud, GET /estadisticas
+# Los bytes viajan como {"$bytes": base64} y los diccionarios con claves
+# que no son texto como {"$dict": [[clave, valor], ...]}.
+#
+# Uso:
+#   python servicio_clinica.py --puerto 8765
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+import base_datos
+import consultas
+import registro
+from agenda_citas import proximos_libres_bd
+from archivo_historico import consultar_paciente_historico
+from base_datos import conectar_bd, configurar_bd
+from duplicados_pacientes import buscar_duplicados_bd, fusionar_nombres_bd
+from planificador_citas import sugerir_cita_bd
+from escritura_agrupada import EscrituraAgrupada
+from instrumentacion_bd import activar as activar_instrumentacion, reporte_consultas_bd
+
+log = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+LECTORES = 4
+INACTIVIDAD_S = 30          # se cierra una conexión keep-alive sin peticiones
+MAXIMO_CUERPO = 16 * 1024 * 1024
+RUTA_LOG = "servicio_clinica.log"
+
+# Operaciones expuestas: nombre -> (tipo, función). El tipo decide dónde corre
+OPERACIONES = {
+    "consultar_paciente": ("lectura", base_datos.consultar_paciente),
+    "consultar_paciente_historico": ("lectura", consultar_paciente_historico),
+    "obtener_atenciones_por_dia": ("lectura", base_datos.obtener_atenciones_por_dia),
+    "obtener_conteos_por_dia": ("lectura", base_datos.obtener_conteos_por_dia),
+    "consultar_citas_por_fecha": ("lectura", base_datos.consultar_citas_por_fecha),
+    "obtener_citas_semana_bd": ("lectura", base_datos.obtener_citas_semana_bd),
+    "resumen_tabla_bd": ("lectura", base_datos.resumen_tabla_bd),
+    "obtener_personal_bd": ("lectura", base_datos.obtener_personal_bd),
+    "obtener_encodings_personal_bd": ("lectura", base_datos.obtener_encodings_personal_bd),
+    "obtener_asistencia_mes_bd": ("lectura", base_datos.obtener_asistencia_mes_bd),
+    "proximos_libres_bd": ("lectura", proximos_libres_bd),
+    "sugerir_cita_bd": ("lectura", sugerir_cita_bd),
+    "buscar_duplicados_bd": ("lectura", buscar_duplicados_bd),
+    "pagina": ("lectura", consultas.pagina),
+    "clave": ("lectura", consultas.clave),
+    "contar": ("lectura", consultas.contar),
+    "reporte_consultas_bd": ("lectura", reporte_consultas_bd),
+    "eliminar_paciente_bd": ("escritura", base_datos.eliminar_paciente_bd),
+    "actualizar_paciente_bd": ("escritura", base_datos.actualizar_paciente_bd),
+    "guardar_cita_bd": ("escritura", base_datos.guardar_cita_bd),
+    "eliminar_cita_bd": ("escritura", base_datos.eliminar_cita_bd),
+    "guardar_personal_bd": ("escritura", base_datos.guardar_personal_bd),
+    "reproducir_asistencia_bd": ("escritura", base_datos.reproducir_asistencia_bd),
+    "fusionar_nombres_bd": ("escritura", fusionar_nombres_bd),
+    "guardar_paciente_bd": ("agrupada", EscrituraAgrupada.guardar_paciente),
+    "registrar_entrada_salida_bd": ("agrupada", EscrituraAgrupada.registrar_entrada_salida),
+}
+
+ESTADOS_HTTP = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+# ============================
+#   CONVERSIÓN A / DESDE JSON
+# ============================
+def a_json(valor):
+    """Convierte filas y resultados de base_datos en algo serializable"""
+    if isinstance(valor, bytes):
+        return {"$bytes": base64.b64encode(valor).decode("ascii")}
+    if isinstance(valor, (list, tuple)):
+        return [a_json(elemento) for elemento in valor]
+    if isinstance(valor, dict):
+        if all(isinstance(clave, str) for clave in valor):
+            return {clave: a_json(elemento) for clave, elemento in valor.items()}
+        return {"$dict": [[a_json(clave), a_json(elemento)] for clave, elemento in valor.items()]}
+    return valor
+
+def desde_json(valor):
+    """Inverso de a_json(); las listas vuelven como tuplas, igual que las filas de sqlite3"""
+    if isinstance(valor, list):
+        return tuple(desde_json(elemento) for elemento in valor)
+    if isinstance(valor, dict):
+        if "$bytes" in valor:
+            return base64.b64decode(valor["$bytes"])
+        if "$dict" in valor:
+            return {desde_json(clave): desde_json(elemento) for clave, elemento in valor["$dict"]}
+        return {clave: desde_json(elemento) for clave, elemento in valor.items()}
+    return valor
+
+def _error(e):
+    # str() de un KeyError agrega comillas; se usa el mensaje tal cual
+    mensaje = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+    return {"error": type(e).__name__, "mensaje": str(mensaje)}
+
+def _estado_error(e):
+    if isinstance(e, (sqlite3.IntegrityError, base_datos.CitaOcupada)):
+        return 409
+    if isinstance(e, (ValueError, TypeError, KeyError)):
+        return 400
+    return 500
+
+# ============================
+#   SERVICIO
+# ============================
+class ServicioClinica:
+    """Atiende peticiones HTTP/JSON y las reparte entre lectores, escritor y escritura agrupada"""
+
+    def __init__(self, lectores=LECTORES, ventana_ms=None):
+        self._lectores = ThreadPoolExecutor(max_workers=lectores, thread_name_prefix="lector_servicio")
+        self._escritor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritor_servicio")
+        self.agrupada = EscrituraAgrupada() if ventana_ms is None else EscrituraAgrupada(ventana_ms=ventana_ms)
+        self.peticiones = 0
+        self.conexiones = 0
+        self.inicio = time.monotonic()
+
+    # ============================
+    #   EJECUCIÓN DE OPERACIONES
+    # ============================
+    def _buscar(self, operacion):
+        if operacion not in OPERACIONES:
+            raise KeyError(f"Operación desconocida: {operacion}")
+        return OPERACIONES[operacion]
+
+    async def ejecutar(self, operacion, args=(), kwargs=None):
+        """Ejecuta una operación y devuelve su resultado"""
+        tipo, funcion = self._buscar(operacion)
+        args, kwargs = desde_json(list(args)), desde_json(kwargs or {})
+        if tipo == "agrupada":
+            return await asyncio.wrap_future(funcion(self.agrupada, *args, **kwargs))
+        grupo = self._lectores if tipo == "lectura" else self._escritor
+        return await asyncio.get_running_loop().run_in_executor(grupo, lambda: funcion(*args, **kwargs))
+
+    async def ejecutar_lote(self, operaciones):
+        """Ejecuta las operaciones en orden. Las consecutivas del mismo tipo se
+        agrupan: las lecturas en un solo viaje al grupo de lectores y las
+        escrituras agrupadas en un mismo commit."""
+        resultados = []
+        pendientes = []
+        for orden, operacion in enumerate(operaciones):
+            try:
+                tipo, _ = self._buscar(operacion["operacion"])
+            except (KeyError, TypeError) as e:
+                tipo, operacion = "invalida", e
+            pendientes.append((tipo, orden, operacion))
+
+        for tipo, grupo in groupby(pendientes, key=lambda pendiente: pendiente[0]):
+            grupo = [operacion for _, _, operacion in grupo]
+            if tipo == "invalida":
+                resultados += [_error(e) for e in grupo]
+            elif tipo == "lectura":
+                resultados += await asyncio.get_running_loop().run_in_executor(
+                    self._lectores, self._leer_varias, grupo)
+            else:
+                tareas = [self.ejecutar(op["operacion"], op.get("args", ()), op.get("kwargs")) for op in grupo]
+                for resultado in await asyncio.gather(*tareas, return_exceptions=True):
+                    resultados.append(_error(resultado) if isinstance(resultado, Exception)
+                                      else {"resultado": a_json(resultado)})
+        return resultados
+
+    def _leer_varias(self, operaciones):
+        resultados = []
+        for operacion in operaciones:
+            _, funcion = OPERACIONES[operacion["operacion"]]
+            try:
+                args = desde_json(list(operacion.get("args", ())))
+                kwargs = desde_json(operacion.get("kwargs") or {})
+                resultados.append({"resultado": a_json(funcion(*args, **kwargs))})
+            except Exception as e:
+                resultados.append(_error(e))
+        return resultados
+
+    def estadisticas(self):
+        segundos = time.monotonic() - self.inicio
+        return {"peticiones": self.peticiones, "conexiones": self.conexiones,
+                "segundos": round(segundos, 1),
+                "escritura_agrupada": self.agrupada.estadisticas(),
+                "reporte_escritura_agrupada": self.agrupada.reporte()}
+
+    # ============================
+    #   HTTP
+    # ============================
+    async def _despachar(self, metodo, ruta, cuerpo):
+        """Devuelve (estado HTTP, datos de la respuesta)"""
+        if ruta == "/salud":
+            return 200, {"estado": "ok"}
+        if ruta == "/estadisticas":
+            return 200, self.estadisticas()
+        if not ruta.startswith("/api/"):
+            return 404, {"error": "NoEncontrado", "mensaje": ruta}
+        if metodo != "POST":
+            return 405, {"error": "MetodoNoPermitido", "mensaje": metodo}
+        try:
+            datos = json.loads(cuerpo or b"{}")
+            operacion = ruta[len("/api/"):]
+            if operacion == "lote":
+                if not isinstance(datos, list):
+                    raise ValueError("El lote debe ser una lista de operaciones")
+                return 200, {"resultados": await self.ejecutar_lote(datos)}
+            resultado = await self.ejecutar(operacion, datos.get("args", ()), datos.get("kwargs"))
+            return 200, {"resultado": a_json(resultado)}
+        except Exception as e:
+            if _estado_error(e) == 500:
+                log.exception("Error en %s: %s", ruta, e)
+            return _estado_error(e), _error(e)
+
+    async def _responder(self, escritor, estado, datos, mantener):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        escritor.write(
+            f"HTTP/1.1 {estado} {ESTADOS_HTTP.get(estado, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode("latin-1") + cuerpo)
+        await escritor.drain()
+
+    async def atender(self, lector, escritor):
+        """Atiende las peticiones de una conexión hasta que el cliente la cierra"""
+        self.conexiones += 1
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(lector.readuntil(b"\r\n\r\n"), INACTIVIDAD_S)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                lineas = cabecera.decode("latin-1").split("\r\n")
+                try:
+                    metodo, ruta, version = lineas[0].split(" ", 2)
+                except ValueError:
+                    await self._responder(escritor, 400, {"error": "PeticionInvalida", "mensaje": lineas[0]}, False)
+                    return
+                encabezados = {}
+                for linea in lineas[1:]:
+                    nombre, _, valor = linea.partition(":")
+                    encabezados[nombre.strip().lower()] = valor.strip()
+
+                texto_largo = encabezados.get("content-length", "")
+                try:
+                    largo = int(texto_largo or 0)
+                except ValueError:
+                    largo = -1
+                if largo < 0:
+                    await self._responder(escritor, 400, {"error": "PeticionInvalida",
+                                                          "mensaje": f"Content-Length inválido: {texto_largo}"}, False)
+                    return
+                if largo > MAXIMO_CUERPO:
+                    await self._responder(escritor, 413, {"error": "CuerpoDemasiadoGrande", "mensaje": str(largo)}, False)
+                    return
+                cuerpo = await lector.readexactly(largo) if largo else b""
+
+                conexion = encabezados.get("connection", "").lower()
+                mantener = conexion == "keep-alive" if version == "HTTP/1.0" else conexion != "close"
+                self.peticiones += 1
+                estado, datos = await self._despachar(metodo, ruta.split("?", 1)[0], cuerpo)
+                await self._responder(escritor, estado, datos, mantener)
+                if not mantener:
+                    return
+        except (asyncio.LimitOverrunError, asyncio.IncompleteReadError, ConnectionError):
+            return
+        finally:
+            escritor.close()
+
+    async def servir(self, host=HOST, puerto=PUERTO):
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        log.info("Servicio de la clínica en http://%s:%d", host, puerto)
+        async with servidor:
+            await servidor.serve_forever()
+
+    def cerrar(self):
+        """Confirma las escrituras pendientes y termina los hilos"""
+        self.agrupada.cerrar()
+        self._escritor.shutdown(wait=True)
+        self._lectores.shutdown(wait=True)
+
+# ============================
+#   LÍNEA DE COMANDOS
+# ============================
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON sobre pacientes.db")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    parser.add_argument("--lectores", type=int, default=LECTORES, help="hilos (y conexiones) de lectura")
+    parser.add_argument("--ventana-ms", type=float, default=None, help="espera de la escritura agrupada")
+    parser.add_argument("--bd", default=None, help="archivo de base de datos (por defecto pacientes.db)")
+    parser.add_argument("--instrumentar", type=float, default=None, metavar="MS",
+                        help="medir cada consulta y registrar las que tarden MS o más")
+    parser.add_argument("--log", default=None, choices=registro.NIVELES, help="nivel de registro (o ELVIS_LOG)")
+    args = parser.parse_args()
+
+    registro.configurar(args.log, ruta=RUTA_LOG)
+    if args.bd:
+        configurar_bd(args.bd)
+    if args.instrumentar is not None:
+        activar_instrumentacion(args.instrumentar)
+    conectar_bd()
+    servicio = ServicioClinica(args.lectores, args.ventana_ms)
+    try:
+        asyncio.run(servicio.servir(args.host, args.puerto))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.cerrar()
+        log.info("Servicio detenido: %s", servicio.estadisticas()["reporte_escritura_agrupada"])
+
+if __name__ == "__main__":
+    main()
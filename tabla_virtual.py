@@ -0,0 +1,297 @@
+# ============================
+#   TABLA VIRTUAL PARA TREEVIEW
+# ============================
+# Conecta un ttk.Treeview ya creado a una tabla de la base de datos sin
+# cargarla entera: solo se materializa una ventana de filas alrededor de lo
+# visible. Al acercarse al final (o al principio) del scroll se pide la
+# página siguiente (o anterior) con consultas.pagina() y se descartan las
+# filas que quedan lejos. El orden por columna se hace en la base de datos.
+# fuente es cualquier objeto con pagina() y clave() como las de consultas
+# (por ejemplo un ClienteServicio cuando los datos están en el servidor).
+# recargar_en_segundo_plano() lee la primera página con un EjecutorBD y
+# mientras tanto deja en la tabla una fila "Cargando…" (esqueleto).
+# Con un ejecutor, las páginas del scroll, el cambio de orden y la clave de
+# una fila nueva también se leen en sus hilos lectores y se aplican en el
+# callback: el hilo de Tk no espera a la base de datos ni al servidor.
+# Sin ejecutor todo se lee en el momento (scripts y pruebas).
+import logging
+from bisect import bisect_left
+
+import consultas
+from consultas import TABLAS
+
+TAMANO_PAGINA = 100
+PAGINAS_EN_VENTANA = 3      # filas materializadas como máximo = 3 páginas
+MARGEN_CARGA = 0.15         # fracción del scroll que dispara la carga
+FILA_CARGANDO = "__cargando__"
+
+log = logging.getLogger(__name__)
+
+def _orden_sqlite(clave_fila):
+    """Clave comparable en Python con el mismo orden que SQLite (NULL < números < texto)"""
+    valor, id_fila = clave_fila
+    if valor is None:
+        return (0, 0, id_fila)
+    if isinstance(valor, (int, float)):
+        return (1, valor, id_fila)
+    return (2, valor, id_fila)
+
+class TablaVirtual:
+    """Muestra en un Treeview una ventana deslizante de una tabla paginada"""
+
+    def __init__(self, arbol, tabla, formatear=None, orden="id", descendente=False,
+                 rango=None, tamano_pagina=TAMANO_PAGINA, fuente=None, ejecutor=None):
+        self.arbol = arbol
+        self.fuente = fuente or consultas
+        self.ejecutor = ejecutor
+        self.tabla = tabla
+        self.columnas = TABLAS[tabla]["columnas"]
+        self.formatear = formatear or (lambda fila: fila)
+        self.orden = orden
+        self.descendente = descendente
+        self.rango = rango
+        self.tamano_pagina = tamano_pagina
+        self.claves = {}            # iid -> clave de keyset de la fila
+        self.hay_antes = False
+        self.hay_despues = False
+        self.fijas = False          # True mientras se muestran resultados de una búsqueda
+        self._cargando = False      # hay una página del scroll en camino
+        self._recarga = 0           # cambia con cada recarga: descarta páginas que llegan tarde
+
+        # Encabezados que ordenan por su columna en la base de datos
+        self.encabezados = dict(zip(self.columnas, arbol["columns"]))
+        self.textos = {col: arbol.heading(enc, "text") for col, enc in self.encabezados.items()}
+        for columna, encabezado in self.encabezados.items():
+            if columna in TABLAS[tabla]["orden"]:
+                arbol.heading(encabezado, command=lambda c=columna: self.ordenar_por(c))
+
+        # La rueda del ratón y las flechas mueven el Treeview, que avisa aquí
+        arbol.configure(yscrollcommand=self._al_desplazar)
+        self._marcar_orden()
+
+    # ============================
+    #   CARGA DE PÁGINAS
+    # ============================
+    def _leer(self, funcion, *args, al_terminar, al_fallar):
+        """Lee con el ejecutor (callbacks en el hilo de Tk) o, sin él, en el momento"""
+        if self.ejecutor is not None:
+            return self.ejecutor.leer(funcion, *args, al_terminar=al_terminar, al_fallar=al_fallar)
+        try:
+            resultado = funcion(*args)
+        except Exception as e:
+            al_fallar(e)
+            raise
+        al_terminar(resultado)
+
+    def _fallo(self, error):
+        log.error("Error leyendo %s: %s", self.tabla, error)
+
+    def _pagina(self, despues_de, hacia_atras=False):
+        descendente = self.descendente != hacia_atras
+        filas, siguiente = self.fuente.pagina(self.tabla, self.columnas, self.orden, descendente, despues_de,
+                                              self.tamano_pagina, self.rango, con_clave=True)
+        return filas, siguiente is not None
+
+    def _insertar(self, fila, clave, posicion="end"):
+        iid = str(fila[0])
+        if self.arbol.exists(iid):
+            return
+        self.arbol.insert("", posicion, iid=iid, values=self.formatear(fila))
+        self.claves[iid] = clave
+
+    def _vaciar(self):
+        hijos = self.arbol.get_children()
+        if hijos:
+            self.arbol.delete(*hijos)
+        self.claves.clear()
+
+    def _mostrar_primera(self, filas, hay_despues):
+        self.fijas = False
+        self._vaciar()
+        self.hay_antes, self.hay_despues = False, hay_despues
+        for fila, clave in filas:
+            self._insertar(fila, clave)
+        self.arbol.yview_moveto(0)
+
+    def recargar(self):
+        """Vuelve a la primera página con el orden actual"""
+        self._recarga += 1
+        self._mostrar_primera(*self._pagina(None))
+
+    def recargar_en_segundo_plano(self, ejecutor=None, al_terminar=None, al_fallar=None):
+        """Como recargar(), pero la página se lee en un hilo lector de ejecutor.
+
+        Hasta que llega, la tabla muestra solo la fila FILA_CARGANDO y no
+        pagina con el scroll. al_terminar(filas) y al_fallar(error) se
+        llaman en el hilo de la interfaz. Sin ejecutor se usa el de la tabla.
+        """
+        ejecutor = ejecutor or self.ejecutor
+        self._recarga += 1
+        recarga = self._recarga
+        self.fijas = True
+        self._vaciar()
+        self.hay_antes = self.hay_despues = False
+        self.arbol.insert("", "end", iid=FILA_CARGANDO, values=("", "Cargando…"))
+
+        def pagina_leida(resultado):
+            if recarga != self._recarga:
+                return          # otra recarga o una búsqueda ya reemplazó esta
+            self._mostrar_primera(*resultado)
+            if al_terminar:
+                al_terminar(resultado[0])
+
+        def pagina_fallida(error):
+            if recarga == self._recarga:
+                self.fijas = False
+                self._vaciar()
+            if al_fallar:
+                al_fallar(error)
+            else:
+                self._fallo(error)
+
+        return ejecutor.leer(self._pagina, None, al_terminar=pagina_leida, al_fallar=pagina_fallida)
+
+    def mostrar_fijas(self, filas):
+        """Muestra una lista de filas ya calculada (por ejemplo, una búsqueda)"""
+        self._recarga += 1
+        self.fijas = True
+        self._vaciar()
+        self.hay_antes = self.hay_despues = False
+        for fila in filas:
+            self.arbol.insert("", "end", iid=str(fila[0]), values=self.formatear(fila))
+
+    def _descartar(self, sobrantes, por_arriba):
+        hijos = self.arbol.get_children()
+        quitar = hijos[:sobrantes] if por_arriba else hijos[-sobrantes:]
+        self.arbol.delete(*quitar)
+        for iid in quitar:
+            self.claves.pop(iid, None)
+
+    def _mostrar_despues(self, filas, hay_despues):
+        hijos = self.arbol.get_children()
+        primera_visible = float(self.arbol.yview()[0]) * len(hijos)
+        self.hay_despues = hay_despues
+        for fila, clave in filas:
+            self._insertar(fila, clave)
+        # Descartar por arriba lo que sobra de la ventana
+        total = len(self.arbol.get_children())
+        sobrantes = total - self.tamano_pagina * PAGINAS_EN_VENTANA
+        if sobrantes > 0:
+            self._descartar(sobrantes, por_arriba=True)
+            self.hay_antes = True
+            self.arbol.yview_moveto(max(primera_visible - sobrantes, 0) / (total - sobrantes))
+
+    def _mostrar_antes(self, filas, hay_antes):
+        hijos = self.arbol.get_children()
+        primera_visible = float(self.arbol.yview()[0]) * len(hijos)
+        self.hay_antes = hay_antes
+        for posicion, (fila, clave) in enumerate(reversed(filas)):
+            self._insertar(fila, clave, posicion)
+        # Descartar por abajo lo que sobra de la ventana
+        sobrantes = len(self.arbol.get_children()) - self.tamano_pagina * PAGINAS_EN_VENTANA
+        if sobrantes > 0:
+            self._descartar(sobrantes, por_arriba=False)
+            self.hay_despues = True
+        total = len(self.arbol.get_children())
+        if total:
+            self.arbol.yview_moveto((primera_visible + len(filas)) / total)
+
+    def _al_desplazar(self, primero, ultimo):
+        if self.fijas or self._cargando:
+            return
+        hijos = self.arbol.get_children()
+        if float(ultimo) >= 1 - MARGEN_CARGA and self.hay_despues:
+            despues_de, hacia_atras, mostrar = self.claves[hijos[-1]] if hijos else None, False, self._mostrar_despues
+        elif float(primero) <= MARGEN_CARGA and self.hay_antes and hijos:
+            despues_de, hacia_atras, mostrar = self.claves[hijos[0]], True, self._mostrar_antes
+        else:
+            return
+        # _cargando queda puesto hasta que la página llega (o falla)
+        self._cargando = True
+        recarga = self._recarga
+
+        def pagina_leida(resultado):
+            self._cargando = False
+            if recarga == self._recarga and not self.fijas:
+                mostrar(*resultado)
+
+        def pagina_fallida(error):
+            self._cargando = False
+            self._fallo(error)
+
+        self._leer(self._pagina, despues_de, hacia_atras, al_terminar=pagina_leida, al_fallar=pagina_fallida)
+
+    # ============================
+    #   CAMBIOS DE UNA SOLA FILA
+    # ============================
+    # Tras una escritura se toca solo el elemento afectado. La fila se
+    # coloca en su sitio dentro de la ventana cargada; si cae fuera de ella
+    # no se inserta y aparecerá al desplazarse hasta allí.
+    def _posicion(self, clave_fila):
+        hijos = self.arbol.get_children()
+        claves = [_orden_sqlite(self.claves[iid]) for iid in hijos]
+        buscada = _orden_sqlite(clave_fila)
+        if self.descendente:
+            # Las claves llevan el id, así que no hay empates
+            posicion = len(claves) - bisect_left(claves[::-1], buscada)
+        else:
+            posicion = bisect_left(claves, buscada)
+        if (posicion == len(hijos) and self.hay_despues) or (posicion == 0 and self.hay_antes):
+            return None
+        return posicion
+
+    def insertar_fila(self, fila):
+        """Agrega una fila recién guardada (su clave de orden se lee en segundo plano)"""
+        if self.fijas:
+            return
+        recarga = self._recarga
+
+        def clave_leida(clave_fila):
+            # Si entretanto se recargó o cambió el orden, la clave ya no sirve
+            if clave_fila is None or recarga != self._recarga or self.fijas:
+                return
+            posicion = self._posicion(tuple(clave_fila))
+            if posicion is not None:
+                self._insertar(fila, tuple(clave_fila), posicion)
+
+        self._leer(self.fuente.clave, self.tabla, fila[0], self.orden, al_terminar=clave_leida, al_fallar=self._fallo)
+
+    def actualizar_fila(self, fila):
+        """Reemplaza una fila modificada (puede cambiar de sitio si cambió la columna de orden)"""
+        iid = str(fila[0])
+        if self.fijas:
+            if self.arbol.exists(iid):
+                self.arbol.item(iid, values=self.formatear(fila))
+            return
+        self.eliminar_fila(fila[0])
+        self.insertar_fila(fila)
+
+    def eliminar_fila(self, id_fila):
+        """Quita una fila borrada"""
+        iid = str(id_fila)
+        if self.arbol.exists(iid):
+            self.arbol.delete(iid)
+        self.claves.pop(iid, None)
+
+    # ============================
+    #   ORDEN POR ENCABEZADO
+    # ============================
+    def _marcar_orden(self):
+        for columna, encabezado in self.encabezados.items():
+            texto = self.textos[columna]
+            if columna == self.orden:
+                texto += " ▼" if self.descendente else " ▲"
+            self.arbol.heading(encabezado, text=texto)
+
+    def ordenar_por(self, columna):
+        """Ordena por la columna indicada; si ya estaba ordenada, invierte el sentido"""
+        if columna == self.orden:
+            self.descendente = not self.descendente
+        else:
+            self.orden = columna
+            self.descendente = False
+        self._marcar_orden()
+        if self.ejecutor is not None:
+            self.recargar_en_segundo_plano()
+        else:
+            self.recargar()